@@ -2,8 +2,9 @@
 
 set -e
 
-ifconfig eth0 193.167.0.2 netmask 255.255.255.0 up
-ifconfig eth1 193.167.100.2 netmask 255.255.255.0 up
+# Vegvisir passes the slot specific addresses, defaults match the single slot setup
+ifconfig eth0 ${SIM_LEFTNET_IPV4:-193.167.0.2} netmask 255.255.255.0 up
+ifconfig eth1 ${SIM_RIGHTNET_IPV4:-193.167.100.2} netmask 255.255.255.0 up
 
 ifconfig -a
 
@@ -39,6 +40,29 @@ else
 	exit 127
 fi
 
+# Control channel on port 57833, Vegvisir uses it to reconfigure the scenario without restarting the container
+# A connection sends a single scenario line (e.g., "simple 20 50") and receives "OK" or "ERR <output>"
+# The scenario is rerun with TC_ACTION=change, only scenarios that honor TC_ACTION support this
+control_channel() {
+	rm -f /tmp/control && mkfifo /tmp/control
+	while true; do
+		cat /tmp/control | netcat -l 57833 | (
+			# The subshell inherits set -e, a probe that closes without sending anything must not end the loop
+			read -r CONTROL_SCENARIO || [[ -n "$CONTROL_SCENARIO" ]] || exit 0
+			CONTROL_SCENARIONAME=$(echo $CONTROL_SCENARIO | cut -d " " -f1)
+			if [[ "$CONTROL_SCENARIONAME" == */* ]]; then
+				echo "ERR scenario names can not contain /"
+			elif test -f "/scenarios/$CONTROL_SCENARIONAME" && CONTROL_OUTPUT=$(TC_ACTION=change bash /scenarios/$CONTROL_SCENARIO 2>&1); then
+				echo "Reconfigured scenario:" $CONTROL_SCENARIO >&2
+				echo "OK"
+			else
+				echo "ERR" $CONTROL_OUTPUT
+			fi
+		) > /tmp/control
+	done
+}
+control_channel &
+
 PID=`jobs -p`
 trap "kill -SIGINT $PID" INT
 trap "kill -SIGTERM $PID" TERM
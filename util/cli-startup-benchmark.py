@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+# Invocations that must stay cheap, wrapper scripts call them for every run
+COMMANDS = {
+	"version": ["--version"],
+	"help": ["--help"],
+	"run": ["run", "--help"],
+	"freeze": ["freeze", "--help"],
+	"load": ["load", "--help"],
+	"netlog": ["netlog", "--help"],
+	"index": ["index", "--help"],
+}
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(arguments, repeat):
+	"""
+	Median wall time of the CLI process and the import statistics reported by `python -X importtime` for its last invocation
+	"""
+	wall_times = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		process = subprocess.run([sys.executable, "-X", "importtime", "-m", "vegvisir", *arguments], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+		wall_times.append(time.perf_counter() - started)
+
+	modules = []
+	for line in process.stderr.splitlines():
+		match = IMPORT_TIME_LINE.match(line)
+		if match is not None:
+			self_us, cumulative_us, indent, module = match.groups()
+			modules.append((module, int(self_us), int(cumulative_us), len(indent) == 1))
+	return {
+		"wall_ms": statistics.median(wall_times) * 1000,
+		"import_ms": sum(cumulative_us for _, _, cumulative_us, top_level in modules if top_level) / 1000,
+		"modules": len(modules),
+		"vegvisir_modules": sorted(module for module, _, _, _ in modules if module.split(".")[0] == "vegvisir"),
+		"slowest": [(module, self_us / 1000) for module, self_us, _, _ in sorted(modules, key=lambda entry: entry[1], reverse=True)[:5]],
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Startup time of every vegvisir subcommand, based on python -X importtime")
+	parser.add_argument("-n", "--repeat", type=int, default=5, help="Invocations per subcommand, the median wall time is reported")
+	parser.add_argument("--json", dest="json_path", help="Also write the results to this file, e.g., to track them across commits")
+	parser.add_argument("--max-ms", type=float, help="Exit with an error when the import time of a subcommand exceeds this")
+	parser.add_argument("commands", nargs="*", choices=[[], *COMMANDS.keys()], help="Defaults to all subcommands")
+	arguments = parser.parse_args()
+
+	# The working directory has to be the repository root for `-m vegvisir` to find the package
+	os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	results = {}
+	exceeded = []
+	for command in arguments.commands or COMMANDS.keys():
+		results[command] = measure(COMMANDS[command], arguments.repeat)
+		result = results[command]
+		print(f"{command:8} wall {result['wall_ms']:7.1f} ms | imports {result['import_ms']:7.1f} ms | {result['modules']:4} modules ({len(result['vegvisir_modules'])} vegvisir)")
+		print("         slowest: " + ", ".join(f"{module} {self_ms:.1f} ms" for module, self_ms in result["slowest"]))
+		if arguments.max_ms is not None and result["import_ms"] > arguments.max_ms:
+			exceeded.append(command)
+
+	if arguments.json_path is not None:
+		with open(arguments.json_path, "w") as fp:
+			json.dump(results, fp, indent=4)
+	if len(exceeded) > 0:
+		print(f"Import time of {exceeded} exceeds {arguments.max_ms} ms")
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,94 @@
+import math
+import threading
+from statistics import NormalDist
+
+# Metrics the runner knows as soon as the run is recorded, others are only known once the post-hook of the run completed
+IMMEDIATE_METRICS = ["run.client_duration_s"]
+
+
+def student_t_quantile(p: float, degrees_of_freedom: int) -> float:
+	"""
+	Quantile of Student's t-distribution, exact for one and two degrees of freedom and a Cornish-Fisher expansion of the normal quantile otherwise
+	The expansion (Abramowitz and Stegun 26.7.5) stays within one percent from three degrees of freedom on, plenty for a stopping rule
+	"""
+	if degrees_of_freedom == 1:
+		return math.tan(math.pi * (p - 0.5))
+	if degrees_of_freedom == 2:
+		return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+	z = NormalDist().inv_cdf(p)
+	n = degrees_of_freedom
+	return (
+		z
+		+ (z ** 3 + z) / (4 * n)
+		+ (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * n ** 2)
+		+ (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * n ** 3)
+		+ (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * n ** 4)
+	)
+
+
+class AdaptiveIterations:
+	"""
+	Stop repeating a permutation once the confidence interval of the mean of metric is narrow enough, iterations is the cap
+	The width is the full width of the interval, either absolute (in the unit of the metric) or relative to the mean
+	"""
+
+	def __init__(self, metric: str, confidence: float, min_iterations: int, width: float | None = None, relative_width: float | None = None) -> None:
+		self.metric = metric
+		self.confidence = confidence
+		self.min_iterations = min_iterations
+		self.width = width
+		self.relative_width = relative_width
+
+	@property
+	def immediate(self) -> bool:
+		return self.metric in IMMEDIATE_METRICS
+
+	def __repr__(self) -> str:
+		target = f"{self.width}" if self.width is not None else f"{self.relative_width * 100:g}% of the mean"
+		return f"AdaptiveIterations<{self.metric}, {self.confidence * 100:g}% interval narrower than {target}, at least {self.min_iterations} runs>"
+
+
+class IterationStopRule:
+	"""
+	Stopping rule of a single permutation, samples are added as runs complete (from any thread) and folded into a running mean and variance (Welford)
+	"""
+
+	def __init__(self, settings: AdaptiveIterations) -> None:
+		self.settings = settings
+		self.count = 0
+		self.mean = 0.0
+		self._m2 = 0.0
+		self._lock = threading.Lock()
+
+	def add(self, value: float) -> None:
+		with self._lock:
+			self.count += 1
+			delta = value - self.mean
+			self.mean += delta / self.count
+			self._m2 += delta * (value - self.mean)
+
+	@property
+	def interval_width(self) -> float | None:
+		"""
+		Full width of the confidence interval of the mean, None until there are two samples
+		"""
+		with self._lock:
+			if self.count < 2:
+				return None
+			standard_error = math.sqrt(self._m2 / (self.count - 1) / self.count)
+			return 2 * student_t_quantile(0.5 + self.settings.confidence / 2, self.count - 1) * standard_error
+
+	@property
+	def target_width(self) -> float:
+		if self.settings.width is not None:
+			return self.settings.width
+		return self.settings.relative_width * abs(self.mean)
+
+	def converged(self) -> bool:
+		if self.count < max(2, self.settings.min_iterations):
+			return False
+		return self.interval_width <= self.target_width
+
+	def describe(self) -> str:
+		width = self.interval_width
+		return f"{self.settings.metric} mean {self.mean:.6g} over {self.count} run(s), {self.settings.confidence * 100:g}% interval width {'-' if width is None else f'{width:.6g}'} (target {self.target_width:.6g})"
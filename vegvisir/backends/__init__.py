@@ -0,0 +1,7 @@
+from vegvisir.backends import cli_backend, engine_backend
+
+default_container_backend = "cli"
+available_container_backends = {
+    "cli": cli_backend.DockerCLIBackend,
+    "engine-api": engine_backend.DockerEngineBackend
+}
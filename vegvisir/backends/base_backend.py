@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from datetime import datetime
+import subprocess
+from typing import Dict, List, Tuple
+
+from vegvisir.hostinterface import HostInterface
+
+
+@dataclass
+class ComposeProject:
+	"""
+	Single docker compose project, the variables are interpolated into docker-compose.yml
+	"""
+	name: str
+	variables: Dict[str, str]
+
+	def cli_variables(self) -> str:
+		return "".join(f"{key}=\"{value}\" " for key, value in self.variables.items())
+
+
+class LogFollower:
+	"""
+	Handle of a container log that is streamed into a file while the container runs
+	"""
+
+	def __init__(self, destination: str) -> None:
+		self.destination = destination
+
+	def stop(self, timeout: float = 0.0) -> None:
+		"""
+		Wait up to timeout seconds for the log stream to end by itself (e.g., the container stopped), then cut it off
+		"""
+		raise NotImplementedError()
+
+
+class BaseContainerBackend:
+	"""
+	(Abstract) base class for container backends
+	Backends control the containers of a compose project, the topology itself is always described by docker-compose.yml
+	All methods return the (stdout, stderr) output a user would expect from the equivalent docker compose command
+	"""
+
+	def __init__(self, host_interface: HostInterface, socket_path: str | None = None) -> None:
+		self.host_interface = host_interface
+		self.socket_path = socket_path
+		self.backend_name: str = ""
+
+	def is_available(self) -> bool:
+		return True
+
+	def up(self, project: ComposeProject, services: List[str]) -> Tuple[str, str]:
+		"""
+		Start the services and their dependencies in the background
+		"""
+		raise NotImplementedError()
+
+	def run(self, project: ComposeProject, service: str, abort_on_container_exit: bool, log_destination: str | None = None) -> subprocess.Popen:
+		"""
+		Start a service and return a process-like handle that exits together with the container
+		Without abort_on_container_exit the dependencies of the service are not touched
+		The container log is streamed into log_destination, it is complete once the handle has been waited for
+		"""
+		raise NotImplementedError()
+
+	def logs(self, project: ComposeProject, service: str, since: datetime | None = None) -> Tuple[str, str]:
+		raise NotImplementedError()
+
+	def follow_logs(self, project: ComposeProject, service: str, destination: str, since: datetime | None = None) -> LogFollower:
+		"""
+		Stream the (timestamped) log of a service into the destination file until the container stops or the follower is stopped
+		Output goes straight to disk, memory use does not depend on the size of the log
+		"""
+		raise NotImplementedError()
+
+	def remove(self, project: ComposeProject, service: str) -> Tuple[str, str]:
+		"""
+		Stop and remove a single service, including its anonymous volumes
+		"""
+		raise NotImplementedError()
+
+	def exec_detached(self, project: ComposeProject, service: str, command: List[str]) -> Tuple[str, str]:
+		raise NotImplementedError()
+
+	def down(self, project: ComposeProject) -> Tuple[str, str]:
+		"""
+		Stop and remove all containers and networks of the project
+		"""
+		raise NotImplementedError()
+
+	def version(self) -> str:
+		raise NotImplementedError()
+
+	def image_id(self, image: str) -> str | None:
+		"""
+		Content-addressed ID (sha256:...) of a local image, None when the image is not available locally
+		"""
+		raise NotImplementedError()
+
+	def container_pid(self, project: ComposeProject, service: str) -> int | None:
+		"""
+		Host PID of the main process of a running service container, None when the container is not running (yet)
+		"""
+		raise NotImplementedError()
+
+	def close(self) -> None:
+		pass
@@ -0,0 +1,99 @@
+from datetime import datetime
+import shlex
+import subprocess
+from typing import List, Tuple
+
+from vegvisir.backends.base_backend import BaseContainerBackend, ComposeProject, LogFollower
+from vegvisir.hostinterface import HostInterface
+
+
+class CLILogFollower(LogFollower):
+	"""
+	"docker compose logs --follow" writing directly into the destination file
+	"""
+
+	def __init__(self, destination: str, proc: subprocess.Popen) -> None:
+		super().__init__(destination)
+		self.proc = proc
+
+	def stop(self, timeout: float = 0.0) -> None:
+		try:
+			self.proc.wait(timeout)
+		except subprocess.TimeoutExpired:
+			self.proc.terminate()
+			try:
+				self.proc.wait(5)
+			except subprocess.TimeoutExpired:
+				self.proc.kill()
+				self.proc.wait()
+
+
+class DockerCLIBackend(BaseContainerBackend):
+	"""
+	Controls containers by shelling out to the docker compose CLI
+	Every call pays the CLI startup and compose file parsing, but only requires the docker CLI to be installed
+	"""
+
+	def __init__(self, host_interface: HostInterface, socket_path: str | None = None) -> None:
+		super().__init__(host_interface, socket_path)
+		self.backend_name = "cli"
+
+	def _docker_host(self) -> str:
+		return f"DOCKER_HOST=\"unix://{self.socket_path}\" " if self.socket_path is not None else ""
+
+	def _compose(self, project: ComposeProject, arguments: str) -> str:
+		return self._docker_host() + project.cli_variables() + " docker compose " + arguments
+
+	def up(self, project: ComposeProject, services: List[str]) -> Tuple[str, str]:
+		_, out, err = self.host_interface.spawn_blocking_subprocess(self._compose(project, "up -d " + " ".join(services)), False, True)
+		return out, err
+
+	def run(self, project: ComposeProject, service: str, abort_on_container_exit: bool, log_destination: str | None = None) -> subprocess.Popen:
+		arguments = "up --abort-on-container-exit --timeout 1 " if abort_on_container_exit else "up --no-deps --timeout 1 "
+		# Compose only attaches to the requested service, its output is the container log
+		# Output goes straight into the file (or nowhere), an unread pipe would eventually block compose
+		arguments += "--timestamps --no-log-prefix "
+		output = open(log_destination, "ab") if log_destination is not None else subprocess.DEVNULL
+		try:
+			return self.host_interface.spawn_parallel_subprocess(self._compose(project, arguments + service), False, True, output)
+		finally:
+			if log_destination is not None:
+				output.close()  # The child process holds its own descriptor
+
+	def logs(self, project: ComposeProject, service: str, since: datetime | None = None) -> Tuple[str, str]:
+		logs_since = f"--since {since.astimezone().isoformat()} " if since is not None else ""
+		_, out, err = self.host_interface.spawn_blocking_subprocess(self._compose(project, f"logs --timestamps {logs_since}{service}"), False, True)
+		return out, err
+
+	def follow_logs(self, project: ComposeProject, service: str, destination: str, since: datetime | None = None) -> LogFollower:
+		logs_since = f"--since {since.astimezone().isoformat()} " if since is not None else ""
+		with open(destination, "ab") as output:
+			proc = self.host_interface.spawn_parallel_subprocess(self._compose(project, f"logs --follow --timestamps --no-log-prefix {logs_since}{service}"), False, True, output)
+		return CLILogFollower(destination, proc)
+
+	def remove(self, project: ComposeProject, service: str) -> Tuple[str, str]:
+		_, out, err = self.host_interface.spawn_blocking_subprocess(self._compose(project, f"rm --force --stop --volumes {service}"), False, True)
+		return out, err
+
+	def exec_detached(self, project: ComposeProject, service: str, command: List[str]) -> Tuple[str, str]:
+		_, out, err = self.host_interface.spawn_blocking_subprocess(self._compose(project, f"exec -d {service} {shlex.join(command)}"), False, True)
+		return out, err
+
+	def down(self, project: ComposeProject) -> Tuple[str, str]:
+		_, out, err = self.host_interface.spawn_blocking_subprocess(self._compose(project, "down"), False, True)
+		return out, err
+
+	def version(self) -> str:
+		_, docker_out, docker_err = self.host_interface.spawn_blocking_subprocess("docker version", False, False)
+		_, compose_out, compose_err = self.host_interface.spawn_blocking_subprocess("docker compose version", False, False)
+		return "\n".join(output for output in [docker_out, docker_err, compose_out, compose_err] if len(output) > 0)
+
+	def image_id(self, image: str) -> str | None:
+		proc, out, _ = self.host_interface.spawn_blocking_subprocess(self._docker_host() + f"docker image inspect --format '{{{{.Id}}}}' {shlex.quote(image)}", False, True)
+		return out if proc.returncode == 0 and len(out) > 0 else None
+
+	def container_pid(self, project: ComposeProject, service: str) -> int | None:
+		proc, out, _ = self.host_interface.spawn_blocking_subprocess(self._docker_host() + f"docker inspect --format '{{{{.State.Pid}}}}' \"$({self._compose(project, f'ps -q {service}')})\"", False, True)
+		if proc.returncode != 0 or not out.isdigit() or int(out) == 0:
+			return None
+		return int(out)
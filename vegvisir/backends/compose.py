@@ -0,0 +1,114 @@
+import os
+import re
+from typing import Any, Dict, List
+
+from vegvisir.exceptions import VegvisirContainerBackendException
+
+COMPOSE_FILE = "docker-compose.yml"
+
+# $$, ${VAR}, ${VAR:-default}, ${VAR-default}, ${VAR:?error}, ${VAR?error} and $VAR
+_INTERPOLATION_PATTERN = re.compile(r"\$(?:(?P<escaped>\$)|\{(?P<braced>[A-Za-z_][A-Za-z0-9_]*)(?:(?P<separator>:?[-?])(?P<default>[^}]*))?\}|(?P<named>[A-Za-z_][A-Za-z0-9_]*))")
+
+
+def interpolate(value: Any, variables: Dict[str, str]) -> Any:
+	"""
+	Substitute compose variables in every string of a parsed compose file
+	Unset variables without default become empty strings, as docker compose does
+	"""
+	if isinstance(value, dict):
+		return {key: interpolate(entry, variables) for key, entry in value.items()}
+	if isinstance(value, list):
+		return [interpolate(entry, variables) for entry in value]
+	if not isinstance(value, str):
+		return value
+
+	def _substitute(match: re.Match) -> str:
+		if match.group("escaped") is not None:
+			return "$"
+		name = match.group("braced") or match.group("named")
+		separator = match.group("separator")
+		current = variables.get(name)
+		unset = current is None or (separator is not None and separator.startswith(":") and current == "")
+		if separator is None or not unset:
+			return current if current is not None else ""
+		if separator.endswith("?"):
+			raise VegvisirContainerBackendException(f"Compose variable [{name}] is required | {match.group('default')}")
+		return match.group("default")
+
+	return _INTERPOLATION_PATTERN.sub(_substitute, value)
+
+
+def read_env_file(path: str) -> List[str]:
+	"""
+	KEY=VALUE entries of an env file, surrounding quotes are stripped like docker compose v2 does
+	"""
+	entries = []
+	try:
+		with open(path, "r") as fp:
+			for line in fp:
+				line = line.strip()
+				if len(line) == 0 or line.startswith("#"):
+					continue
+				key, _, value = line.partition("=")
+				if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+					value = value[1:-1]
+				entries.append(f"{key.strip()}={value}")
+	except OSError as e:
+		raise VegvisirContainerBackendException(f"Could not read env file [{path}] | {e}")
+	return entries
+
+
+class ComposeTopology:
+	"""
+	Services and networks of docker-compose.yml, parsed once and interpolated per project
+	"""
+
+	def __init__(self, compose_file: str = COMPOSE_FILE) -> None:
+		try:
+			import yaml
+		except ImportError:
+			raise VegvisirContainerBackendException("Reading the compose topology requires the PyYAML package.")
+
+		self.compose_file = os.path.abspath(compose_file)
+		self.base_directory = os.path.dirname(self.compose_file)
+		try:
+			with open(self.compose_file, "r") as fp:
+				self._definition = yaml.safe_load(fp)
+		except (OSError, yaml.YAMLError) as e:
+			raise VegvisirContainerBackendException(f"Could not load compose file [{self.compose_file}] | {e}")
+		if not isinstance(self._definition, dict) or not isinstance(self._definition.get("services"), dict):
+			raise VegvisirContainerBackendException(f"Compose file [{self.compose_file}] does not define any services.")
+
+	def services(self, variables: Dict[str, str]) -> Dict[str, Dict]:
+		return interpolate(self._definition["services"], variables)
+
+	def networks(self, variables: Dict[str, str]) -> Dict[str, Dict]:
+		return interpolate(self._definition.get("networks") or {}, variables)
+
+	def dependency_order(self, services: Dict[str, Dict], requested: List[str]) -> List[str]:
+		"""
+		Requested services preceded by everything they depend on, in start order
+		"""
+		ordered = []
+		visiting = set()
+
+		def _visit(service: str):
+			if service in ordered:
+				return
+			if service not in services:
+				raise VegvisirContainerBackendException(f"Compose file does not define service [{service}].")
+			if service in visiting:
+				raise VegvisirContainerBackendException(f"Compose service [{service}] has a circular dependency.")
+			visiting.add(service)
+			depends_on = services[service].get("depends_on") or []
+			for dependency in (depends_on.keys() if isinstance(depends_on, dict) else depends_on):
+				_visit(dependency)
+			visiting.discard(service)
+			ordered.append(service)
+
+		for service in requested:
+			_visit(service)
+		return ordered
+
+	def resolve_path(self, path: str) -> str:
+		return path if os.path.isabs(path) else os.path.normpath(os.path.join(self.base_directory, path))
@@ -0,0 +1,545 @@
+from datetime import datetime
+import hashlib
+import http.client
+import json
+import logging
+import socket
+import struct
+import subprocess
+import threading
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import quote, urlencode
+
+from vegvisir import tracing
+from vegvisir.backends.base_backend import BaseContainerBackend, ComposeProject, LogFollower
+from vegvisir.backends.compose import COMPOSE_FILE, ComposeTopology, read_env_file
+from vegvisir.exceptions import VegvisirContainerBackendException
+from vegvisir.hostinterface import HostInterface
+
+DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
+
+# Labels docker compose uses itself, "docker compose down" and "docker compose ps" keep working on projects created by this backend
+LABEL_PROJECT = "com.docker.compose.project"
+LABEL_SERVICE = "com.docker.compose.service"
+LABEL_NETWORK = "com.docker.compose.network"
+LABEL_ONEOFF = "com.docker.compose.oneoff"
+LABEL_CONFIG_HASH = "vegvisir.config-hash"
+
+# Requests that can be repeated without side effects when the daemon dropped the connection before answering (RFC 9110 9.2.2)
+IDEMPOTENT_METHODS = ["GET", "HEAD", "PUT", "DELETE", "OPTIONS"]
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+	def __init__(self, socket_path: str, timeout: float | None = None) -> None:
+		super().__init__("localhost", timeout=timeout)
+		self.socket_path = socket_path
+
+	def connect(self) -> None:
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		sock.settimeout(self.timeout)
+		try:
+			sock.connect(self.socket_path)
+		except OSError:
+			sock.close()
+			raise
+		self.sock = sock
+
+
+class DockerEngineClient:
+	"""
+	Minimal Docker Engine API client over a unix socket
+	Every thread keeps its own persistent HTTP connection, slots running in parallel never wait on each other's requests
+	"""
+	API_VERSION = "v1.41"  # Docker Engine 20.10 and up
+
+	def __init__(self, socket_path: str = DEFAULT_DOCKER_SOCKET, timeout: float = 120.0) -> None:
+		self.socket_path = socket_path
+		self.timeout = timeout
+		self._local = threading.local()
+		self._connections: List[UnixHTTPConnection] = []
+		self._lock = threading.Lock()
+
+	def _connection(self) -> Tuple[UnixHTTPConnection, bool]:
+		connection = getattr(self._local, "connection", None)
+		if connection is not None:
+			return connection, True
+		connection = UnixHTTPConnection(self.socket_path, self.timeout)
+		self._local.connection = connection
+		with self._lock:
+			self._connections.append(connection)
+		return connection, False
+
+	def _reset_connection(self) -> None:
+		connection = getattr(self._local, "connection", None)
+		if connection is not None:
+			connection.close()
+			with self._lock:
+				if connection in self._connections:
+					self._connections.remove(connection)
+		self._local.connection = None
+
+	def request(self, method: str, path: str, query: Dict | None = None, body: Dict | None = None, expected: Tuple[int, ...] = (200, 201, 204)) -> Tuple[int, bytes]:
+		url = f"/{DockerEngineClient.API_VERSION}{path}"
+		if query:
+			url += "?" + urlencode(query)
+		payload = json.dumps(body).encode() if body is not None else None
+		headers = {"Content-Type": "application/json"} if payload is not None else {}
+
+		with tracing.span("engine_api_request", "container_backend", method=method, path=path) as span_args:
+			while True:
+				connection, reused = self._connection()
+				sent = False
+				try:
+					connection.request(method, url, body=payload, headers=headers)
+					sent = True
+					response = connection.getresponse()
+					data = response.read()
+					if response.will_close:
+						self._reset_connection()
+					break
+				except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+					# The daemon closes idle keep-alive connections, retry once on a fresh one
+					# Once sent, the daemon might have acted on the request already, only idempotent ones are repeated (e.g., not a second exec or start)
+					self._reset_connection()
+					if not reused or (sent and method not in IDEMPOTENT_METHODS):
+						raise VegvisirContainerBackendException(f"Docker Engine API request [{method} {path}] failed | {e}")
+				except (OSError, http.client.HTTPException) as e:
+					self._reset_connection()
+					raise VegvisirContainerBackendException(f"Docker Engine API request [{method} {path}] failed | {e}")
+			span_args["status"] = response.status
+
+		if response.status not in expected:
+			try:
+				message = json.loads(data).get("message", "")
+			except (ValueError, AttributeError):
+				message = data.decode("utf-8", errors="replace")
+			raise VegvisirContainerBackendException(f"Docker Engine API request [{method} {path}] returned {response.status} | {message}")
+		return response.status, data
+
+	def request_json(self, method: str, path: str, query: Dict | None = None, body: Dict | None = None, expected: Tuple[int, ...] = (200, 201, 204)):
+		status, data = self.request(method, path, query, body, expected)
+		return status, (json.loads(data) if len(data) > 0 else None)
+
+	def close(self) -> None:
+		"""
+		Close the connections of every thread, not just the calling one
+		"""
+		with self._lock:
+			for connection in self._connections:
+				connection.close()
+			self._connections = []
+		self._local = threading.local()
+
+
+class EngineLogFollower(LogFollower):
+	"""
+	Follows a container log over a dedicated connection, a follow stream occupies its connection until the container stops
+	"""
+
+	def __init__(self, client: DockerEngineClient, container: str, tty: bool, destination: str, since: datetime | None = None) -> None:
+		super().__init__(destination)
+		self.client = client
+		self.container = container
+		self.tty = tty
+		self.since = since
+		self.connection = UnixHTTPConnection(client.socket_path, timeout=None)
+		self.thread = threading.Thread(target=self._follow, daemon=True)
+		self.thread.start()
+
+	def _follow(self) -> None:
+		query = {"follow": 1, "stdout": 1, "stderr": 1, "timestamps": 1}
+		if self.since is not None:
+			query["since"] = f"{self.since.timestamp():.6f}"
+		try:
+			with open(self.destination, "ab") as output:
+				self.connection.request("GET", f"/{DockerEngineClient.API_VERSION}/containers/{quote(self.container)}/logs?{urlencode(query)}")
+				response = self.connection.getresponse()
+				if response.status != 200:
+					output.write(f"Could not follow log of container [{self.container}] | {response.status} {response.read().decode('utf-8', errors='replace')}\n".encode())
+					return
+				# Multiplexed frames can be split over reads, partial frames are kept until complete
+				pending = b""
+				while True:
+					chunk = response.read1(65536)
+					if not chunk:
+						break
+					if self.tty:
+						output.write(chunk)
+						continue
+					pending += chunk
+					while len(pending) >= 8:
+						_, size = struct.unpack(">BxxxL", pending[:8])
+						if len(pending) < 8 + size:
+							break
+						output.write(pending[8:8 + size])
+						pending = pending[8 + size:]
+		except (OSError, ValueError, http.client.HTTPException):
+			pass  # Stopping the follower closes the connection underneath the read
+		finally:
+			self.connection.close()
+
+	def stop(self, timeout: float = 0.0) -> None:
+		self.thread.join(timeout)
+		if self.thread.is_alive():
+			if self.connection.sock is not None:
+				try:
+					self.connection.sock.shutdown(socket.SHUT_RDWR)
+				except OSError:
+					pass
+			self.thread.join()
+
+
+class ContainerProcess:
+	"""
+	Process-like handle of a running container
+	Sensors treat it exactly like the subprocess.Popen of "docker compose up"
+	With abort_on_container_exit the handle exits as soon as any container of the project exits, stopping the others
+	"""
+
+	def __init__(self, backend: "DockerEngineBackend", project: ComposeProject, container: str, abort_on_container_exit: bool, log_follower: EngineLogFollower | None = None) -> None:
+		self.backend = backend
+		self.project = project
+		self.container = container
+		self.abort_on_container_exit = abort_on_container_exit
+		self.log_follower = log_follower
+		self.returncode: int | None = None
+		self.pid = None
+
+	def poll(self) -> int | None:
+		if self.returncode is not None:
+			return self.returncode
+		state = self.backend._container_state(self.container)
+		if state is None:
+			self.returncode = -1
+		elif not state.get("Running", False):
+			self.returncode = state.get("ExitCode", 0)
+		elif self.abort_on_container_exit:
+			for container in self.backend._project_containers(self.project.name):
+				if container.get("State") != "running":
+					self.returncode = 0
+					self.backend._stop_containers(self.project.name, timeout=1)
+					break
+		return self.returncode
+
+	def wait(self, timeout: float | None = None) -> int:
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while self.poll() is None:
+			if deadline is not None and time.monotonic() > deadline:
+				raise subprocess.TimeoutExpired(self.container, timeout)
+			time.sleep(0.1)
+		# The log stream ends together with the container, a short grace period covers the last frames in flight
+		if self.log_follower is not None:
+			self.log_follower.stop(5)
+		return self.returncode
+
+	def terminate(self) -> None:
+		if self.returncode is not None:
+			return
+		if self.abort_on_container_exit:
+			self.backend._stop_containers(self.project.name, timeout=1)
+		else:
+			self.backend._stop_container(self.container, timeout=1)
+
+	def kill(self) -> None:
+		if self.returncode is None:
+			self.backend.client.request("POST", f"/containers/{quote(self.container)}/kill", expected=(204, 404, 409))
+
+	def communicate(self, input=None, timeout: float | None = None) -> Tuple[bytes, bytes]:
+		self.wait(timeout)
+		return b"", b""
+
+
+class DockerEngineBackend(BaseContainerBackend):
+	"""
+	Controls containers by talking to the Docker Engine API directly over its unix socket
+	Networks and containers are created from the topology in docker-compose.yml, interpolated with the project variables
+	"""
+
+	def __init__(self, host_interface: HostInterface, socket_path: str | None = None, compose_file: str = COMPOSE_FILE) -> None:
+		super().__init__(host_interface, socket_path or DEFAULT_DOCKER_SOCKET)
+		self.backend_name = "engine-api"
+		self.client = DockerEngineClient(self.socket_path)
+		self.compose_file = compose_file
+		self._topology: ComposeTopology | None = None
+		self.logger = logging.getLogger("root.Experiment.EngineBackend")
+
+	@property
+	def topology(self) -> ComposeTopology:
+		if self._topology is None:
+			self._topology = ComposeTopology(self.compose_file)
+		return self._topology
+
+	def is_available(self) -> bool:
+		try:
+			_, data = self.client.request("GET", "/_ping")
+			self.topology
+		except VegvisirContainerBackendException as e:
+			self.logger.warning(f"Docker Engine API backend unavailable | {e}")
+			return False
+		return data.strip() == b"OK"
+
+	def _container_name(self, project: ComposeProject, service: str, definition: Dict) -> str:
+		return definition.get("container_name") or f"{project.name}-{service}-1"
+
+	def _network_name(self, project: ComposeProject, network: str, definition: Dict) -> str:
+		return definition.get("name") or f"{project.name}_{network}"
+
+	def _container_state(self, container: str) -> Dict | None:
+		status, inspect = self.client.request_json("GET", f"/containers/{quote(container)}/json", expected=(200, 404))
+		return None if status == 404 else inspect.get("State", {})
+
+	def _project_containers(self, project_name: str) -> List[Dict]:
+		filters = json.dumps({"label": [f"{LABEL_PROJECT}={project_name}"]})
+		_, containers = self.client.request_json("GET", "/containers/json", {"all": 1, "filters": filters})
+		return containers or []
+
+	def _stop_container(self, container: str, timeout: int = 10) -> None:
+		# Not modified (304) and missing containers (404) are fine, stopping is idempotent
+		self.client.request("POST", f"/containers/{quote(container)}/stop", {"t": timeout}, expected=(204, 304, 404))
+
+	def _stop_containers(self, project_name: str, timeout: int = 10) -> List[Dict]:
+		"""
+		Signal all containers of a project at once, only then wait for them, like docker compose stops in parallel
+		"""
+		containers = self._project_containers(project_name)
+		running = [container for container in containers if container.get("State") == "running"]
+		for container in running:
+			_, inspect = self.client.request_json("GET", f"/containers/{container['Id']}/json", expected=(200, 404))
+			stop_signal = ((inspect or {}).get("Config") or {}).get("StopSignal") or "SIGTERM"
+			self.client.request("POST", f"/containers/{container['Id']}/kill", {"signal": stop_signal}, expected=(204, 404, 409))
+		deadline = time.monotonic() + timeout
+		for container in running:
+			while time.monotonic() < deadline:
+				state = self._container_state(container["Id"])
+				if state is None or not state.get("Running", False):
+					break
+				time.sleep(0.1)
+			else:
+				self.client.request("POST", f"/containers/{container['Id']}/kill", expected=(204, 404, 409))
+		return containers
+
+	def _remove_container(self, container: str) -> None:
+		self.client.request("DELETE", f"/containers/{quote(container)}", {"force": 1, "v": 1}, expected=(204, 404, 409))
+
+	def _ensure_network(self, project: ComposeProject, network: str, definition: Dict) -> str:
+		name = self._network_name(project, network, definition)
+		status, _ = self.client.request("GET", f"/networks/{quote(name)}", expected=(200, 404))
+		if status == 200:
+			return name
+		ipam = definition.get("ipam") or {}
+		body = {
+			"Name": name,
+			"CheckDuplicate": True,
+			"Driver": definition.get("driver", "bridge"),
+			"Options": {key: str(value) for key, value in (definition.get("driver_opts") or {}).items()},
+			"EnableIPv6": bool(definition.get("enable_ipv6", False)),
+			"Internal": bool(definition.get("internal", False)),
+			"IPAM": {
+				"Driver": ipam.get("driver", "default"),
+				"Config": [{"Subnet": entry["subnet"]} for entry in ipam.get("config") or [] if "subnet" in entry],
+			},
+			"Labels": {LABEL_PROJECT: project.name, LABEL_NETWORK: network},
+		}
+		self.client.request("POST", "/networks/create", body=body, expected=(201, 409))
+		return name
+
+	def _endpoint_config(self, service: str, network_definition: Dict | None) -> Dict:
+		network_definition = network_definition or {}
+		ipam = {}
+		if network_definition.get("ipv4_address"):
+			ipam["IPv4Address"] = network_definition["ipv4_address"]
+		if network_definition.get("ipv6_address"):
+			ipam["IPv6Address"] = network_definition["ipv6_address"]
+		return {"IPAMConfig": ipam, "Aliases": [service] + list(network_definition.get("aliases") or [])}
+
+	def _container_body(self, project: ComposeProject, service: str, definition: Dict, network_names: Dict[str, str]) -> Dict:
+		environment = []
+		env_files = definition.get("env_file") or []
+		for env_file in ([env_files] if isinstance(env_files, str) else env_files):
+			environment += read_env_file(self.topology.resolve_path(env_file))
+		service_environment = definition.get("environment") or []
+		if isinstance(service_environment, dict):
+			service_environment = [f"{key}={'' if value is None else value}" for key, value in service_environment.items()]
+		environment += service_environment
+
+		binds = []
+		for volume in definition.get("volumes") or []:
+			source, _, target = volume.partition(":")
+			if len(source) == 0:
+				raise VegvisirContainerBackendException(f"Compose service [{service}] has a volume without source [{volume}], is a path variable missing?")
+			if source.startswith(".") or source.startswith("/"):
+				source = self.topology.resolve_path(source)
+			binds.append(f"{source}:{target}")
+
+		ulimits = []
+		for name, value in (definition.get("ulimits") or {}).items():
+			soft, hard = (value.get("soft"), value.get("hard")) if isinstance(value, dict) else (value, value)
+			ulimits.append({"Name": name, "Soft": int(soft), "Hard": int(hard)})
+
+		networks = definition.get("networks") or {"default": None}
+		if isinstance(networks, list):
+			networks = {network: None for network in networks}
+		primary_network = next(iter(networks))
+
+		body = {
+			"Image": definition["image"],
+			"Tty": bool(definition.get("tty", False)),
+			"OpenStdin": bool(definition.get("stdin_open", False)),
+			"Env": environment,
+			"Labels": {LABEL_PROJECT: project.name, LABEL_SERVICE: service, LABEL_ONEOFF: "False"},
+			"ExposedPorts": {(str(port) if "/" in str(port) else f"{port}/tcp"): {} for port in definition.get("expose") or []},
+			"HostConfig": {
+				"Binds": binds,
+				"CapAdd": definition.get("cap_add") or [],
+				"Ulimits": ulimits,
+				"ExtraHosts": definition.get("extra_hosts") or [],
+				"NetworkMode": network_names[primary_network],
+			},
+			"NetworkingConfig": {
+				"EndpointsConfig": {network_names[primary_network]: self._endpoint_config(service, networks[primary_network])},
+			},
+		}
+		if definition.get("hostname"):
+			body["Hostname"] = definition["hostname"]
+		return body
+
+	def _pull_image(self, image: str) -> None:
+		self.logger.info(f"Pulling image [{image}]")
+		_, data = self.client.request("POST", "/images/create", {"fromImage": image})
+		for line in data.splitlines():
+			try:
+				progress = json.loads(line)
+			except ValueError:
+				continue
+			if "error" in progress:
+				raise VegvisirContainerBackendException(f"Could not pull image [{image}] | {progress['error']}")
+
+	def _create_and_start(self, project: ComposeProject, service: str, definition: Dict, networks: Dict[str, Dict]) -> str:
+		service_networks = definition.get("networks") or {"default": None}
+		if isinstance(service_networks, list):
+			service_networks = {network: None for network in service_networks}
+		network_names = {network: self._ensure_network(project, network, networks.get(network) or {}) for network in service_networks}
+
+		body = self._container_body(project, service, definition, network_names)
+		config_hash = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+		body["Labels"][LABEL_CONFIG_HASH] = config_hash
+		name = self._container_name(project, service, definition)
+
+		# Same as docker compose, a running container with an unchanged configuration is kept
+		status, inspect = self.client.request_json("GET", f"/containers/{quote(name)}/json", expected=(200, 404))
+		if status == 200:
+			if inspect["Config"]["Labels"].get(LABEL_CONFIG_HASH) == config_hash and inspect["State"].get("Running", False):
+				return name
+			self._stop_container(name)
+			self._remove_container(name)
+
+		status, _ = self.client.request_json("POST", "/containers/create", {"name": name}, body, expected=(201, 404))
+		if status == 404:
+			self._pull_image(body["Image"])
+			self.client.request_json("POST", "/containers/create", {"name": name}, body)
+		for network in list(service_networks.keys())[1:]:
+			self.client.request("POST", f"/networks/{quote(network_names[network])}/connect", body={
+				"Container": name,
+				"EndpointConfig": self._endpoint_config(service, service_networks[network]),
+			})
+		self.client.request("POST", f"/containers/{quote(name)}/start", expected=(204, 304))
+		return name
+
+	def _start_services(self, project: ComposeProject, services: List[str], with_dependencies: bool) -> List[str]:
+		service_definitions = self.topology.services(project.variables)
+		networks = self.topology.networks(project.variables)
+		ordered = self.topology.dependency_order(service_definitions, services) if with_dependencies else services
+		return [self._create_and_start(project, service, service_definitions[service], networks) for service in ordered]
+
+	def up(self, project: ComposeProject, services: List[str]) -> Tuple[str, str]:
+		started = self._start_services(project, services, True)
+		return "\n".join(f"Container {name} Started" for name in started), ""
+
+	def run(self, project: ComposeProject, service: str, abort_on_container_exit: bool, log_destination: str | None = None) -> ContainerProcess:
+		container = self._start_services(project, [service], abort_on_container_exit)[-1]
+		log_follower = None
+		if log_destination is not None:
+			tty = self.topology.services(project.variables)[service].get("tty", False)
+			log_follower = EngineLogFollower(self.client, container, tty, log_destination)
+		return ContainerProcess(self, project, container, abort_on_container_exit, log_follower)
+
+	def logs(self, project: ComposeProject, service: str, since: datetime | None = None) -> Tuple[str, str]:
+		definition = self.topology.services(project.variables).get(service, {})
+		name = self._container_name(project, service, definition)
+		query = {"stdout": 1, "stderr": 1, "timestamps": 1}
+		if since is not None:
+			query["since"] = f"{since.timestamp():.6f}"
+		status, data = self.client.request("GET", f"/containers/{quote(name)}/logs", query, expected=(200, 404))
+		if status == 404:
+			return "", f"No such container: {name}"
+		if definition.get("tty", False):
+			return data.decode("utf-8", errors="replace").strip(), ""
+		stdout, stderr = self._demultiplex(data)
+		return stdout.decode("utf-8", errors="replace").strip(), stderr.decode("utf-8", errors="replace").strip()
+
+	def follow_logs(self, project: ComposeProject, service: str, destination: str, since: datetime | None = None) -> LogFollower:
+		definition = self.topology.services(project.variables).get(service, {})
+		return EngineLogFollower(self.client, self._container_name(project, service, definition), definition.get("tty", False), destination, since)
+
+	def _demultiplex(self, data: bytes) -> Tuple[bytes, bytes]:
+		"""
+		Containers without TTY multiplex their output, every frame has an 8 byte header [stream, 0, 0, 0, size (4 bytes, big endian)]
+		"""
+		streams = {1: bytearray(), 2: bytearray()}
+		offset = 0
+		while offset + 8 <= len(data):
+			stream, size = struct.unpack(">BxxxL", data[offset:offset + 8])
+			streams.get(stream, streams[1]).extend(data[offset + 8:offset + 8 + size])
+			offset += 8 + size
+		return bytes(streams[1]), bytes(streams[2])
+
+	def remove(self, project: ComposeProject, service: str) -> Tuple[str, str]:
+		definition = self.topology.services(project.variables).get(service, {})
+		name = self._container_name(project, service, definition)
+		self._stop_container(name)
+		self._remove_container(name)
+		return f"Container {name} Removed", ""
+
+	def exec_detached(self, project: ComposeProject, service: str, command: List[str]) -> Tuple[str, str]:
+		definition = self.topology.services(project.variables).get(service, {})
+		name = self._container_name(project, service, definition)
+		try:
+			_, execution = self.client.request_json("POST", f"/containers/{quote(name)}/exec", body={"Cmd": command, "AttachStdout": False, "AttachStderr": False})
+			self.client.request("POST", f"/exec/{execution['Id']}/start", body={"Detach": True})
+		except VegvisirContainerBackendException as e:
+			return "", str(e)
+		return "", ""
+
+	def down(self, project: ComposeProject) -> Tuple[str, str]:
+		containers = self._stop_containers(project.name)
+		for container in containers:
+			self._remove_container(container["Id"])
+		filters = json.dumps({"label": [f"{LABEL_PROJECT}={project.name}"]})
+		_, networks = self.client.request_json("GET", "/networks", {"filters": filters})
+		for network in networks or []:
+			self.client.request("DELETE", f"/networks/{network['Id']}", expected=(204, 404))
+		removed = [f"Container {name.lstrip('/')} Removed" for container in containers for name in container.get("Names", [])[:1]]
+		removed += [f"Network {network['Name']} Removed" for network in networks or []]
+		return "\n".join(removed), ""
+
+	def version(self) -> str:
+		_, version = self.client.request_json("GET", "/version")
+		components = ", ".join(f"{component.get('Name')} {component.get('Version')}" for component in version.get("Components") or [])
+		return f"Docker Engine API [{self.socket_path}] | Server {version.get('Version')} (API {version.get('ApiVersion')}, {version.get('Os')}/{version.get('Arch')}) | {components}"
+
+	def image_id(self, image: str) -> str | None:
+		status, data = self.client.request("GET", f"/images/{quote(image)}/json", expected=(200, 404))
+		if status == 404:
+			return None
+		return json.loads(data).get("Id")
+
+	def container_pid(self, project: ComposeProject, service: str) -> int | None:
+		definition = self.topology.services(project.variables).get(service, {})
+		state = self._container_state(self._container_name(project, service, definition))
+		if state is None or not state.get("Running", False) or state.get("Pid", 0) == 0:
+			return None
+		return state["Pid"]
+
+	def close(self) -> None:
+		self.client.close()
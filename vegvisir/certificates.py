@@ -0,0 +1,200 @@
+import base64
+import datetime
+from enum import Enum
+import hashlib
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from vegvisir.exceptions import VegvisirCertificateException
+
+try:
+	from cryptography import x509
+	from cryptography.hazmat.primitives import hashes, serialization
+	from cryptography.hazmat.primitives.asymmetric import ec, rsa
+	from cryptography.x509.oid import NameOID
+	CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+	CRYPTOGRAPHY_AVAILABLE = False
+
+# Files every chain directory contains, identical to the output of certs.sh
+CERT_CHAIN_FILES = ["ca.pem", "cert.pem", "priv.key"]
+SERVER_NAMES = ["server", "server4", "server6", "server46"]
+
+
+class KeyType(Enum):
+	RSA = "rsa"  # RSA-2048, same as certs.sh
+	ECDSA = "ecdsa"  # ECDSA P-256, considerably faster to generate and smaller on the wire
+
+
+def _generate_key(key_type: KeyType):
+	if key_type == KeyType.ECDSA:
+		return ec.generate_private_key(ec.SECP256R1())
+	return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _sign_certificate(subject: str, public_key, issuer_name, issuer_key, issuer_public_key, is_ca: bool):
+	now = datetime.datetime.now(datetime.timezone.utc)
+	builder = (
+		x509.CertificateBuilder()
+		.subject_name(x509.Name([x509.NameAttribute(NameOID.ORGANIZATION_NAME, subject)]))
+		.issuer_name(issuer_name)
+		.public_key(public_key)
+		.serial_number(x509.random_serial_number())
+		.not_valid_before(now)
+		.not_valid_after(now + datetime.timedelta(days=365))
+		.add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False)
+		.add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(issuer_public_key), critical=False)
+	)
+	if is_ca:
+		# Mirrors the v3_ca section of cert_config.txt
+		builder = builder.add_extension(x509.BasicConstraints(ca=True, path_length=100), critical=True)
+		builder = builder.add_extension(x509.KeyUsage(
+			digital_signature=False, content_commitment=False, key_encipherment=False, data_encipherment=False,
+			key_agreement=False, key_cert_sign=True, crl_sign=False, encipher_only=False, decipher_only=False,
+		), critical=True)
+	else:
+		builder = builder.add_extension(x509.SubjectAlternativeName([x509.DNSName(name) for name in SERVER_NAMES]), critical=False)
+	return builder.sign(issuer_key, hashes.SHA256())
+
+
+def spki_fingerprint(certificate_pem: bytes) -> str:
+	"""
+	Base64 encoded SHA-256 hash of the SubjectPublicKeyInfo, the format Chrome expects in --ignore-certificate-errors-spki-list
+	"""
+	certificate = x509.load_pem_x509_certificate(certificate_pem)
+	spki = certificate.public_key().public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+	return base64.b64encode(hashlib.sha256(spki).digest()).decode()
+
+
+def generate_cert_chain_in_process(directory: str, length: int = 1, key_type: KeyType = KeyType.RSA) -> str:
+	"""
+	Same chain as certs.sh: a root CA, length - 1 intermediates and a leaf for the server names
+	Returns the SPKI fingerprint of the leaf
+	"""
+	if length < 1:
+		raise VegvisirCertificateException("Certificate chain length must be at least 1.")
+	os.makedirs(directory, exist_ok=True)
+
+	root_key = _generate_key(key_type)
+	root_name = x509.Name([x509.NameAttribute(NameOID.ORGANIZATION_NAME, "interop runner Root Certificate Authority")])
+	root = _sign_certificate("interop runner Root Certificate Authority", root_key.public_key(), root_name, root_key, root_key.public_key(), True)
+
+	chain = []
+	issuer, issuer_key = root, root_key
+	for index in range(1, length + 1):
+		is_leaf = index == length
+		key = _generate_key(key_type)
+		certificate = _sign_certificate("interop runner leaf" if is_leaf else f"interop runner intermediate {index}", key.public_key(), issuer.subject, issuer_key, issuer_key.public_key(), not is_leaf)
+		chain.append(certificate)
+		issuer, issuer_key = certificate, key
+
+	leaf_pem = chain[-1].public_bytes(serialization.Encoding.PEM)
+	with open(os.path.join(directory, "ca.pem"), "wb") as fp:
+		fp.write(root.public_bytes(serialization.Encoding.PEM))
+	with open(os.path.join(directory, "cert.pem"), "wb") as fp:
+		# Leaf first, followed by the intermediates towards the root
+		for certificate in reversed(chain):
+			fp.write(certificate.public_bytes(serialization.Encoding.PEM))
+	with open(os.path.join(directory, "priv.key"), "wb") as fp:
+		fp.write(issuer_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+	return spki_fingerprint(leaf_pem)
+
+
+def generate_cert_chain_with_scripts(directory: str, length: int = 1) -> str:
+	"""
+	Legacy chain generation with certs.sh and certs-fingerprint.sh, RSA only
+	"""
+	cmd = "./certs.sh " + directory + " " + str(length)
+	r = subprocess.run(
+		cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+	)
+	logging.debug("Vegvisir: %s", r.stdout.decode("utf-8"))
+	if r.returncode != 0:
+		raise VegvisirCertificateException("Unable to create certificates")
+	cmd = "./certs-fingerprint.sh " + directory
+	r = subprocess.run(
+		cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+	)
+	return r.stdout.decode("utf-8").strip()
+
+
+def generate_cert_chain(directory: str, length: int = 1, key_type: KeyType = KeyType.RSA) -> str:
+	"""
+	Generate a chain in directory and return the SPKI fingerprint of its leaf
+	Falls back to the openssl scripts when the cryptography package is not installed
+	"""
+	if CRYPTOGRAPHY_AVAILABLE:
+		return generate_cert_chain_in_process(directory, length, key_type)
+	if key_type != KeyType.RSA:
+		raise VegvisirCertificateException(f"Key type [{key_type.value}] requires the cryptography package.")
+	return generate_cert_chain_with_scripts(directory, length)
+
+
+class CertificatePool:
+	"""
+	Generates certificate chains ahead of time in a background thread
+	Every chain is handed out once, acquiring one only moves a few files
+	When the pool runs dry (e.g., many parallel slots), chains are generated on the spot instead of waiting
+	"""
+
+	def __init__(self, size: int = 4, length: int = 1, key_type: KeyType = KeyType.RSA) -> None:
+		self.size = max(1, size)
+		self.length = length
+		self.key_type = key_type
+		self.working_directory = tempfile.mkdtemp(dir="/tmp", prefix="vegvisir_certpool_")
+		self._chains: queue.Queue = queue.Queue(maxsize=self.size)  # contains tuples (directory, fingerprint)
+		self._request_stop = threading.Event()
+		self._thread: threading.Thread | None = None
+		self._counter = 0
+		self._counter_lock = threading.Lock()
+		self.logger = logging.getLogger("root.CertificatePool")
+
+	def start(self) -> None:
+		self._thread = threading.Thread(target=self._generator, daemon=True)
+		self._thread.start()
+
+	def _new_chain(self) -> tuple:
+		with self._counter_lock:
+			self._counter += 1
+			directory = os.path.join(self.working_directory, f"chain_{self._counter}")
+		return directory, generate_cert_chain(directory, self.length, self.key_type)
+
+	def _generator(self) -> None:
+		while not self._request_stop.is_set():
+			try:
+				chain = self._new_chain()
+			except Exception as e:
+				self.logger.error(f"Certificate pool could not generate a chain, chains will be generated on demand | {e}")
+				return
+			while not self._request_stop.is_set():
+				try:
+					self._chains.put(chain, timeout=0.5)
+					break
+				except queue.Full:
+					pass
+
+	def acquire(self, destination: str) -> str:
+		"""
+		Move a pre-generated chain into destination and return its SPKI fingerprint
+		"""
+		try:
+			directory, fingerprint = self._chains.get_nowait()
+		except queue.Empty:
+			self.logger.debug("Certificate pool empty, generating chain on demand")
+			directory, fingerprint = self._new_chain()
+		os.makedirs(destination, exist_ok=True)
+		for filename in CERT_CHAIN_FILES:
+			shutil.move(os.path.join(directory, filename), os.path.join(destination, filename))
+		shutil.rmtree(directory, ignore_errors=True)
+		return fingerprint
+
+	def stop(self) -> None:
+		self._request_stop.set()
+		if self._thread is not None:
+			self._thread.join()
+		shutil.rmtree(self.working_directory, ignore_errors=True)
@@ -1,21 +1,18 @@
 import argparse
 from datetime import datetime
 from getpass import getpass
+import json
 import logging
 import math
-import random
+import os
 import shutil
 import signal
 import sys
 import threading
 import time
 
-import colour
-
-from vegvisir.configuration import Configuration
-from vegvisir.housekeeping import freeze_implementations_configuration, load_frozen_implementations
-
-from .. import runner, exceptions, __version__ as vegvisir_version
+# Subcommands import the modules they need themselves, `vegvisir --version` and `--help` only pay for argparse
+from .. import exceptions, __version__ as vegvisir_version
 
 # Globals
 '''
@@ -52,7 +49,7 @@ control_sequences = {
     "COLOR": "\x1B[38;2;{r};{g};{b}m",
     "CLEAR_COLOR": "\x1B[0m",
 }
-tui_columns, tui_lines = shutil.get_terminal_size()
+tui_columns, tui_lines = 0, 0  # Measured when the TUI is constructed
 tui_tick_counter = 0  # Used and controlled by tui animations
 tui_start_timestamp = None  # Controlled by the main method, used as a postfix in the progressbar
 tui_client_name = tui_shaper_name = tui_server_name = "unknown"
@@ -89,7 +86,8 @@ def configure_logging():
     console_handler.setFormatter(console_formatter)
     logger.addHandler(console_handler)
     return logger, console_handler
-logger, console_handler = configure_logging()
+logger = logging.getLogger()
+console_handler = None  # Set up by main, importing the CLI leaves logging untouched
 
 def flush_print(s):
     sys.stdout.write(s)
@@ -147,6 +145,9 @@ def generate_banner(fancy_print=True):
     if not fancy_print:
         return banner
 
+    import random
+    import colour
+
     gradients = [
         ("#f43b47", "#453a94"),
         ("#9796f0", "#fbc7d4"),
@@ -254,15 +255,25 @@ def tui_render_tick():
         time.sleep(tui_tick_delta_sec)
 
 def run(vegvisir_arguments):
-    global tui_start_timestamp, tui_client_name, tui_shaper_name, tui_server_name, tui_progress_current, tui_progress_total, tui_threads_run
+    global tui_start_timestamp, tui_client_name, tui_shaper_name, tui_server_name, tui_progress_current, tui_progress_total, tui_threads_run, tui_columns, tui_lines
+    from vegvisir import runner
+    from vegvisir.configuration import Configuration
 
     implementations_path = vegvisir_arguments.implementations
     experiment_path = vegvisir_arguments.experiment
+    resume_path = vegvisir_arguments.resume
+    if resume_path is not None:
+        # Resumed experiments default to the configuration copies made when they were first started
+        implementations_path = implementations_path or os.path.join(resume_path, "implementations.json")
+        experiment_path = experiment_path or os.path.join(resume_path, "experiment.json")
+    implementations_path = implementations_path or "./implementations.json"
+    experiment_path = experiment_path or "./experiment.json"
 
     flush_print((
         f"{control_sequences['ERASE_ALL']}"
         f"{control_sequences['SET_CURSOR_POSITION'].format(column=1, row=1)}"
     ))
+    tui_columns, tui_lines = shutil.get_terminal_size()
     construct_tui()
     signal.signal(signal.SIGWINCH, calculate_and_set_screen_size)
     signal.signal(signal.SIGINT, sigint_handler)
@@ -280,7 +291,7 @@ def run(vegvisir_arguments):
         # r.load_experiment_from_file(experiment_path)
         # r.load_experiment_from_file("test_run2.json")
         # r.load_experiment_from_file("test_run.json")
-        for experiment in r.run():
+        for experiment in r.run(resume_log_path=resume_path, force=vegvisir_arguments.force):
             tui_client_name, tui_shaper_name, tui_server_name, tui_progress_current, tui_progress_total = experiment
     except exceptions.VegvisirConfigurationException as e:
         logger.error("Vegvisir generic configuration error, halting execution")
@@ -312,6 +323,8 @@ def run(vegvisir_arguments):
     logger.info(f"Vegvisir experiment finished. Total elapsed time {datetime.now()-tui_start_timestamp}")
 
 def freeze(vegvisir_arguments):
+    from vegvisir.configuration import Configuration
+    from vegvisir.housekeeping import freeze_implementations_configuration
     print(generate_banner())
     implementations_file = vegvisir_arguments.implementations
     try:
@@ -333,6 +346,7 @@ def freeze(vegvisir_arguments):
         sys.exit(1)
 
 def load(vegvisir_arguments):
+    from vegvisir.housekeeping import load_frozen_implementations
     print(generate_banner())
     try:
         logger.info(f"Starting load of archive [{vegvisir_arguments.archive}]")
@@ -341,6 +355,48 @@ def load(vegvisir_arguments):
     except exceptions.VegvisirFreezeException as e:
         logging.error(e)
 
+def netlog(vegvisir_arguments):
+    from vegvisir import netlog as netlog_module
+    print(generate_banner())
+    netlog_path = vegvisir_arguments.netlog
+    try:
+        logger.info(f"Converting net-log [{netlog_path}]")
+        events_path = netlog_module.convert_to_indexed(netlog_path, vegvisir_arguments.output)
+        timings = netlog_module.extract_timings(netlog_path)
+        timings_path = os.path.splitext(events_path)[0] + ".timings.json"
+        with open(timings_path, "w") as fp:
+            json.dump(timings, fp, indent=4)
+        if timings["truncated"]:
+            logger.warning("Net-log ends halfway through an event, converted the events before it")
+        logger.info(f"Wrote indexed events to [{events_path}] and the timings of {len(timings['quic_sessions'])} QUIC sessions and {len(timings['requests'])} requests to [{timings_path}]")
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not convert net-log [{netlog_path}]")
+        logger.error(e)
+        sys.exit(1)
+
+def index(vegvisir_arguments):
+    import sqlite3
+    from vegvisir.resultsindex import INDEX_FILE, ResultsIndex
+    print(generate_banner())
+    log_directory = vegvisir_arguments.log_directory
+    database_path = vegvisir_arguments.database or os.path.join(log_directory, INDEX_FILE)
+    try:
+        results_index = ResultsIndex(database_path)
+        try:
+            if not vegvisir_arguments.skip_update:
+                started = time.monotonic()
+                experiments, runs = results_index.index_tree(log_directory, vegvisir_arguments.rebuild)
+                logger.info(f"Indexed {runs} new or updated run(s) of {experiments} experiment(s) in [{log_directory}] into [{database_path}] in {time.monotonic() - started:.2f}s")
+            if vegvisir_arguments.query is not None:
+                for row in results_index.query(vegvisir_arguments.query):
+                    print("\t".join("" if value is None else str(value) for value in row))
+        finally:
+            results_index.close()
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Could not index [{log_directory}] into [{database_path}]")
+        logger.error(e)
+        sys.exit(1)
+
 class SubcommandHelpFormatter(argparse.RawDescriptionHelpFormatter):
     # https://stackoverflow.com/a/13429281
     # Removes the metavar help line for an overall cleaner experience
@@ -350,29 +406,51 @@ class SubcommandHelpFormatter(argparse.RawDescriptionHelpFormatter):
             parts = "\n".join(parts.split("\n")[1:])
         return parts
 
+class BannerArgumentParser(argparse.ArgumentParser):
+    # The banner is only rendered when help is printed, parsing the arguments does not need it
+    def format_help(self):
+        if self.description is None:
+            self.description = generate_banner()
+        return super().format_help()
+
 def main():
-    argument_parser = argparse.ArgumentParser(prog="vegvisir", description=generate_banner(), formatter_class=SubcommandHelpFormatter)
+    global logger, console_handler
+    argument_parser = BannerArgumentParser(prog="vegvisir", formatter_class=SubcommandHelpFormatter)
     argument_parser.add_argument("-V", "--version", action="version", version=f"Vegvisir V{vegvisir_version}")
     argument_parser.add_argument("-v", "--verbose", action="store_true", help="Enable additional debug logs to be printed to the commandline")
     argument_subparsers = argument_parser.add_subparsers(title="Commands", metavar="[COMMAND]", dest="command")
 
-    experiment_parser = argument_subparsers.add_parser("run", aliases=["r"], help="Run an experiment using Vegvisir", description=generate_banner(), formatter_class=argparse.RawTextHelpFormatter)
-    experiment_parser.add_argument("-i", "--implementations",  dest="implementations", metavar="[IMPLEMENTATIONS FILE]", help="Defaults to ./implementations.json", default="./implementations.json")
+    experiment_parser = argument_subparsers.add_parser("run", aliases=["r"], help="Run an experiment using Vegvisir", formatter_class=argparse.RawTextHelpFormatter)
+    experiment_parser.add_argument("-i", "--implementations",  dest="implementations", metavar="[IMPLEMENTATIONS FILE]", help="Defaults to ./implementations.json, or the copy in the log directory when resuming", default=None)
     experiment_parser.add_argument("-q", "--quiet", action="store_true", help="Only print critical warnings and errors. Logs will still be saved to the log directory.")
-    experiment_parser.add_argument("experiment", metavar="[EXPERIMENT FILE]", default="./experiment.json")
+    experiment_parser.add_argument("-f", "--force", action="store_true", help="Run every permutation, even when identical earlier results are available in the result cache")
+    experiment_parser.add_argument("-r", "--resume", dest="resume", metavar="[LOG DIRECTORY]", help="Continue an interrupted experiment in its log directory, completed runs are skipped", default=None)
+    experiment_parser.add_argument("experiment", metavar="[EXPERIMENT FILE]", nargs="?", help="Defaults to ./experiment.json, or the copy in the log directory when resuming", default=None)
 
-    freeze_parser = argument_subparsers.add_parser("freeze", aliases=["f"], help="Freeze a set of docker images defined in the provided implementations file using docker save", description=generate_banner(), formatter_class=argparse.RawTextHelpFormatter)
+    freeze_parser = argument_subparsers.add_parser("freeze", aliases=["f"], help="Freeze a set of docker images defined in the provided implementations file using docker save", formatter_class=argparse.RawTextHelpFormatter)
     freeze_parser.add_argument("-i", "--implementations",  dest="implementations", metavar="[IMPLEMENTATIONS FILE]", help="Defaults to ./implementations.json", default="./implementations.json")
     # freeze_parser.add_argument("out", metavar="OUT", help="Filename for the frozen archive")
 
-    load_parser = argument_subparsers.add_parser("load", aliases=["l"], help="Load a frozen archive", description=generate_banner(), formatter_class=argparse.RawTextHelpFormatter)
+    load_parser = argument_subparsers.add_parser("load", aliases=["l"], help="Load a frozen archive", formatter_class=argparse.RawTextHelpFormatter)
     load_parser.add_argument("archive", metavar="[ARCHIVE FILE]")
 
+    netlog_parser = argument_subparsers.add_parser("netlog", aliases=["n"], help="Convert a Chrome net-log to an indexed format and extract its QUIC session and request timings", formatter_class=argparse.RawTextHelpFormatter)
+    netlog_parser.add_argument("-o", "--output", dest="output", metavar="[EVENTS FILE]", help="Defaults to the net-log path with the .events extension", default=None)
+    netlog_parser.add_argument("netlog", metavar="[NET-LOG FILE]")
+
+    index_parser = argument_subparsers.add_parser("index", aliases=["i"], help="Add the runs of all experiments in a log directory to the SQLite results index", formatter_class=argparse.RawTextHelpFormatter)
+    index_parser.add_argument("-d", "--database", dest="database", metavar="[DATABASE FILE]", help="Defaults to results.sqlite in the log directory", default=None)
+    index_parser.add_argument("--rebuild", action="store_true", help="Index every run again, also those that did not change since they were indexed")
+    index_parser.add_argument("--skip-update", dest="skip_update", action="store_true", help="Only run the query, without indexing new runs first")
+    index_parser.add_argument("-q", "--query", dest="query", metavar="[SQL]", help="Print the rows of a query on the index, tab separated", default=None)
+    index_parser.add_argument("log_directory", metavar="[LOG DIRECTORY]", nargs="?", help="Defaults to ./logs", default="./logs")
+
     # Future work
-    # share_parser = argument_subparsers.add_parser("share", aliases=["s"], help="Generate a compressed file containing the results of an experiment", description=generate_banner(), formatter_class=argparse.RawTextHelpFormatter)
+    # share_parser = argument_subparsers.add_parser("share", aliases=["s"], help="Generate a compressed file containing the results of an experiment", formatter_class=argparse.RawTextHelpFormatter)
     # share_parser.add_argument("experiment", metavar="[EXPERIMENT FILE]", default="./experiment.json")
 
     vegvisir_arguments = argument_parser.parse_args()
+    logger, console_handler = configure_logging()
     if vegvisir_arguments.verbose:
         console_handler.setLevel(logging.DEBUG)
         logger.debug("Verbose output requested. Console logger set to debug-level.")
@@ -381,10 +459,14 @@ def main():
         "r": run,
         "f": freeze,
         "l": load,
+        "n": netlog,
+        "i": index,
         # "s": lambda _: None,  # Future work
         "run": run,
         "freeze": freeze,
         "load": load,
+        "netlog": netlog,
+        "index": index,
         # "share": lambda _: None,  # Future work
     }
 
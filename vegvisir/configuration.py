@@ -1,12 +1,19 @@
 import json
 import logging
 import os
-from typing import Dict, List, Set
-from vegvisir import environments
+from typing import Dict, List
+from vegvisir import backends, environments
+from vegvisir.adaptive import AdaptiveIterations
+from vegvisir.certificates import KeyType
 from vegvisir.data import ExperimentPaths, VegvisirArguments
 from vegvisir.environments.base_environment import BaseEnvironment
 from vegvisir.exceptions import VegvisirException, VegvisirArgumentException, VegvisirCommandException, VegvisirInvalidExperimentConfigurationException, VegvisirInvalidImplementationConfigurationException, VegvisirConfigurationException
-from vegvisir.implementation import DockerImage, Endpoint, HostCommand, Parameters, Scenario, Shaper
+from vegvisir.devtools import DEFAULT_ENDPOINT
+from vegvisir.implementation import DevToolsSession, DockerImage, Endpoint, HostCommand, Parameters, Scenario, Shaper
+from vegvisir.posthooks import PostHookExecutorType
+from vegvisir.resultsindex import INDEX_FILE
+from vegvisir.slot import Slot
+from vegvisir.sweep import ArgumentSweep, ConfigurationSweep
 
 
 class Configuration:
@@ -21,15 +28,33 @@ class Configuration:
 		self._server_endpoints: Dict[str, Endpoint] = {}
 		self._shapers: Dict[str, Shaper] = {}
 
-		self._client_configurations: List[Dict] = []
-		self._server_configurations: List[Dict] = []
-		self._shaper_configurations: List[Dict] = []
+		self._client_configurations = ConfigurationSweep()
+		self._server_configurations = ConfigurationSweep()
+		self._shaper_configurations = ConfigurationSweep()
 
 		self._www_path = None
 
 		self._iterations = 1
+		self.adaptive_iterations: AdaptiveIterations | None = None
+		self.hook_processor_count = 4
+		self.hook_executor_type = PostHookExecutorType.THREAD
+		self.parallel_slot_count = 1
+		self.reuse_containers = False
+		self.container_backend = backends.default_container_backend
+		self.docker_socket_path: str | None = None
+		self.cert_key_type = KeyType.RSA
+		self.reuse_cert_chain = False
+		self.result_cache_enabled = True
+		self.result_cache_path: str | None = None
+		self.overlap_teardown = True
+		self.qlog_analysis = False
+		self.results_index_enabled = True
+		self.results_index_path: str | None = None
+		self.privileged_helper = False
 
 		self._environment: BaseEnvironment = None
+		self._environment_name: str | None = None
+		self._environment_sensor_configurations: List[Dict] = []
 
 		self.logger = logging.getLogger("root.Configuration")
 
@@ -84,6 +109,16 @@ class Configuration:
 		self._validate_and_raise_load(self._experiment_configuration_loaded, "environment", "experiment")
 		return self._environment
 
+	@property
+	def environment_name(self):
+		self._validate_and_raise_load(self._experiment_configuration_loaded, "environment_name", "experiment")
+		return self._environment_name
+
+	@property
+	def environment_sensor_configurations(self):
+		self._validate_and_raise_load(self._experiment_configuration_loaded, "environment_sensor_configurations", "experiment")
+		return self._environment_sensor_configurations
+
 	@property
 	def path_collection(self):
 		# Patch collection requires self-checks on values
@@ -173,6 +208,27 @@ class Configuration:
 						collection.append(setup_command)
 				_load_and_dryrun_setup_command("construct", impl.construct)
 				_load_and_dryrun_setup_command("destruct", impl.destruct)
+
+				if "devtools" in configuration:
+					devtools = configuration["devtools"]
+					if implementation_type == Endpoint.Type.DOCKER:
+						raise VegvisirInvalidImplementationConfigurationException(f"Client [{client}] represents a containerized configuration, these can not contain a 'devtools' key.")
+					if type(devtools) is not dict:
+						raise VegvisirInvalidImplementationConfigurationException(f"Client [{client}] its 'devtools' key must be an object.")
+					url = devtools.get("url")
+					endpoint = devtools.get("endpoint", DEFAULT_ENDPOINT)
+					ignore_certificate_errors = devtools.get("ignore_certificate_errors", False)
+					if type(url) is not str:
+						raise VegvisirInvalidImplementationConfigurationException(f"Client [{client}] its devtools 'url' key is missing or not a string.")
+					if type(endpoint) is not str or not endpoint.startswith("http://"):
+						raise VegvisirInvalidImplementationConfigurationException(f"Client [{client}] its devtools 'endpoint' must be an http:// URL.")
+					if type(ignore_certificate_errors) is not bool:
+						raise VegvisirInvalidImplementationConfigurationException(f"Client [{client}] its devtools 'ignore_certificate_errors' key must be a boolean.")
+					impl.devtools = DevToolsSession(url, endpoint, ignore_certificate_errors)
+					try:
+						impl.devtools.serialize_url(parameters.hydrate_with_empty_arguments())
+					except VegvisirArgumentException as e:
+						raise VegvisirInvalidImplementationConfigurationException(f"Client [{client}] devtools url [{url}] contains unknown parameters, dry run failed => {e}")
 			
 			if not impl:
 				raise VegvisirInvalidImplementationConfigurationException(f"Client [{client}] does not contain an 'image' or 'command' entry.")
@@ -200,7 +256,10 @@ class Configuration:
 					impl.scenarios[scenario] = Scenario(contents, Parameters())
 				elif contents.get("command") and contents.get("parameters"):
 					parameters = Parameters(contents.get("parameters", []))
-					impl.scenarios[scenario] = Scenario(contents["command"], parameters)
+					reconfigurable = contents.get("reconfigurable", False)
+					if type(reconfigurable) is not bool:
+						raise VegvisirInvalidImplementationConfigurationException(f"Shaper [{shaper}] scenario [{scenario}] its 'reconfigurable' key must be a boolean.")
+					impl.scenarios[scenario] = Scenario(contents["command"], parameters, reconfigurable)
 				else:
 					raise VegvisirInvalidImplementationConfigurationException(f"Shaper [{shaper}] scenario [{scenario}] is not a string or does not contain a 'command' and 'parameters' key. Ignoring scenario entry.")
 			self._shapers[shaper] = impl
@@ -270,12 +329,18 @@ class Configuration:
 						raise VegvisirInvalidExperimentConfigurationException(f"Shaper [{shaper_configuration['name']}] is missing required parameters {missing_required_parameters} | The following arguments were unknown and ignored {invalid_parameters}")
 					raise VegvisirInvalidExperimentConfigurationException(f"Shaper [{shaper_configuration['name']}] is missing required parameters {missing_required_parameters}")
 
-		def _duplicate_check(name: str, log_name: str | None, entries: Set[str], debug_str: str):
-			if log_name is not None:
-				if log_name in entries:
-					raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] its log name [{log_name}] is not unique.")
-			else:
-				if name in entries:
+		def _duplicate_check(sweep: ArgumentSweep, entries: List[ArgumentSweep], debug_str: str):
+			"""
+			Expanded log names of an entry must differ from those of the entries before it, the smaller sweep is expanded and looked up in the other
+			"""
+			name = sweep.configuration["name"]
+			for entry in entries:
+				smaller, larger = sorted([sweep, entry], key=len)
+				for log_name in smaller.log_names():
+					if not larger.produces(log_name):
+						continue
+					if sweep.log_name is not None:
+						raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] its log name [{log_name}] is not unique.")
 					raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] duplicate detected. Please provide a 'log_name' to be able to distinguish.")
 
 		vegvisirDummyArguments = VegvisirArguments().dummy()
@@ -290,37 +355,50 @@ class Configuration:
 					cmd.serialize_command(hydrated_parameters)
 			except VegvisirArgumentException as e:
 				raise VegvisirInvalidExperimentConfigurationException(f"Client [{client_endpoint.name}] contains a command [{cmd.command}] that fails to serialize: {e}")
+
+			if client_endpoint.devtools is not None:
+				try:
+					client_endpoint.devtools.serialize_url(hydrated_parameters)
+				except VegvisirArgumentException as e:
+					raise VegvisirInvalidExperimentConfigurationException(f"Client [{client_endpoint.name}] its DevTools url [{client_endpoint.devtools.url}] fails to serialize: {e}")
 		
-		duplicate_check = set()
+		# Swept entries are validated once, through their first expansion, the others only differ in argument values
+		duplicate_check = []
 		for index, client in enumerate(configuration[CLIENTS_KEY]):
 			_namecheck_dict(client, index, "client", self._client_endpoints)
-			_duplicate_check(client["name"], client.get("log_name"), duplicate_check, "client")
-			duplicate_check.add(client["log_name"] if client.get("log_name") is not None else client["name"])
-			_parametercheck_endpoint(self._client_endpoints[client["name"]], client, "client")
-			_validate_command_with_real_parameters(self._client_endpoints[client["name"]], client.get("arguments", {}))
-			self._client_configurations.append(client)
-
-		duplicate_check = set()
+			sweep = ArgumentSweep(client, "client")
+			_duplicate_check(sweep, duplicate_check, "client")
+			duplicate_check.append(sweep)
+			_parametercheck_endpoint(self._client_endpoints[client["name"]], sweep.first(), "client")
+			_validate_command_with_real_parameters(self._client_endpoints[client["name"]], sweep.first().get("arguments", {}))
+			self._client_configurations.append(sweep)
+
+		duplicate_check = []
 		for index, server in enumerate(configuration[SERVERS_KEY]):
 			_namecheck_dict(server, index, "server", self._server_endpoints)
-			_duplicate_check(server["name"], server.get("log_name"), duplicate_check, "server")
-			duplicate_check.add(server["log_name"] if server.get("log_name") is not None else server["name"])
-			_parametercheck_endpoint(self._server_endpoints[server["name"]], server, "server")
-			self._server_configurations.append(server)
+			sweep = ArgumentSweep(server, "server")
+			_duplicate_check(sweep, duplicate_check, "server")
+			duplicate_check.append(sweep)
+			_parametercheck_endpoint(self._server_endpoints[server["name"]], sweep.first(), "server")
+			self._server_configurations.append(sweep)
 
-		duplicate_check = set()
+		duplicate_check = []
 		for index, shaper in enumerate(configuration[SHAPERS_KEY]):
 			_namecheck_dict(shaper, index, "shaper", self._shapers)
-			_duplicate_check(shaper["name"], shaper.get("log_name"), duplicate_check, "shaper")
-			duplicate_check.add(shaper["log_name"] if shaper.get("log_name") is not None else shaper["name"])
-			_scenariocheck_shaper(shaper, self._shapers[shaper["name"]].scenarios)
-			self._shaper_configurations.append(shaper)
+			sweep = ArgumentSweep(shaper, "shaper")
+			_duplicate_check(sweep, duplicate_check, "shaper")
+			duplicate_check.append(sweep)
+			_scenariocheck_shaper(sweep.first(), self._shapers[shaper["name"]].scenarios)
+			self._shaper_configurations.append(sweep)
 
 		if settings.get("log_dir") is not None:
 			log_dir_root = os.path.abspath(os.path.join(settings["log_dir"], "{}/"))
 		else:
 			log_dir_root = os.path.abspath("logs/{}/")
 		self._path_collection.log_path_root = log_dir_root.format(settings.get("label", "_unidentified"))
+		# Shared by all experiments (labels) logging to the same directory
+		self.result_cache_path = os.path.join(os.path.dirname(log_dir_root), ".result_cache")
+		self.results_index_path = os.path.join(os.path.dirname(log_dir_root), INDEX_FILE)
 
 		if settings.get("www_dir") is not None:
 			self._www_path = os.path.abspath(settings["www_dir"])
@@ -339,6 +417,29 @@ class Configuration:
 		if self._iterations <= 0:
 			raise VegvisirInvalidExperimentConfigurationException("Setting 'iterations' must be > 0.")
 
+		adaptive_iterations = settings.get("adaptive_iterations")
+		self.adaptive_iterations = None
+		if adaptive_iterations is not None:
+			if type(adaptive_iterations) is not dict:
+				raise VegvisirInvalidExperimentConfigurationException("Setting 'adaptive_iterations' must be an object.")
+			metric = adaptive_iterations.get("metric", "run.client_duration_s")
+			if type(metric) is not str or len(metric) == 0:
+				raise VegvisirInvalidExperimentConfigurationException("Setting 'adaptive_iterations' its 'metric' must be a metric name, e.g., run.client_duration_s.")
+			confidence = adaptive_iterations.get("confidence", 0.95)
+			if type(confidence) not in [int, float] or not 0 < confidence < 1:
+				raise VegvisirInvalidExperimentConfigurationException("Setting 'adaptive_iterations' its 'confidence' must be in range (0, 1).")
+			min_iterations = adaptive_iterations.get("min_iterations", 3)
+			if type(min_iterations) is not int or min_iterations < 2 or min_iterations > self._iterations:
+				raise VegvisirInvalidExperimentConfigurationException("Setting 'adaptive_iterations' its 'min_iterations' must be in range [2, iterations].")
+			width, relative_width = adaptive_iterations.get("width"), adaptive_iterations.get("relative_width")
+			if width is not None and relative_width is not None:
+				raise VegvisirInvalidExperimentConfigurationException("Setting 'adaptive_iterations' takes either a 'width' or a 'relative_width'.")
+			if width is None and relative_width is None:
+				relative_width = 0.1
+			if any(value is not None and (type(value) not in [int, float] or value <= 0) for value in [width, relative_width]):
+				raise VegvisirInvalidExperimentConfigurationException("Setting 'adaptive_iterations' its 'width' and 'relative_width' must be > 0.")
+			self.adaptive_iterations = AdaptiveIterations(metric, confidence, min_iterations, width, relative_width)
+
 		hook_processors = settings.get("hook_processors", 4)
 		if type(hook_processors) is str and not hook_processors.isdigit():
 			raise VegvisirInvalidExperimentConfigurationException("Setting 'hook_processors' must be > 0.")
@@ -349,13 +450,78 @@ class Configuration:
 		if self.hook_processor_count <= 0:
 			raise VegvisirInvalidExperimentConfigurationException("Setting 'hook_processors' must be > 0.")
 
+		hook_executor = settings.get("hook_executor", PostHookExecutorType.THREAD.value)
+		if hook_executor not in [executor_type.value for executor_type in PostHookExecutorType]:
+			raise VegvisirInvalidExperimentConfigurationException(f"Setting 'hook_executor' must be one of [{', '.join(executor_type.value for executor_type in PostHookExecutorType)}].")
+		self.hook_executor_type = PostHookExecutorType(hook_executor)
+
+		parallel_slots = settings.get("parallel_slots", 1)
+		if type(parallel_slots) is str and not parallel_slots.isdigit():
+			raise VegvisirInvalidExperimentConfigurationException(f"Setting 'parallel_slots' must be in range [1, {Slot.MAX_SLOTS}].")
+		try:
+			self.parallel_slot_count = int(parallel_slots)
+		except ValueError:
+			raise VegvisirInvalidExperimentConfigurationException(f"Setting 'parallel_slots' must be in range [1, {Slot.MAX_SLOTS}].")
+		if self.parallel_slot_count <= 0 or self.parallel_slot_count > Slot.MAX_SLOTS:
+			raise VegvisirInvalidExperimentConfigurationException(f"Setting 'parallel_slots' must be in range [1, {Slot.MAX_SLOTS}].")
+
+		reuse_containers = settings.get("reuse_containers", False)
+		if type(reuse_containers) is not bool:
+			raise VegvisirInvalidExperimentConfigurationException("Setting 'reuse_containers' must be a boolean.")
+		self.reuse_containers = reuse_containers
+
+		container_backend = settings.get("container_backend", backends.default_container_backend)
+		if container_backend not in backends.available_container_backends:
+			raise VegvisirInvalidExperimentConfigurationException(f"Setting 'container_backend' must be one of [{', '.join(backends.available_container_backends.keys())}].")
+		self.container_backend = container_backend
+
+		docker_socket = settings.get("docker_socket")
+		if docker_socket is not None and type(docker_socket) is not str:
+			raise VegvisirInvalidExperimentConfigurationException("Setting 'docker_socket' must be a path to the Docker Engine unix socket.")
+		self.docker_socket_path = os.path.abspath(docker_socket) if docker_socket is not None else None
+
+		cert_key_type = settings.get("cert_key_type", KeyType.RSA.value)
+		if cert_key_type not in [key_type.value for key_type in KeyType]:
+			raise VegvisirInvalidExperimentConfigurationException(f"Setting 'cert_key_type' must be one of [{', '.join(key_type.value for key_type in KeyType)}].")
+		self.cert_key_type = KeyType(cert_key_type)
+
+		reuse_cert_chain = settings.get("reuse_cert_chain", False)
+		if type(reuse_cert_chain) is not bool:
+			raise VegvisirInvalidExperimentConfigurationException("Setting 'reuse_cert_chain' must be a boolean.")
+		self.reuse_cert_chain = reuse_cert_chain
+
+		result_cache = settings.get("result_cache", True)
+		if type(result_cache) is not bool:
+			raise VegvisirInvalidExperimentConfigurationException("Setting 'result_cache' must be a boolean.")
+		self.result_cache_enabled = result_cache
+
+		overlap_teardown = settings.get("overlap_teardown", True)
+		if type(overlap_teardown) is not bool:
+			raise VegvisirInvalidExperimentConfigurationException("Setting 'overlap_teardown' must be a boolean.")
+		self.overlap_teardown = overlap_teardown
+
+		results_index = settings.get("results_index", True)
+		if type(results_index) is not bool:
+			raise VegvisirInvalidExperimentConfigurationException("Setting 'results_index' must be a boolean.")
+		self.results_index_enabled = results_index
+
+		qlog_analysis = settings.get("qlog_analysis", False)
+		if type(qlog_analysis) is not bool:
+			raise VegvisirInvalidExperimentConfigurationException("Setting 'qlog_analysis' must be a boolean.")
+		self.qlog_analysis = qlog_analysis
+
+		privileged_helper = settings.get("privileged_helper", False)
+		if type(privileged_helper) is not bool:
+			raise VegvisirInvalidExperimentConfigurationException("Setting 'privileged_helper' must be a boolean.")
+		self.privileged_helper = privileged_helper
+
 		environment = configuration.get("environment")
 		if environment is None:
 			raise VegvisirInvalidExperimentConfigurationException("No 'environment' key was found.")
 		environment_name = environment.get("name", environments.default_environment)
 		if environment_name not in environments.available_environments.keys():
 			raise VegvisirInvalidExperimentConfigurationException(f"Environment [{environment_name}] does not exist. Make sure it is correctly loaded in the __init__ file of the environments module.")
-		self._environment = environments.available_environments[environment_name]()
+		self._environment_name = environment_name
 				
 		environment_sensors = environment.get("sensors")
 		if environment_sensors is None:
@@ -365,10 +531,25 @@ class Configuration:
 				raise VegvisirInvalidImplementationConfigurationException(f"Sensor #{index} has no 'name' key.")
 			if sensor["name"] not in environments.available_sensors:
 				raise VegvisirInvalidImplementationConfigurationException(f"Sensor [{sensor['name']}] is unknown. Make sure it is correctly loaded in the __init__ file of the environments module.")
+		if not any(environments.available_sensors[sensor["name"]].ends_run for sensor in environment_sensors):
+			raise VegvisirInvalidExperimentConfigurationException("None of the configured sensors can end a run, add one that does (e.g., 'timeout').")
+		self._environment_sensor_configurations = environment_sensors
+		self._environment = self.spawn_environment()
+
+	def spawn_environment(self) -> BaseEnvironment:
+		"""
+		Create a fresh environment with its own sensors as described by the experiment configuration
+		Environments and sensors carry per run state, parallel slots each require their own instance
+		"""
+		self._validate_and_raise_load(self._experiment_configuration_loaded, "spawn_environment", "experiment")
+		environment = environments.available_environments[self._environment_name]()
+		environment.certificate_key_type = self.cert_key_type
+		for sensor in self._environment_sensor_configurations:
 			try:
 				# Shallow copy should be fine
 				sensor_arguments = sensor.copy()
 				del sensor_arguments["name"]
-				self._environment.add_sensor(environments.available_sensors[sensor["name"]](**sensor_arguments))
+				environment.add_sensor(environments.available_sensors[sensor["name"]](**sensor_arguments))
 			except TypeError as e:
-				raise VegvisirInvalidImplementationConfigurationException(f"Sensor [{sensor['name']}] can not be initialized with the provided arguments. Make sure all required initialization parameters are provided [f{e}]")
\ No newline at end of file
+				raise VegvisirInvalidImplementationConfigurationException(f"Sensor [{sensor['name']}] can not be initialized with the provided arguments. Make sure all required initialization parameters are provided [f{e}]")
+		return environment
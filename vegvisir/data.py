@@ -61,7 +61,11 @@ class VegvisirArguments:
     TESTCASE : str | None = None
 
     def dict(self) -> Dict[str, str]:
-        return {key: value for key, value in dataclasses.asdict(self).items() if value is not None}
+        # Fields are plain strings, asdict() would deep copy them for every role of every run
+        return {field.name: getattr(self, field.name) for field in _VEGVISIR_ARGUMENT_FIELDS if getattr(self, field.name) is not None}
     
     def dummy(self) -> Dict[str, str]:
-        return {key: "dummyData" for key in dataclasses.asdict(self)}
\ No newline at end of file
+        return {field.name: "dummyData" for field in _VEGVISIR_ARGUMENT_FIELDS}
+
+
+_VEGVISIR_ARGUMENT_FIELDS = dataclasses.fields(VegvisirArguments)
\ No newline at end of file
@@ -0,0 +1,365 @@
+import base64
+import hashlib
+import http.client
+import json
+import logging
+import os
+import signal
+import socket
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, IO, Tuple
+from urllib.parse import urlparse
+
+from vegvisir import tracing
+from vegvisir.exceptions import VegvisirDevToolsException
+from vegvisir.hostinterface import HostInterface
+
+DEFAULT_ENDPOINT = "http://127.0.0.1:9222"
+CONNECT_TIMEOUT = 30  # Seconds the browser gets to open its DevTools endpoint
+COMMAND_TIMEOUT = 30
+
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_OPCODE_CONTINUATION = 0x0
+_OPCODE_TEXT = 0x1
+_OPCODE_CLOSE = 0x8
+_OPCODE_PING = 0x9
+_OPCODE_PONG = 0xA
+
+
+class DevToolsConnection:
+	"""
+	Chrome DevTools protocol over a websocket (RFC 6455), commands can be sent from any thread
+	Only what the protocol needs is implemented: masked text frames from us, unmasked (possibly fragmented) frames from the browser
+	"""
+
+	def __init__(self, websocket_url: str, timeout: float = COMMAND_TIMEOUT) -> None:
+		url = urlparse(websocket_url)
+		if url.scheme != "ws":
+			raise VegvisirDevToolsException(f"Unsupported DevTools websocket [{websocket_url}]")
+		self.timeout = timeout
+		self._socket = socket.create_connection((url.hostname, url.port or 80), timeout=timeout)
+		self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		self._stream = self._socket.makefile("rb")
+		self._send_lock = threading.Lock()
+		self._pending: Dict[int, Future] = {}
+		self._pending_lock = threading.Lock()
+		self._next_id = 0
+		self._closed = False
+		self.event_listeners: list[Callable[[Dict], None]] = []
+		self._handshake(url.hostname, url.port or 80, url.path + (f"?{url.query}" if url.query else ""))
+		self._socket.settimeout(None)  # The reader blocks until the browser sends something
+		self._reader = threading.Thread(target=self._read_messages, name="devtools_reader", daemon=True)
+		self._reader.start()
+
+	def _handshake(self, host: str, port: int, path: str) -> None:
+		key = base64.b64encode(os.urandom(16)).decode()
+		self._socket.sendall((
+			f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+			f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+		).encode())
+		status = self._stream.readline().decode("latin-1")
+		headers = {}
+		while True:
+			line = self._stream.readline().decode("latin-1").strip()
+			if len(line) == 0:
+				break
+			name, _, value = line.partition(":")
+			headers[name.strip().lower()] = value.strip()
+		accept = base64.b64encode(hashlib.sha1((key + _WEBSOCKET_GUID).encode()).digest()).decode()
+		if status.split(" ")[1:2] != ["101"] or headers.get("sec-websocket-accept") != accept:
+			raise VegvisirDevToolsException(f"DevTools websocket handshake failed | {status.strip()}")
+
+	def _send_frame(self, opcode: int, payload: bytes) -> None:
+		header = bytes([0x80 | opcode])
+		if len(payload) < 126:
+			header += bytes([0x80 | len(payload)])
+		elif len(payload) < 1 << 16:
+			header += bytes([0x80 | 126]) + struct.pack("!H", len(payload))
+		else:
+			header += bytes([0x80 | 127]) + struct.pack("!Q", len(payload))
+		mask = os.urandom(4)
+		repeated_mask = (mask * (len(payload) // 4 + 1))[:len(payload)]
+		masked = (int.from_bytes(payload, "big") ^ int.from_bytes(repeated_mask, "big")).to_bytes(len(payload), "big")
+		with self._send_lock:
+			self._socket.sendall(header + mask + masked)
+
+	def _read_exactly(self, size: int) -> bytes:
+		data = self._stream.read(size)
+		if data is None or len(data) < size:
+			raise ConnectionError("DevTools websocket closed")
+		return data
+
+	def _read_message(self) -> bytes | None:
+		"""
+		Next complete text message, None once the browser closed the connection
+		"""
+		message = b""
+		while True:
+			first, second = self._read_exactly(2)
+			opcode = first & 0x0F
+			length = second & 0x7F
+			if length == 126:
+				length = struct.unpack("!H", self._read_exactly(2))[0]
+			elif length == 127:
+				length = struct.unpack("!Q", self._read_exactly(8))[0]
+			mask = self._read_exactly(4) if second & 0x80 else None
+			payload = self._read_exactly(length)
+			if mask is not None:
+				payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+			if opcode == _OPCODE_CLOSE:
+				return None
+			if opcode == _OPCODE_PING:
+				self._send_frame(_OPCODE_PONG, payload)
+				continue
+			if opcode in [_OPCODE_TEXT, _OPCODE_CONTINUATION]:
+				message += payload
+				if first & 0x80:
+					return message
+
+	def _read_messages(self) -> None:
+		try:
+			while True:
+				message = self._read_message()
+				if message is None:
+					break
+				data = json.loads(message)
+				if "id" in data:
+					with self._pending_lock:
+						future = self._pending.pop(data["id"], None)
+					if future is not None:
+						future.set_result(data)
+				else:
+					for listener in list(self.event_listeners):
+						listener(data)
+		except (OSError, ConnectionError, ValueError):
+			pass
+		finally:
+			self._closed = True
+			with self._pending_lock:
+				pending, self._pending = self._pending, {}
+			for future in pending.values():
+				future.set_exception(VegvisirDevToolsException("DevTools connection closed"))
+
+	@property
+	def closed(self) -> bool:
+		return self._closed
+
+	def _discard_pending(self, command_id: int) -> None:
+		with self._pending_lock:
+			self._pending.pop(command_id, None)
+
+	def command(self, method: str, params: Dict | None = None, session_id: str | None = None, timeout: float | None = None) -> Dict:
+		"""
+		Send a command and wait for its result, raises VegvisirDevToolsException for protocol errors and closed connections
+		"""
+		future = Future()
+		with self._pending_lock:
+			if self._closed:
+				raise VegvisirDevToolsException(f"DevTools connection closed before [{method}]")
+			self._next_id += 1
+			command_id = self._next_id
+			message = {"id": command_id, "method": method, "params": params or {}}
+			if session_id is not None:
+				message["sessionId"] = session_id
+			self._pending[command_id] = future
+		with tracing.span("devtools_command", "subprocess", method=method):
+			try:
+				self._send_frame(_OPCODE_TEXT, json.dumps(message).encode())
+				response = future.result(timeout or self.timeout)
+			except FutureTimeoutError:
+				# Distinct from the builtin TimeoutError before Python 3.11, a late response is dropped by the reader
+				self._discard_pending(command_id)
+				raise VegvisirDevToolsException(f"DevTools command [{method}] timed out")
+			except OSError as e:
+				self._discard_pending(command_id)
+				raise VegvisirDevToolsException(f"DevTools command [{method}] failed | {e}")
+		if "error" in response:
+			raise VegvisirDevToolsException(f"DevTools command [{method}] failed | {response['error'].get('message')}")
+		return response.get("result", {})
+
+	def close(self) -> None:
+		try:
+			self._send_frame(_OPCODE_CLOSE, b"")
+		except OSError:
+			pass
+		try:
+			self._socket.shutdown(socket.SHUT_RDWR)
+		except OSError:
+			pass
+		self._socket.close()
+		self._reader.join(5)
+
+
+def browser_websocket_url(endpoint: str, timeout: float = 2) -> str:
+	"""
+	Websocket of the browser target, read from the /json/version endpoint that every DevTools implementation serves
+	"""
+	url = urlparse(endpoint)
+	connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+	try:
+		connection.request("GET", "/json/version")
+		response = connection.getresponse()
+		if response.status != 200:
+			raise VegvisirDevToolsException(f"DevTools endpoint [{endpoint}] answered {response.status}")
+		return json.loads(response.read())["webSocketDebuggerUrl"]
+	finally:
+		connection.close()
+
+
+class DevToolsRunProcess:
+	"""
+	Process-like handle of a single run in a persistent browser, sensors treat it like the subprocess.Popen of a cold started browser
+	The run lives in its own browser context (separate cache, cookies and connections), terminating the handle disposes the context
+	"""
+
+	def __init__(self, browser: "DevToolsBrowser", browser_context_id: str, target_id: str) -> None:
+		self.browser = browser
+		self.browser_context_id = browser_context_id
+		self.target_id = target_id
+		self.returncode: int | None = None
+		self.pid = None
+		self._target_gone = threading.Event()
+		self._ended = False
+
+	def _on_event(self, event: Dict) -> None:
+		params = event.get("params", {})
+		if event.get("method") in ["Target.targetDestroyed", "Target.targetCrashed"] and params.get("targetId") == self.target_id:
+			self._target_gone.set()
+
+	def poll(self) -> int | None:
+		if self.returncode is not None:
+			return self.returncode
+		if self.browser.process is not None and self.browser.process.poll() is not None:
+			self.returncode = self.browser.process.returncode
+		elif self._target_gone.is_set() or self.browser.connection is None or self.browser.connection.closed:
+			self.returncode = 0
+		return self.returncode
+
+	def wait(self, timeout: float | None = None) -> int:
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while self.poll() is None:
+			if deadline is not None and time.monotonic() > deadline:
+				raise subprocess.TimeoutExpired(f"DevTools run [{self.target_id}]", timeout)
+			time.sleep(0.05)
+		return self.returncode
+
+	def terminate(self) -> None:
+		if self.poll() is None:
+			self.returncode = -signal.SIGTERM
+		if not self._ended:
+			self._ended = True
+			self.browser.end_run(self)
+
+	def kill(self) -> None:
+		self.terminate()
+
+	def communicate(self, input=None, timeout: float | None = None) -> Tuple[bytes, bytes]:
+		# Browser output ends up in the log of the browser itself, see DevToolsBrowser
+		self.wait(timeout)
+		return b"", b""
+
+
+class DevToolsBrowser:
+	"""
+	Browser kept alive between runs of a host client, driven over the Chrome DevTools protocol
+	The key identifies what the browser was started with (its hydrated command), runs with another key require a new browser
+	"""
+
+	def __init__(self, key: Tuple, endpoint: str = DEFAULT_ENDPOINT) -> None:
+		self.key = key
+		self.endpoint = endpoint
+		self.process: subprocess.Popen | None = None
+		self.connection: DevToolsConnection | None = None
+		self._output: IO | None = None
+		self.logger = logging.getLogger("root.DevToolsBrowser")
+
+	def start(self, host_interface: HostInterface, command: str, output_path: str) -> None:
+		"""
+		Start the browser and connect once its DevTools endpoint answers, raises VegvisirDevToolsException when it does not in time
+		Browser output is appended to output_path
+		"""
+		with tracing.span("devtools_browser_start"):
+			self._output = open(output_path, "ab")
+			self.process = host_interface.spawn_parallel_subprocess(command, output=self._output)
+			deadline = time.monotonic() + CONNECT_TIMEOUT
+			while True:
+				try:
+					websocket_url = browser_websocket_url(self.endpoint)
+					break
+				except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+					if self.process.poll() is not None:
+						self.close()
+						raise VegvisirDevToolsException(f"Browser exited with code {self.process.returncode} before its DevTools endpoint [{self.endpoint}] answered")
+					if time.monotonic() > deadline:
+						self.close()
+						raise VegvisirDevToolsException(f"DevTools endpoint [{self.endpoint}] did not answer in time | {e}")
+					time.sleep(0.1)
+			self.connection = DevToolsConnection(websocket_url)
+			self.connection.command("Target.setDiscoverTargets", {"discover": True})  # Reports crashed and closed targets
+		self.logger.debug(f"Browser [{command}] listening on [{self.endpoint}]")
+
+	@property
+	def alive(self) -> bool:
+		return self.process is not None and self.process.poll() is None and self.connection is not None and not self.connection.closed
+
+	def start_run(self, url: str, download_path: str, ignore_certificate_errors: bool = False) -> DevToolsRunProcess:
+		"""
+		Open url in a fresh browser context that downloads into download_path
+		"""
+		with tracing.span("devtools_run_start"):
+			browser_context_id = self.connection.command("Target.createBrowserContext", {"disposeOnDetach": False})["browserContextId"]
+			run = None
+			try:
+				self.connection.command("Browser.setDownloadBehavior", {"behavior": "allow", "downloadPath": os.path.abspath(download_path), "browserContextId": browser_context_id})
+				target_id = self.connection.command("Target.createTarget", {"url": "about:blank", "browserContextId": browser_context_id})["targetId"]
+				run = DevToolsRunProcess(self, browser_context_id, target_id)
+				self.connection.event_listeners.append(run._on_event)
+				session_id = self.connection.command("Target.attachToTarget", {"targetId": target_id, "flatten": True})["sessionId"]
+				if ignore_certificate_errors:
+					self.connection.command("Security.setIgnoreCertificateErrors", {"ignore": True}, session_id)
+				self.connection.command("Page.navigate", {"url": url}, session_id)
+			except VegvisirDevToolsException:
+				if run is not None:
+					self.connection.event_listeners.remove(run._on_event)
+				self._dispose_context(browser_context_id)
+				raise
+		return run
+
+	def _dispose_context(self, browser_context_id: str) -> None:
+		try:
+			self.connection.command("Target.disposeBrowserContext", {"browserContextId": browser_context_id})
+		except VegvisirDevToolsException as e:
+			self.logger.debug(f"Could not dispose browser context [{browser_context_id}] | {e}")
+
+	def end_run(self, run: DevToolsRunProcess) -> None:
+		if self.connection is None:
+			return  # Closed in the meantime, contexts went with the browser
+		if run._on_event in self.connection.event_listeners:
+			self.connection.event_listeners.remove(run._on_event)
+		if not self.connection.closed:
+			self._dispose_context(run.browser_context_id)
+
+	def close(self) -> None:
+		if self.connection is not None:
+			try:
+				self.connection.command("Browser.close", timeout=5)
+			except VegvisirDevToolsException:
+				pass
+			self.connection.close()
+			self.connection = None
+		if self.process is not None:
+			try:
+				self.process.wait(5)
+			except subprocess.TimeoutExpired:
+				self.process.terminate()
+				try:
+					self.process.wait(5)
+				except subprocess.TimeoutExpired:
+					self.process.kill()
+		if self._output is not None:
+			self._output.close()
+			self._output = None
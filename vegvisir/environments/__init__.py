@@ -1,11 +1,20 @@
-from vegvisir.environments import webserver, sensors
-
 default_environment = "webserver-basic"
-available_environments = {
-    "webserver-basic": webserver.WebserverBasic
-}
 
-available_sensors = {
-    "timeout": sensors.TimeoutSensor,
-    "browser-file-watchdog": sensors.BrowserDownloadWatchdogSensor
-}
\ No newline at end of file
+
+def __getattr__(name):
+    # Environments and sensors pull in the certificate, inotify and container dependencies, the registries import them on first use
+    # Modules that only need a helper of this package (e.g., the sample files read by `vegvisir netlog`) do not pay for them
+    if name not in ["available_environments", "available_sensors"]:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from vegvisir.environments import webserver, sensors
+
+    globals()["available_environments"] = {
+        "webserver-basic": webserver.WebserverBasic
+    }
+    globals()["available_sensors"] = {
+        "timeout": sensors.TimeoutSensor,
+        "browser-file-watchdog": sensors.BrowserDownloadWatchdogSensor,
+        "container-resources": sensors.ContainerResourceSensor,
+        "interface-throughput": sensors.InterfaceThroughputSensor,
+    }
+    return globals()[name]
@@ -6,8 +6,11 @@ import subprocess
 import threading
 import time
 from typing import Tuple
+from vegvisir import certificates, tracing
 from vegvisir.data import ExperimentPaths
 from vegvisir.environments import sensors
+from vegvisir.environments.reactor import SensorReactor
+from vegvisir.exceptions import VegvisirCertificateException
 
 class VegvisirEnvironmentException(Exception):
 	pass
@@ -31,6 +34,12 @@ class BaseEnvironment:
 		self.environment_name:str = ""
 		self.sensors:List[sensors.ABCSensor] = []
 		self.sync_semaphore = None
+		self.sensor_reactor: SensorReactor | None = None
+
+		self.certificate_key_type: certificates.KeyType = certificates.KeyType.RSA
+		self.certificate_chain_length: int = 1
+		self.certificate_pool: certificates.CertificatePool | None = None  # Provided by the runner
+		self.cert_chain_reuse_permitted: bool = True  # Environments that depend on fresh certificates every run should disable this
 
 	def get_QIR_compatibility_testcase(self, perspective: Perspective) -> str:
 		if perspective == BaseEnvironment.Perspective.CLIENT:
@@ -50,18 +59,16 @@ class BaseEnvironment:
 			self._QIR_compatibility_testcase_server = testcase
 
 	def generate_cert_chain(self, directory: str, length: int = 1):
-		cmd = "./certs.sh " + directory + " " + str(length)
-		r = subprocess.run(
-			cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-		)
-		logging.debug("Vegvisir: %s", r.stdout.decode("utf-8"))
-		if r.returncode != 0:
-			raise VegvisirEnvironmentException("Unable to create certificates")
-		cmd = "./certs-fingerprint.sh " + directory
-		r = subprocess.run(
-			cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-		)
-		fingerprint = r.stdout.decode("utf-8").strip()
+		"""
+		Chains come from the certificate pool when the runner provides one, otherwise they are generated on the spot
+		"""
+		try:
+			if self.certificate_pool is not None and self.certificate_pool.length == length:
+				fingerprint = self.certificate_pool.acquire(directory)
+			else:
+				fingerprint = certificates.generate_cert_chain(directory, length, self.certificate_key_type)
+		except VegvisirCertificateException as e:
+			raise VegvisirEnvironmentException(f"Unable to create certificates | {e}")
 		logging.debug("Vegvisir: certificate fingerprint: %s", fingerprint)
 		return fingerprint
 
@@ -69,7 +76,10 @@ class BaseEnvironment:
 		sensor.sensor_actuator = self.forcestop_sensors
 		self.sensors.append(sensor)
 
-	def start_sensors(self, process_to_monitor = None, path_collection: ExperimentPaths = ExperimentPaths()) -> None:
+	def start_sensors(self, process_to_monitor = None, path_collection: ExperimentPaths = ExperimentPaths(), context: sensors.SensorContext | None = None) -> None:
+		"""
+		context tells sensors about the containers and networks of the run, for sensors that observe those themselves
+		"""
 		if len(self.sensors) == 0:
 			raise VegvisirEnvironmentException("Environment sensorlist empty. Can't comply with start request.")
 
@@ -80,22 +90,61 @@ class BaseEnvironment:
 		# Any sensor can trigger a .release() which would indicate a sensor has triggered
 		self.sync_semaphore = threading.Semaphore(0)
 
-		for sensor in self.sensors:
-			sensor.setup(process_to_monitor, self.forcestop_sensors, self.sync_semaphore, path_collection)
-			sensor.thread.start()
+		# Event-driven sensors share a single reactor thread, others still get a thread of their own
+		self.sensor_reactor = SensorReactor()
+		with tracing.span("start_sensors", "sensors", sensors=[type(sensor).__name__ for sensor in self.sensors]):
+			for sensor in self.sensors:
+				sensor.context = context if context is not None else sensors.SensorContext()
+				sensor.outcome = None
+				if not sensor.register(self.sensor_reactor, process_to_monitor, self.forcestop_sensors, self.sync_semaphore, path_collection):
+					sensor.setup(process_to_monitor, self.forcestop_sensors, self.sync_semaphore, path_collection)
+					sensor.thread.start()
+			self.sensor_reactor.start()
 
 	def forcestop_sensors(self) -> None:
-		for sensor in self.sensors:
-			sensor.terminate_sensor = True
+		with tracing.span("forcestop_sensors", "sensors"):
+			for sensor in self.sensors:
+				sensor.terminate_sensor = True
+			sensor_reactor = self.sensor_reactor
+			if sensor_reactor is not None:
+				sensor_reactor.stop()
+
+	def interrupt_sensors(self) -> None:
+		"""
+		Force stop all sensors and wake up whoever is waiting on them
+		Used when the waiting thread can not be reached by a keyboard interrupt (i.e., parallel slots)
+		"""
+		self.forcestop_sensors()
+		if self.sync_semaphore is not None:
+			self.sync_semaphore.release()
+
+	def sensor_outcome(self) -> str | None:
+		"""
+		Why the sensors ended the last run (e.g., timeout or client_exit), several sensors can observe the same outcome
+		"""
+		outcomes = sorted({sensor.outcome for sensor in self.sensors if sensor.outcome is not None})
+		return ",".join(outcomes) if len(outcomes) > 0 else None
 
 	def waitfor_sensors(self) -> None:
-		self.sync_semaphore.acquire()
+		with tracing.span("waitfor_sensors", "sensors"):
+			self.sync_semaphore.acquire()
 		
 	def clean_and_reset_sensors(self) -> None:
+		if self.sensor_reactor is not None:
+			with tracing.span("join_sensor_reactor", "sensors"):
+				self.sensor_reactor.stop()
+				self.sensor_reactor.join()
+				self.sensor_reactor.close()
+			self.sensor_reactor = None
 		for sensor in self.sensors:
-			if sensor.thread.is_alive():
-				sensor.thread.join()
-			sensor.terminate_sensor = True
+			with tracing.span("join_sensor", "sensors", sensor=type(sensor).__name__):
+				if sensor.thread is not None and sensor.thread.is_alive():
+					sensor.thread.join()
+				sensor.terminate_sensor = True
+			try:
+				sensor.finalize()
+			except Exception as e:
+				logging.error(f"Sensor [{type(sensor).__name__}] could not be finalized | {e}")
 
 
 	def pre_run_hook(self, paths: ExperimentPaths):
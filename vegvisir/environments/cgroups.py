@@ -0,0 +1,117 @@
+from array import array
+import os
+from typing import Dict, List, Tuple
+
+from vegvisir.environments.samplefile import read_sample_file
+
+DEFAULT_CGROUP2_MOUNT = "/sys/fs/cgroup"
+RESOURCE_SAMPLES_FORMAT = "vegvisir-container-resources"
+
+# Every sample is a row of signed 64-bit integers, values that could not be read are stored as -1
+SAMPLE_FIELDS = [
+	"timestamp_us",
+	"container",  # Index into the container list of the file header
+	"cpu_usage_usec",
+	"cpu_user_usec",
+	"cpu_system_usec",
+	"cpu_nr_throttled",
+	"cpu_throttled_usec",
+	"memory_current",
+	"io_rbytes",
+	"io_wbytes",
+	"io_rios",
+	"io_wios",
+]
+_CPU_STAT_KEYS = ["usage_usec", "user_usec", "system_usec", "nr_throttled", "throttled_usec"]
+_IO_STAT_KEYS = ["rbytes", "wbytes", "rios", "wios"]
+
+
+_cgroup2_mount: str | None = None
+
+
+def cgroup2_mount() -> str:
+	"""
+	Mount point of the unified (v2) hierarchy, hybrid hosts mount it next to the v1 controllers (e.g., /sys/fs/cgroup/unified)
+	"""
+	global _cgroup2_mount
+	if _cgroup2_mount is None:
+		_cgroup2_mount = DEFAULT_CGROUP2_MOUNT
+		try:
+			with open("/proc/self/mounts", "r") as fp:
+				for line in fp:
+					fields = line.split(" ")
+					if len(fields) > 2 and fields[2] == "cgroup2":
+						_cgroup2_mount = fields[1]
+						break
+		except OSError:
+			pass
+	return _cgroup2_mount
+
+
+def cgroup_path_of_process(pid: int) -> str | None:
+	"""
+	Unified (v2) cgroup directory of a process, None on hosts without cgroup v2 or when the process is gone
+	"""
+	try:
+		with open(f"/proc/{pid}/cgroup", "r") as fp:
+			for line in fp:
+				if line.startswith("0::"):
+					return os.path.join(cgroup2_mount(), line[3:].strip().lstrip("/"))
+	except OSError:
+		pass
+	return None
+
+
+class CgroupReader:
+	"""
+	Reads the CPU, memory and IO counters of a single cgroup
+	Files are opened once and read with pread, a sample costs three system calls
+	"""
+
+	def __init__(self, path: str) -> None:
+		self.path = path
+		self._cpu_fd = os.open(os.path.join(path, "cpu.stat"), os.O_RDONLY | os.O_CLOEXEC)
+		self._memory_fd = self._open_optional("memory.current")
+		self._io_fd = self._open_optional("io.stat")
+
+	def _open_optional(self, name: str) -> int | None:
+		# Controllers that are not enabled for the cgroup do not expose their files
+		try:
+			return os.open(os.path.join(self.path, name), os.O_RDONLY | os.O_CLOEXEC)
+		except FileNotFoundError:
+			return None
+
+	def sample(self, row: List[int]) -> None:
+		"""
+		Fill row with the counters in SAMPLE_FIELDS order, starting at the cpu fields
+		Raises OSError once the cgroup is removed (i.e., the container stopped) or the reader was closed
+		"""
+		if self._cpu_fd is None:
+			raise OSError("Cgroup reader is closed")
+		cpu_stat = dict(line.split(" ", 1) for line in os.pread(self._cpu_fd, 4096, 0).decode().splitlines())
+		for index, key in enumerate(_CPU_STAT_KEYS):
+			row[2 + index] = int(cpu_stat.get(key, -1))
+		row[7] = int(os.pread(self._memory_fd, 64, 0)) if self._memory_fd is not None else -1
+		if self._io_fd is not None:
+			totals = [0] * len(_IO_STAT_KEYS)
+			for line in os.pread(self._io_fd, 65536, 0).decode().splitlines():
+				for entry in line.split(" ")[1:]:
+					key, _, value = entry.partition("=")
+					if key in _IO_STAT_KEYS:
+						totals[_IO_STAT_KEYS.index(key)] += int(value)
+			row[8:12] = totals
+		else:
+			row[8:12] = [-1] * len(_IO_STAT_KEYS)
+
+	def close(self) -> None:
+		for fd in [self._cpu_fd, self._memory_fd, self._io_fd]:
+			if fd is not None:
+				os.close(fd)
+		self._cpu_fd, self._memory_fd, self._io_fd = None, None, None
+
+
+def read_resource_samples(path: str) -> Tuple[Dict, Dict[str, array]]:
+	"""
+	Header and columns (field name -> values) of a sample file written by the container resource sensor
+	"""
+	return read_sample_file(path)
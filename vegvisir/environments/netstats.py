@@ -0,0 +1,189 @@
+from array import array
+import fcntl
+import ipaddress
+import itertools
+import os
+import socket
+import struct
+from typing import Dict, List, Tuple
+
+from vegvisir.environments.samplefile import read_sample_file
+
+SYS_CLASS_NET = "/sys/class/net"
+THROUGHPUT_SAMPLES_FORMAT = "vegvisir-interface-throughput"
+THROUGHPUT_PERCENTILES = [5, 25, 50, 75, 90, 95, 99]
+
+# Every sample is a row of signed 64-bit integers, counters that could not be read are stored as -1
+SAMPLE_FIELDS = [
+	"timestamp_us",
+	"interface",  # Index into the interface list of the summary file
+	"rx_bytes",
+	"tx_bytes",
+	"rx_packets",
+	"tx_packets",
+	"rx_dropped",
+	"tx_dropped",
+]
+_STATISTICS = SAMPLE_FIELDS[2:]
+
+_SIOCGIFADDR = 0x8915
+
+
+def interface_ipv4_address(name: str) -> ipaddress.IPv4Address | None:
+	"""
+	Primary IPv4 address of a host interface, None for interfaces without one
+	"""
+	with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+		try:
+			ifreq = fcntl.ioctl(sock.fileno(), _SIOCGIFADDR, struct.pack("256s", name[:15].encode()))
+		except OSError:
+			return None
+	return ipaddress.IPv4Address(ifreq[20:24])
+
+
+def find_bridge(subnet: str) -> str | None:
+	"""
+	Host bridge whose address lies in subnet, i.e., the bridge docker created for a compose network
+	Equivalent to grepping `ip a` for the broadcast address of the network, without spawning a process
+	"""
+	network = ipaddress.IPv4Network(subnet)
+	for name in sorted(os.listdir(SYS_CLASS_NET)):
+		if not os.path.isdir(os.path.join(SYS_CLASS_NET, name, "bridge")):
+			continue
+		address = interface_ipv4_address(name)
+		if address is not None and address in network:
+			return name
+	return None
+
+
+def bridge_ports(bridge: str) -> List[str]:
+	"""
+	Interfaces attached to a bridge, for compose networks these are the host ends of the container veths
+	"""
+	try:
+		return sorted(os.listdir(os.path.join(SYS_CLASS_NET, bridge, "brif")))
+	except FileNotFoundError:
+		return []
+
+
+class InterfaceCounterReader:
+	"""
+	Reads the statistics counters of a single host interface
+	Files are opened once and read with pread, nothing is parsed besides the integers themselves
+	"""
+
+	def __init__(self, name: str) -> None:
+		self.name = name
+		statistics = os.path.join(SYS_CLASS_NET, name, "statistics")
+		self._fds: List[int] = []
+		try:
+			for counter in _STATISTICS:
+				self._fds.append(os.open(os.path.join(statistics, counter), os.O_RDONLY | os.O_CLOEXEC))
+		except OSError:
+			self.close()
+			raise
+
+	def sample(self, row: List[int]) -> None:
+		"""
+		Fill row with the counters in SAMPLE_FIELDS order, starting at rx_bytes
+		Raises OSError once the interface is removed (i.e., its container stopped) or the reader was closed
+		"""
+		if len(self._fds) == 0:
+			raise OSError("Interface reader is closed")
+		for index, fd in enumerate(self._fds):
+			row[2 + index] = int(os.pread(fd, 32, 0))
+
+	def close(self) -> None:
+		for fd in self._fds:
+			os.close(fd)
+		self._fds = []
+
+
+def read_throughput_samples(path: str) -> Tuple[Dict, Dict[str, array]]:
+	"""
+	Header and columns (field name -> values) of a sample file written by the interface throughput sensor
+	"""
+	return read_sample_file(path)
+
+
+def percentiles(values: List[float], points: List[int]) -> Dict[str, float]:
+	"""
+	Percentiles with linear interpolation between the closest ranks
+	"""
+	ordered = sorted(values)
+	result = {}
+	for point in points:
+		rank = (len(ordered) - 1) * point / 100
+		lower = int(rank)
+		upper = min(lower + 1, len(ordered) - 1)
+		result[f"p{point}"] = ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+	return result
+
+
+def throughput_rates(timestamps: List[int], counters: List[int]) -> Tuple[List[int], List[float]]:
+	"""
+	Bits per second between consecutive samples of a byte counter, trimmed to the intervals between the first and last transfer
+	Returns the end of every interval (in microseconds) and its rate
+	"""
+	ends, rates = [], []
+	for index in range(1, len(timestamps)):
+		elapsed = timestamps[index] - timestamps[index - 1]
+		if elapsed <= 0 or counters[index] < 0 or counters[index - 1] < 0:
+			continue
+		ends.append(timestamps[index])
+		rates.append((counters[index] - counters[index - 1]) * 8 * 1_000_000 / elapsed)
+	active = [index for index, rate in enumerate(rates) if rate > 0]
+	if len(active) == 0:
+		return [], []
+	return ends[active[0]:active[-1] + 1], rates[active[0]:active[-1] + 1]
+
+
+def summarize_throughput(columns: Dict[str, array], interfaces: List[Dict]) -> Dict:
+	"""
+	Throughput percentiles (bits per second) of every interface, and of every network as a whole
+	The bytes a network delivers are the bytes its ports transmit towards the containers (tx on the host end of a veth)
+	"""
+	samples: Dict[int, Tuple[List[int], Dict[str, List[int]]]] = {}
+	for row in range(len(columns["timestamp_us"])):
+		timestamps, counters = samples.setdefault(columns["interface"][row], ([], {"rx_bytes": [], "tx_bytes": []}))
+		timestamps.append(columns["timestamp_us"][row])
+		counters["rx_bytes"].append(columns["rx_bytes"][row])
+		counters["tx_bytes"].append(columns["tx_bytes"][row])
+
+	def describe(timestamps: List[int], counter: List[int]) -> Dict:
+		_, rates = throughput_rates(timestamps, counter)
+		if len(rates) == 0:
+			return {"bytes": 0, "intervals": 0}
+		valid = [value for value in counter if value >= 0]
+		return {
+			"bytes": valid[-1] - valid[0],
+			"intervals": len(rates),
+			"mean": sum(rates) / len(rates),
+			"max": max(rates),
+			**percentiles(rates, THROUGHPUT_PERCENTILES),
+		}
+
+	summary: Dict = {"unit": "bit/s", "interfaces": [], "networks": {}}
+	delivered: Dict[str, Dict[int, int]] = {}  # Network -> sample timestamp -> bytes its ports transmitted since the previous sample
+	for index, interface in enumerate(interfaces):
+		timestamps, counters = samples.get(index, ([], {"rx_bytes": [], "tx_bytes": []}))
+		summary["interfaces"].append({
+			**interface,
+			"rx": describe(timestamps, counters["rx_bytes"]),
+			"tx": describe(timestamps, counters["tx_bytes"]),
+		})
+		if interface["role"] == "port":
+			# Ports attach while the run starts (e.g., the client container), only what they transmit while sampled counts
+			network = delivered.setdefault(interface["network"], {})
+			previous = None
+			for timestamp, value in zip(timestamps, counters["tx_bytes"]):
+				if value < 0:
+					continue
+				network[timestamp] = network.get(timestamp, 0) + (value - previous if previous is not None else 0)
+				previous = value
+	for network, deltas in delivered.items():
+		# Ports of the same network are sampled together, so their rows share timestamps
+		timestamps = sorted(deltas)
+		totals = list(itertools.accumulate(deltas[timestamp] for timestamp in timestamps))
+		summary["networks"][network] = describe(timestamps, totals)
+	return summary
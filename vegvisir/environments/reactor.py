@@ -0,0 +1,173 @@
+from collections import deque
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import logging
+import os
+import selectors
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List
+
+import pyinotify
+
+# Process handles without a pid (e.g., containers of the engine-api backend) can only be polled
+PROCESS_POLL_INTERVAL = 0.1
+
+
+@dataclass(order=True)
+class ReactorTimer:
+	deadline: float
+	sequence: int
+	callback: Callable[[], None] = field(compare=False)
+	cancelled: bool = field(default=False, compare=False)
+
+	def cancel(self) -> None:
+		self.cancelled = True
+
+
+class SensorReactor:
+	"""
+	Single threaded event loop shared by the sensors of a run
+	Deadlines, client process exits and file system events are multiplexed with epoll, sensors react within milliseconds instead of polling every second
+	Sensors register their interests before the reactor starts or from within reactor callbacks, stop() and call_soon_threadsafe() can be called from any thread
+	"""
+
+	def __init__(self) -> None:
+		self._selector = selectors.DefaultSelector()
+		self._wakeup_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+		self._selector.register(self._wakeup_fd, selectors.EVENT_READ, self._drain_wakeup)
+		self._timers: List[ReactorTimer] = []
+		self._timer_sequence = itertools.count()
+		self._process_fds: Dict[int, Callable[[], None]] = {}
+		self._handoff: deque = deque()  # Callbacks queued by other threads
+		self._handoff_lock = threading.Lock()
+
+		# All directory watches share a single inotify file descriptor
+		self._watch_manager: pyinotify.WatchManager | None = None
+		self._notifier: pyinotify.Notifier | None = None
+
+		self._stopped = False
+		self.thread: threading.Thread | None = None
+
+	def call_at(self, deadline: float, callback: Callable[[], None]) -> ReactorTimer:
+		"""
+		Run callback once time.monotonic() reaches deadline
+		"""
+		timer = ReactorTimer(deadline, next(self._timer_sequence), callback)
+		heapq.heappush(self._timers, timer)
+		return timer
+
+	def call_later(self, delay: float, callback: Callable[[], None]) -> ReactorTimer:
+		return self.call_at(time.monotonic() + delay, callback)
+
+	def call_soon_threadsafe(self, callback: Callable[[], None]) -> None:
+		"""
+		Run callback on the reactor thread, the only registration that is safe from other threads
+		Callbacks handed off after the reactor stopped are dropped
+		"""
+		with self._handoff_lock:
+			if self._stopped:
+				return
+			self._handoff.append(callback)
+			os.eventfd_write(self._wakeup_fd, 1)
+
+	def watch_process(self, process: subprocess.Popen, callback: Callable[[], None]) -> None:
+		"""
+		Run callback once process exits, through a pidfd when the process has a pid
+		"""
+		if process.poll() is not None:
+			self.call_later(0, callback)
+			return
+		try:
+			process_fd = os.pidfd_open(process.pid)
+		except (TypeError, OSError):
+			self._poll_process(process, callback)
+			return
+		self._process_fds[process_fd] = callback
+		self._selector.register(process_fd, selectors.EVENT_READ, lambda: self._process_exited(process_fd, process))
+
+	def _process_exited(self, process_fd: int, process: subprocess.Popen) -> None:
+		callback = self._process_fds.pop(process_fd)
+		self._selector.unregister(process_fd)
+		os.close(process_fd)
+		process.poll()  # Reap the process, its handle reports the exit from now on
+		callback()
+
+	def _poll_process(self, process: subprocess.Popen, callback: Callable[[], None]) -> None:
+		if process.poll() is not None:
+			callback()
+		else:
+			self.call_later(PROCESS_POLL_INTERVAL, lambda: self._poll_process(process, callback))
+
+	def watch_directory(self, path: str, mask: int, callback: Callable[[pyinotify.Event], None]) -> None:
+		"""
+		Run callback for every inotify event in mask on the directory
+		"""
+		if self._watch_manager is None:
+			self._watch_manager = pyinotify.WatchManager()
+			self._notifier = pyinotify.Notifier(self._watch_manager, default_proc_fun=lambda event: None)
+			self._selector.register(self._watch_manager.get_fd(), selectors.EVENT_READ, self._read_file_events)
+		self._watch_manager.add_watch(path, mask, proc_fun=callback)
+
+	def _read_file_events(self) -> None:
+		self._notifier.read_events()
+		self._notifier.process_events()
+
+	def _drain_wakeup(self) -> None:
+		try:
+			os.eventfd_read(self._wakeup_fd)
+		except BlockingIOError:
+			pass
+		with self._handoff_lock:
+			callbacks = list(self._handoff)
+			self._handoff.clear()
+		for callback in callbacks:
+			self._dispatch(callback)
+
+	def start(self, name: str = "sensor_reactor") -> None:
+		self.thread = threading.Thread(target=self._run, name=name)
+		self.thread.start()
+
+	def stop(self) -> None:
+		with self._handoff_lock:
+			if self._stopped:
+				return
+			self._stopped = True
+			os.eventfd_write(self._wakeup_fd, 1)
+
+	def join(self) -> None:
+		if self.thread is not None and self.thread.is_alive():
+			self.thread.join()
+
+	def _run(self) -> None:
+		while not self._stopped:
+			timeout = None
+			if len(self._timers) > 0:
+				timeout = max(0.0, self._timers[0].deadline - time.monotonic())
+			for key, _ in self._selector.select(timeout):
+				if self._stopped:
+					break
+				self._dispatch(key.data)
+			now = time.monotonic()
+			while len(self._timers) > 0 and self._timers[0].deadline <= now and not self._stopped:
+				timer = heapq.heappop(self._timers)
+				if not timer.cancelled:
+					self._dispatch(timer.callback)
+
+	def _dispatch(self, callback: Callable[[], None]) -> None:
+		# A misbehaving sensor should not take the other sensors of the run down with it
+		try:
+			callback()
+		except Exception as e:
+			logging.error(f"Sensor reactor callback encountered an exception | {e}")
+
+	def close(self) -> None:
+		for process_fd in self._process_fds:
+			os.close(process_fd)
+		self._process_fds.clear()
+		if self._watch_manager is not None:
+			self._watch_manager.close()
+		self._selector.close()
+		os.close(self._wakeup_fd)
@@ -0,0 +1,70 @@
+from array import array
+import json
+import sys
+import time
+from typing import BinaryIO, Dict, List, Tuple
+
+# Sample files are a single JSON header line followed by rows of signed 64-bit integers in the byte order of the host
+# Sensors sampling at millisecond intervals write them through a preallocated ring buffer, memory use does not grow with the run
+
+
+class SampleRingBuffer:
+	"""
+	Preallocated buffer of sample rows, written to disk in one go whenever it fills up
+	"""
+
+	def __init__(self, width: int, capacity: int, output: BinaryIO) -> None:
+		self.width = width
+		self.capacity = capacity
+		self.output = output
+		self._rows = array("q", bytes(8 * capacity * width))
+		self._count = 0
+
+	def append(self, row: List[int]) -> None:
+		offset = self._count * self.width
+		self._rows[offset:offset + self.width] = array("q", row)
+		self._count += 1
+		if self._count == self.capacity:
+			self.flush()
+
+	def flush(self) -> None:
+		if self._count == 0:
+			return
+		self.output.write(memoryview(self._rows)[:self._count * self.width].cast("B"))
+		self._count = 0
+
+	def close(self) -> None:
+		self.flush()
+		self.output.close()
+
+
+def open_sample_file(path: str, file_format: str, fields: List[str], capacity: int, **header) -> SampleRingBuffer:
+	"""
+	Create a sample file and the ring buffer that fills it, additional keyword arguments end up in the header
+	"""
+	output = open(path, "wb")
+	output.write((json.dumps({
+		"format": file_format,
+		"version": 1,
+		"byteorder": sys.byteorder,
+		"fields": fields,
+		"created": time.time(),
+		**header,
+	}) + "\n").encode())
+	return SampleRingBuffer(len(fields), capacity, output)
+
+
+def read_sample_file(path: str) -> Tuple[Dict, Dict[str, array]]:
+	"""
+	Header and columns (field name -> values) of a sample file
+	"""
+	with open(path, "rb") as fp:
+		header = json.loads(fp.readline())
+		rows = array("q")
+		data = fp.read()
+		rows.frombytes(data[:len(data) - len(data) % rows.itemsize])  # A crash can cut off the last row, even halfway through a value
+	if header["byteorder"] != sys.byteorder:
+		rows.byteswap()
+	width = len(header["fields"])
+	usable = len(rows) - len(rows) % width
+	return header, {field: rows[index:usable:width] for index, field in enumerate(header["fields"])}
@@ -1,18 +1,35 @@
-from datetime import datetime
+from dataclasses import dataclass, field
+import json
 import logging
+import os
 import subprocess
 import threading
 import time
-from typing import List
+from typing import Callable, Dict, List
 
 import pyinotify
 
 from vegvisir.data import ExperimentPaths
+from vegvisir.environments import cgroups, netstats
+from vegvisir.environments.reactor import SensorReactor
+from vegvisir.environments.samplefile import SampleRingBuffer, open_sample_file
+
+@dataclass
+class SensorContext:
+	"""
+	What sensors get to know about the run they observe, provided by the runner when sensors start
+	"""
+	container_pids: Callable[[str], int | None] | None = None  # Service name -> host PID of its container
+	networks: Dict[str, str] = field(default_factory=dict)  # Compose network name -> IPv4 subnet used by the run
 
 class ABCSensor:
+	ends_run = True  # Passive sensors never release the sync semaphore, an experiment needs at least one sensor that does
+
 	def __init__(self) -> None:
 		self.thread: threading.Thread = None
 		self.terminate_sensor = False
+		self.context = SensorContext()  # Replaced by the environment when sensors start
+		self.outcome: str | None = None  # Why the sensor ended the run (e.g., timeout), reset when sensors start
 
 	def setup(self, process_to_monitor: subprocess.Popen, actuator, sync_semaphore: threading.Thread, path_collection: ExperimentPaths):
 		self.thread = threading.Thread(target=self.thread_target, args=(process_to_monitor, actuator, sync_semaphore,))
@@ -25,34 +42,61 @@ class ABCSensor:
 		"""
 		sync_semaphore.release()
 
+	def register(self, reactor: SensorReactor, client_process: subprocess.Popen, actuator, sync_semaphore: threading.Semaphore, path_collection: ExperimentPaths) -> bool:
+		"""
+		Event-driven alternative to setup and thread_target, sensors that register their interests with the reactor of the run do not get a thread
+		Returns False for sensors that rely on thread_target instead
+		"""
+		return False
+
+	def finalize(self) -> None:
+		"""
+		Called once all sensors of the run stopped, e.g., to write out collected data
+		"""
+		pass
+
 class TimeoutSensor(ABCSensor):
 	"""
 	Timeout sensor
-	Second precision
+	Millisecond precision
 	"""
 	
-	def __init__(self, timeout: int) -> None:
+	def __init__(self, timeout: int | float) -> None:
 		super().__init__()
 		self.timeout_value = timeout
 
-	def thread_target(self, client_process: subprocess.Popen, actuator, sync_semaphore: threading.Semaphore):
-		sensor_start_time = datetime.now()
-		while (datetime.now() - sensor_start_time).seconds < self.timeout_value and not self.terminate_sensor:
-			if client_process is not None and client_process.poll() is not None:
-				logging.info(f'TimeoutSensor detected client exit before timeout, halting timer. Ran for {(datetime.now() - sensor_start_time).seconds} seconds.')
-				sync_semaphore.release()
+	def register(self, reactor: SensorReactor, client_process: subprocess.Popen, actuator, sync_semaphore: threading.Semaphore, path_collection: ExperimentPaths) -> bool:
+		self.thread = None
+		self.terminate_sensor = False
+		self.path_collection = path_collection
+		sensor_start_time = time.monotonic()
+
+		def timeout_triggered():
+			if self.terminate_sensor:
+				logging.info("TimeoutSensor stop requested")
 				return
-			time.sleep(1)
+			self.terminate_sensor = True
+			self.outcome = "timeout"
+			sync_semaphore.release()
+			logging.info(f'TimeoutSensor timeout triggered [{self.timeout_value}sec]')
+			if client_process is not None:
+				client_process.terminate()
+			if actuator is not None:
+				actuator()
 
-		if self.terminate_sensor:
-			logging.info("TimeoutSensor stop requested")
-			return
-		sync_semaphore.release()
-		logging.info(f'TimeoutSensor timeout triggered [{self.timeout_value}sec]')
+		def client_exited():
+			if self.terminate_sensor:
+				return
+			self.terminate_sensor = True
+			self.outcome = "client_exit"
+			timer.cancel()
+			logging.info(f'TimeoutSensor detected client exit before timeout, halting timer. Ran for {time.monotonic() - sensor_start_time:.3f} seconds.')
+			sync_semaphore.release()
+
+		timer = reactor.call_at(sensor_start_time + self.timeout_value, timeout_triggered)
 		if client_process is not None:
-			client_process.terminate()
-		if actuator is not None:
-			actuator()
+			reactor.watch_process(client_process, client_exited)
+		return True
 
 class BrowserDownloadWatchdogSensor(ABCSensor):
 	def __init__(self, expected_filename: str|List[str]) -> None:
@@ -61,52 +105,255 @@ class BrowserDownloadWatchdogSensor(ABCSensor):
 			expected_filename = [expected_filename]
 		self.expected_file = expected_filename
 	
-	def thread_target(self, client_process: subprocess.Popen, actuator, sync_semaphore: threading.Thread):
-		class EventHandler(pyinotify.ProcessEvent):
-			def my_init(self): 
-				self.expected_file = None
-				self.stop_event = None
-
-			def process_IN_MOVED_TO(self, event):
-				if self.expected_file is not None and event.name not in self.expected_file:
-					return
-				logging.info(f'BrowserDownloadWatchdogSensor detected expected file [{event.name}]')
-				if self.stop_event is not None:
-					self.stop_event.set()
-				
+	def register(self, reactor: SensorReactor, client_process: subprocess.Popen, actuator, sync_semaphore: threading.Semaphore, path_collection: ExperimentPaths) -> bool:
+		self.thread = None
+		self.terminate_sensor = False
+		self.path_collection = path_collection
+
+		def file_moved(event: pyinotify.Event):
+			if self.terminate_sensor or event.name not in self.expected_file:
+				return
+			logging.info(f'BrowserDownloadWatchdogSensor detected expected file [{event.name}]')
+			self.terminate_sensor = True
+			self.outcome = "file_found"
+			sync_semaphore.release()
+			logging.info('BrowserDownloadWatchdogSensor file-found triggered')
+			if client_process is not None:
+				client_process.terminate()
+			if actuator is not None:
+				actuator()
+
+		def client_exited():
+			if self.terminate_sensor:
+				return
+			self.terminate_sensor = True
+			self.outcome = "client_exit"
+			logging.info(f'BrowserDownloadWatchdogSensor detected client exit before finding expected file')
+			sync_semaphore.release()
 
 		# Browsers seem to create the expected file, then create a temporary file
 		# Finally they move the file contents of the temporary file to the expected file
 		# This triggers an `IN_MOVED_TO` event, which should signify the end of a download
-		wm = pyinotify.WatchManager()
-		mask = pyinotify.IN_MOVED_TO
-		event_handler = EventHandler()
-		notifier = pyinotify.ThreadedNotifier(wm, event_handler)
-		event_handler.expected_file = self.expected_file
-		event_handler.stop_event = threading.Event()
-		notifier.start()
-		watched_path = wm.add_watch(self.path_collection.download_path_client, mask)
+		reactor.watch_directory(self.path_collection.download_path_client, pyinotify.IN_MOVED_TO, file_moved)
+		if client_process is not None:
+			reactor.watch_process(client_process, client_exited)
+		return True
+
+class ContainerResourceSensor(ABCSensor):
+	"""
+	Samples the CPU, memory and IO counters of the run containers from their cgroup (v2) at a fixed interval
+	Passive sensor, it never ends a run
+	Samples are kept in a preallocated ring buffer and written to container_resources.bin in the permutation log directory, see cgroups.read_resource_samples
+	"""
+	ends_run = False
+	MIN_INTERVAL = 0.01
+	RESOLVE_INTERVAL = 0.25  # Containers that are not running yet (e.g., the client) are looked up again at this interval
+	RESOLVE_TIMEOUT = 10.0  # Host clients have no client container, stop looking for it at some point
+	OUTPUT_FILE = "container_resources.bin"
+
+	def __init__(self, interval: float = 0.1, containers: List[str] = ["client", "server", "sim"], buffer_samples: int = 4096) -> None:
+		super().__init__()
+		if interval < ContainerResourceSensor.MIN_INTERVAL:
+			logging.warning(f"ContainerResourceSensor interval [{interval}] is below the minimum, sampling every {ContainerResourceSensor.MIN_INTERVAL} seconds instead")
+			interval = ContainerResourceSensor.MIN_INTERVAL
+		self.interval = interval
+		self.containers = list(containers)
+		self.buffer_samples = max(1, buffer_samples)
+
+		self._readers: Dict[int, cgroups.CgroupReader] = {}  # Container index -> reader, only touched by the reactor thread
+		self._opened_readers: List[cgroups.CgroupReader] = []  # Every reader of the run, closed once the run ends
+		self._buffer: SampleRingBuffer | None = None
+		self._resolver: threading.Thread | None = None
+		self._resolver_stop = threading.Event()
+
+	def register(self, reactor: SensorReactor, client_process: subprocess.Popen, actuator, sync_semaphore: threading.Semaphore, path_collection: ExperimentPaths) -> bool:
+		self.thread = None
+		self.terminate_sensor = False
+		self.path_collection = path_collection
+		self._readers = {}
+		self._opened_readers = []
+		self._buffer = open_sample_file(os.path.join(path_collection.log_path_permutation, ContainerResourceSensor.OUTPUT_FILE), cgroups.RESOURCE_SAMPLES_FORMAT, cgroups.SAMPLE_FIELDS, self.buffer_samples, containers=self.containers, interval=self.interval)
+
+		# Looking up containers can take a docker CLI call, the reactor should never wait on that
+		self._resolver_stop.clear()
+		self._resolver = threading.Thread(target=self._resolve_containers, args=(reactor,), name="container_resource_resolver", daemon=True)
+		self._resolver.start()
+
+		next_sample = time.monotonic()
+		def sample():
+			nonlocal next_sample
+			self._sample()
+			next_sample += self.interval
+			now = time.monotonic()
+			if next_sample < now:
+				next_sample = now + self.interval  # Skip the samples that were missed instead of bursting to catch up
+			reactor.call_at(next_sample, sample)
+		reactor.call_at(next_sample, sample)
+		return True
+
+	def _resolve_containers(self, reactor: SensorReactor) -> None:
+		unresolved = list(range(len(self.containers)))
+		deadline = time.monotonic() + ContainerResourceSensor.RESOLVE_TIMEOUT
+		while len(unresolved) > 0 and not self._resolver_stop.is_set():
+			if time.monotonic() > deadline:
+				logging.debug(f"ContainerResourceSensor found no running container for [{', '.join(self.containers[index] for index in unresolved)}]")
+				return
+			for index in list(unresolved):
+				try:
+					pid = self.context.container_pids(self.containers[index]) if self.context.container_pids is not None else None
+				except Exception as e:
+					logging.debug(f"ContainerResourceSensor could not look up container [{self.containers[index]}] | {e}")
+					pid = None
+				cgroup_path = cgroups.cgroup_path_of_process(pid) if pid is not None else None
+				if cgroup_path is None:
+					continue
+				try:
+					reader = cgroups.CgroupReader(cgroup_path)
+				except OSError as e:
+					logging.warning(f"ContainerResourceSensor can not read cgroup [{cgroup_path}] of container [{self.containers[index]}] | {e}")
+					unresolved.remove(index)
+					continue
+				unresolved.remove(index)
+				self._opened_readers.append(reader)
+				reactor.call_soon_threadsafe(lambda index=index, reader=reader: self._readers.setdefault(index, reader))
+			self._resolver_stop.wait(ContainerResourceSensor.RESOLVE_INTERVAL)
+
+	def _sample(self) -> None:
+		timestamp = time.time_ns() // 1000
+		for index, reader in list(self._readers.items()):
+			row = [timestamp, index] + [-1] * (len(cgroups.SAMPLE_FIELDS) - 2)
+			try:
+				reader.sample(row)
+			except (OSError, ValueError):
+				# The cgroup disappears together with its container
+				reader.close()
+				del self._readers[index]
+				continue
+			self._buffer.append(row)
+
+	def finalize(self) -> None:
+		self._resolver_stop.set()
+		if self._resolver is not None:
+			self._resolver.join()
+			self._resolver = None
+		for reader in self._opened_readers:
+			reader.close()
+		self._readers = {}
+		self._opened_readers = []
+		if self._buffer is not None:
+			self._buffer.close()
+			self._buffer = None
+
+class InterfaceThroughputSensor(ABCSensor):
+	"""
+	Samples the statistics counters of the run's compose bridges and the container veths attached to them every few milliseconds
+	Passive sensor, it never ends a run
+	Samples are written to interface_throughput.bin in the permutation log directory (see netstats.read_throughput_samples)
+	Once the run ends, interface_throughput.json lists the sampled interfaces and summarizes their throughput in percentiles
+	"""
+	ends_run = False
+	MIN_INTERVAL = 0.001
+	RESCAN_INTERVAL = 0.25  # Veths of containers that start later (e.g., the client) attach to the bridge while sampling
+	OUTPUT_FILE = "interface_throughput.bin"
+	SUMMARY_FILE = "interface_throughput.json"
+
+	def __init__(self, interval: float = 0.005, networks: List[str] = ["leftnet", "rightnet"], buffer_samples: int = 16384) -> None:
+		super().__init__()
+		if interval < InterfaceThroughputSensor.MIN_INTERVAL:
+			logging.warning(f"InterfaceThroughputSensor interval [{interval}] is below the minimum, sampling every {InterfaceThroughputSensor.MIN_INTERVAL} seconds instead")
+			interval = InterfaceThroughputSensor.MIN_INTERVAL
+		self.interval = interval
+		self.networks = list(networks)
+		self.buffer_samples = max(1, buffer_samples)
+
+		self._bridges: Dict[str, str] = {}  # Network -> bridge
+		self._interfaces: List[Dict] = []  # Interface index -> description, as written to the summary
+		self._readers: Dict[int, netstats.InterfaceCounterReader] = {}  # Interface index -> reader, only touched by the reactor thread
+		self._buffer: SampleRingBuffer | None = None
+		self._output_path: str | None = None
+
+	def register(self, reactor: SensorReactor, client_process: subprocess.Popen, actuator, sync_semaphore: threading.Semaphore, path_collection: ExperimentPaths) -> bool:
+		self.thread = None
+		self.terminate_sensor = False
+		self.path_collection = path_collection
+		self._bridges = {}
+		self._interfaces = []
+		self._readers = {}
+
+		for network in self.networks:
+			subnet = self.context.networks.get(network)
+			bridge = netstats.find_bridge(subnet) if subnet is not None else None
+			if bridge is None:
+				logging.warning(f"InterfaceThroughputSensor found no bridge for network [{network}] [{subnet}]")
+				continue
+			self._bridges[network] = bridge
+			self._add_interface(network, bridge, "bridge")
+		self._scan_ports()
+
+		self._output_path = os.path.join(path_collection.log_path_permutation, InterfaceThroughputSensor.OUTPUT_FILE)
+		self._buffer = open_sample_file(self._output_path, netstats.THROUGHPUT_SAMPLES_FORMAT, netstats.SAMPLE_FIELDS, self.buffer_samples, bridges=self._bridges, interval=self.interval)
+
+		next_sample = time.monotonic()
+		def sample():
+			nonlocal next_sample
+			self._sample()
+			next_sample += self.interval
+			now = time.monotonic()
+			if next_sample < now:
+				next_sample = now + self.interval  # Skip the samples that were missed instead of bursting to catch up
+			reactor.call_at(next_sample, sample)
+
+		def rescan():
+			self._scan_ports()
+			reactor.call_later(InterfaceThroughputSensor.RESCAN_INTERVAL, rescan)
+
+		reactor.call_at(next_sample, sample)
+		reactor.call_later(InterfaceThroughputSensor.RESCAN_INTERVAL, rescan)
+		return True
+
+	def _add_interface(self, network: str, name: str, role: str) -> None:
 		try:
-			while not self.terminate_sensor and not event_handler.stop_event.is_set():
-				if client_process is not None and client_process.poll() is not None:
-					logging.info(f'BrowserDownloadWatchdogSensor detected client exit before finding expected file')
-					sync_semaphore.release()
-					wm.rm_watch(watched_path[self.path_collection.download_path_client])
-					notifier.stop()
-					return
-				time.sleep(1)
-		except Exception as e:
-			logging.error("BrowserDownloadWatchdogSensor encountered a generic exception, sensor killed")
-			logging.error(e)
-
-		wm.rm_watch(watched_path[self.path_collection.download_path_client])
-		notifier.stop()
-		if self.terminate_sensor:
-			logging.info("BrowserDownloadWatchdogSensor stop request handled")
+			reader = netstats.InterfaceCounterReader(name)
+		except OSError as e:
+			logging.debug(f"InterfaceThroughputSensor can not read the counters of interface [{name}] | {e}")
 			return
-		sync_semaphore.release()
-		logging.info('BrowserDownloadWatchdogSensor file-found triggered')
-		if client_process is not None:
-			client_process.terminate()
-		if actuator is not None:
-			actuator()
\ No newline at end of file
+		self._readers[len(self._interfaces)] = reader
+		self._interfaces.append({"name": name, "network": network, "role": role})
+
+	def _scan_ports(self) -> None:
+		known = {(interface["network"], interface["name"]) for interface in self._interfaces}
+		for network, bridge in self._bridges.items():
+			for port in netstats.bridge_ports(bridge):
+				if (network, port) not in known:
+					self._add_interface(network, port, "port")
+
+	def _sample(self) -> None:
+		timestamp = time.time_ns() // 1000
+		for index, reader in list(self._readers.items()):
+			row = [timestamp, index] + [-1] * (len(netstats.SAMPLE_FIELDS) - 2)
+			try:
+				reader.sample(row)
+			except (OSError, ValueError):
+				# The veth disappears together with its container
+				reader.close()
+				del self._readers[index]
+				continue
+			self._buffer.append(row)
+
+	def finalize(self) -> None:
+		for reader in self._readers.values():
+			reader.close()
+		self._readers = {}
+		if self._buffer is None:
+			return
+		self._buffer.close()
+		self._buffer = None
+		try:
+			_, columns = netstats.read_throughput_samples(self._output_path)
+			summary = netstats.summarize_throughput(columns, self._interfaces)
+			summary["bridges"] = self._bridges
+			summary["interval"] = self.interval
+			with open(os.path.join(os.path.dirname(self._output_path), InterfaceThroughputSensor.SUMMARY_FILE), "w") as fp:
+				json.dump(summary, fp, indent=4)
+		except (OSError, ValueError) as e:
+			logging.warning(f"InterfaceThroughputSensor could not summarize [{self._output_path}] | {e}")
@@ -31,4 +31,16 @@ class VegvisirCommandException(VegvisirException):
 ###
 
 class VegvisirFreezeException(VegvisirException):
-    pass
\ No newline at end of file
+    pass
+
+class VegvisirShaperControlException(VegvisirException):
+	pass
+
+class VegvisirContainerBackendException(VegvisirException):
+	pass
+
+class VegvisirCertificateException(VegvisirException):
+	pass
+
+class VegvisirDevToolsException(VegvisirException):
+	pass
@@ -1,11 +1,17 @@
 import logging
+import os
 import shlex
 import subprocess
-from typing import Tuple
+from typing import IO, Dict, List, Tuple
+
+from vegvisir import tracing
+from vegvisir.privileged import PrivilegedHelper, PrivilegedOperationContext, PrivilegedResult, operation_commands
 
 class HostInterface:
 	def __init__(self, sudo_password: str) -> None:
 		self._sudo_password = sudo_password
+		self.privileged_helper: PrivilegedHelper | None = None
+		self._privileged_context = PrivilegedOperationContext(os.getuid(), os.getgid(), os.sep, os.getcwd())
 
 	# def spawn_subprocess(self, command: str, shell: bool = False) -> Tuple[str, str]:
 	#     if shell:
@@ -19,7 +25,10 @@ class HostInterface:
 	#         out, err = proc.communicate(input=proc_input)
 	#     return out, err, proc
 
-	def spawn_parallel_subprocess(self, command: str, root_privileges: bool = False, shell: bool = False) -> subprocess.Popen:
+	def spawn_parallel_subprocess(self, command: str, root_privileges: bool = False, shell: bool = False, output: IO | int | None = None) -> subprocess.Popen:
+		"""
+		Output redirects both stdout and stderr (e.g., to a file or subprocess.DEVNULL), by default both are piped
+		"""
 		shell = shell == True
 		if root_privileges:
 			# -Skp makes it so sudo reads input from stdin, invalidates the privileges granted after the command is ran and removes the password prompt
@@ -27,20 +36,68 @@ class HostInterface:
 			command = "sudo -Skp '' " + command
 		debug_command = command
 		command = shlex.split(command) if shell == False else command
-		proc = subprocess.Popen(command, shell=shell, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-		if root_privileges:
-			try:
-				proc.stdin.write(self._sudo_password.encode())
-			except BrokenPipeError:
-				logging.error(f"Pipe broke before we could provide sudo credentials. No sudo available? [{debug_command}]")
+		with tracing.span("spawn_subprocess", "subprocess", command=debug_command):
+			if output is None:
+				proc = subprocess.Popen(command, shell=shell, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+			else:
+				proc = subprocess.Popen(command, shell=shell, stdin=subprocess.PIPE, stdout=output, stderr=subprocess.STDOUT)
+			if root_privileges:
+				try:
+					proc.stdin.write(self._sudo_password.encode())
+				except BrokenPipeError:
+					logging.error(f"Pipe broke before we could provide sudo credentials. No sudo available? [{debug_command}]")
 		return proc
 
 	def spawn_blocking_subprocess(self, command: str, root_privileges: bool = False, shell: bool = False) -> Tuple[subprocess.Popen, str, str]:
-		proc = self.spawn_parallel_subprocess(command, root_privileges, shell)
-		out, err = proc.communicate()
+		with tracing.span("blocking_subprocess", "subprocess", command=command) as span_args:
+			proc = self.spawn_parallel_subprocess(command, root_privileges, shell)
+			out, err = proc.communicate()
+			span_args["returncode"] = proc.returncode
 		return proc, out.decode("utf-8").strip(), err.decode("utf-8").strip()
 
 	def _is_sudo_password_valid(self):
 		proc, _, _ = self.spawn_blocking_subprocess("which sudo", True, False)
 		return proc.returncode == 0
-		
\ No newline at end of file
+
+	def start_privileged_helper(self, root: str) -> None:
+		"""
+		Authenticate once and run whitelisted root operations through a persistent helper instead of a sudo process each
+		Paths of operations are restricted to root, raises VegvisirException when the helper can not be started
+		"""
+		self._privileged_context = PrivilegedOperationContext(os.getuid(), os.getgid(), root, os.getcwd())
+		helper = PrivilegedHelper(self, root)
+		helper.start()
+		self.privileged_helper = helper
+
+	def stop_privileged_helper(self) -> None:
+		if self.privileged_helper is not None:
+			self.privileged_helper.close()
+			self.privileged_helper = None
+
+	def run_privileged(self, operations: List[Tuple[str, Dict]], stop_on_error: bool = True) -> List[PrivilegedResult]:
+		"""
+		Run whitelisted root operations (see vegvisir.privileged.OPERATIONS), returns (returncode, stdout, stderr) for every operation that ran
+		Without a helper, or once it became unreachable, every operation is a sudo process of its own
+		"""
+		if self.privileged_helper is not None:
+			try:
+				return self.privileged_helper.execute(operations, stop_on_error)
+			except OSError as e:
+				logging.warning(f"Privileged helper is unreachable, falling back to sudo | {e}")
+				self.stop_privileged_helper()
+
+		results = []
+		for operation, arguments in operations:
+			try:
+				commands = operation_commands(operation, arguments, self._privileged_context)
+			except ValueError as e:
+				results.append((-1, "", f"Operation [{operation}] rejected | {e}"))
+			else:
+				if len(commands) == 1:
+					proc, out, err = self.spawn_blocking_subprocess(shlex.join(commands[0]), True, False)
+				else:
+					proc, out, err = self.spawn_blocking_subprocess(f"sh -c {shlex.quote(' && '.join(shlex.join(command) for command in commands))}", True, False)
+				results.append((proc.returncode, out, err))
+			if stop_on_error and results[-1][0] != 0:
+				break
+		return results
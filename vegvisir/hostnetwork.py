@@ -0,0 +1,237 @@
+from array import array
+import argparse
+import errno
+import fcntl
+import ipaddress
+import json
+import os
+import socket
+import struct
+import sys
+from typing import Dict, Iterator, List, Tuple
+
+from vegvisir.environments.netstats import bridge_ports, find_bridge
+
+# Netlink (linux/netlink.h, linux/rtnetlink.h)
+_NLMSG_HEADER = struct.Struct("=IHHII")  # Length, type, flags, sequence number, port ID
+_RTMSG = struct.Struct("=BBBBBBBBI")  # Family, destination/source prefix length, TOS, table, protocol, scope, type, flags
+_RTATTR = struct.Struct("=HH")  # Length, type
+_IFADDRMSG = struct.Struct("=BBBBI")  # Family, prefix length, flags, scope, interface index
+_NLMSG_ERROR = 2
+_NLMSG_DONE = 3
+_NLM_F_REQUEST = 0x1
+_NLM_F_ACK = 0x4
+_NLM_F_DUMP = 0x300
+_NLM_F_REPLACE = 0x100
+_NLM_F_CREATE = 0x400
+_RTM_GETADDR = 22
+_RTM_NEWROUTE = 24
+_RTM_GETROUTE = 26
+_IFA_ADDRESS = 1
+_IFA_LOCAL = 2
+_RTA_DST = 1
+_RTA_OIF = 4
+_RTA_GATEWAY = 5
+_RTA_PRIORITY = 6
+_RTA_TABLE = 15
+_RT_TABLE_MAIN = 254
+_RTPROT_BOOT = 3
+_RT_SCOPE_UNIVERSE = 0
+_RTN_UNICAST = 1
+
+# ethtool (linux/ethtool.h, linux/sockios.h)
+_SIOCETHTOOL = 0x8946
+_ETHTOOL_GTXCSUM = 0x16
+_ETHTOOL_STXCSUM = 0x17
+
+
+def _align(length: int) -> int:
+	return (length + 3) & ~3
+
+
+def _attribute(attribute_type: int, value: bytes) -> bytes:
+	length = _RTATTR.size + len(value)
+	return _RTATTR.pack(length, attribute_type) + value + b"\0" * (_align(length) - length)
+
+
+def _attributes(data: bytes) -> Dict[int, bytes]:
+	attributes = {}
+	offset = 0
+	while offset + _RTATTR.size <= len(data):
+		length, attribute_type = _RTATTR.unpack_from(data, offset)
+		if length < _RTATTR.size:
+			break
+		attributes[attribute_type] = data[offset + _RTATTR.size:offset + length]
+		offset += _align(length)
+	return attributes
+
+
+def _route_table(attributes: Dict[int, bytes], table: int) -> int:
+	# Tables above 255 only fit the attribute
+	return struct.unpack("=I", attributes[_RTA_TABLE])[0] if _RTA_TABLE in attributes else table
+
+
+class RouteNetlink:
+	"""
+	Minimal rtnetlink client for the IPv4 routes of the main table, replaces `ip route` without spawning a process
+	Modifying routes requires CAP_NET_ADMIN, listing them does not
+	"""
+
+	def __init__(self) -> None:
+		self._socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_CLOEXEC, socket.NETLINK_ROUTE)
+		self._socket.bind((0, 0))
+		self._sequence = 0
+
+	def _request(self, message_type: int, flags: int, payload: bytes) -> Iterator[Tuple[int, bytes]]:
+		"""
+		Send a request and yield the (type, payload) of every reply until it is done, raises OSError for errors the kernel reports
+		"""
+		self._sequence += 1
+		self._socket.send(_NLMSG_HEADER.pack(_NLMSG_HEADER.size + len(payload), message_type, _NLM_F_REQUEST | flags, self._sequence, 0) + payload)
+		while True:
+			data = self._socket.recv(65536)
+			offset = 0
+			while offset + _NLMSG_HEADER.size <= len(data):
+				length, reply_type, _, sequence, _ = _NLMSG_HEADER.unpack_from(data, offset)
+				payload_reply = data[offset + _NLMSG_HEADER.size:offset + length]
+				offset += _align(length)
+				if sequence != self._sequence:
+					continue
+				if reply_type == _NLMSG_DONE:
+					return
+				if reply_type == _NLMSG_ERROR:
+					error = -struct.unpack_from("=i", payload_reply)[0]
+					if error != 0:
+						raise OSError(error, os.strerror(error))
+					return  # Acknowledgement
+				yield reply_type, payload_reply
+
+	def all_routes(self, family: int = socket.AF_INET) -> List[Dict]:
+		"""
+		Routes of the main table with their destination, gateway (None for connected routes), output interface and metric
+		"""
+		routes = []
+		for _, payload in self._request(_RTM_GETROUTE, _NLM_F_DUMP, _RTMSG.pack(family, 0, 0, 0, 0, 0, 0, 0, 0)):
+			_, dst_len, _, _, table, _, _, _, _ = _RTMSG.unpack_from(payload)
+			attributes = _attributes(payload[_RTMSG.size:])
+			if _route_table(attributes, table) != _RT_TABLE_MAIN:
+				continue
+			destination = ipaddress.ip_address(attributes[_RTA_DST]) if _RTA_DST in attributes else ipaddress.ip_address(b"\0" * (4 if family == socket.AF_INET else 16))
+			routes.append({
+				"destination": str(ipaddress.ip_network((destination, dst_len))),
+				"gateway": str(ipaddress.ip_address(attributes[_RTA_GATEWAY])) if _RTA_GATEWAY in attributes else None,
+				"oif": struct.unpack("=I", attributes[_RTA_OIF])[0] if _RTA_OIF in attributes else None,
+				"metric": struct.unpack("=I", attributes[_RTA_PRIORITY])[0] if _RTA_PRIORITY in attributes else 0,
+			})
+		return routes
+
+	def routes(self, subnet: str) -> List[Dict]:
+		"""
+		Routes of the main table towards exactly subnet
+		"""
+		network = str(ipaddress.IPv4Network(subnet))
+		return [route for route in self.all_routes() if route["destination"] == network]
+
+	def addresses(self) -> List[Dict]:
+		"""
+		IPv4 and IPv6 addresses of every interface, like `ip address`
+		"""
+		addresses = []
+		for _, payload in self._request(_RTM_GETADDR, _NLM_F_DUMP, _IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)):
+			_, prefix_length, _, _, index = _IFADDRMSG.unpack_from(payload)
+			attributes = _attributes(payload[_IFADDRMSG.size:])
+			address = attributes.get(_IFA_LOCAL, attributes.get(_IFA_ADDRESS))
+			if address is not None:
+				addresses.append({"interface": index, "address": f"{ipaddress.ip_address(address)}/{prefix_length}"})
+		return addresses
+
+	def replace_route(self, subnet: str, via: str) -> None:
+		"""
+		Equivalent of `ip route replace subnet via via`, takes the place of the route docker added for the bridge of subnet in one step
+		"""
+		network = ipaddress.IPv4Network(subnet)
+		payload = _RTMSG.pack(socket.AF_INET, network.prefixlen, 0, 0, _RT_TABLE_MAIN, _RTPROT_BOOT, _RT_SCOPE_UNIVERSE, _RTN_UNICAST, 0)
+		payload += _attribute(_RTA_DST, network.network_address.packed)
+		payload += _attribute(_RTA_GATEWAY, ipaddress.IPv4Address(via).packed)
+		for _ in self._request(_RTM_NEWROUTE, _NLM_F_ACK | _NLM_F_CREATE | _NLM_F_REPLACE, payload):
+			pass
+
+	def close(self) -> None:
+		self._socket.close()
+
+
+def _ethtool_value(sock: socket.socket, interface: str, command: int, data: int = 0) -> int:
+	value = array("I", [command, data])  # struct ethtool_value
+	address, _ = value.buffer_info()
+	fcntl.ioctl(sock.fileno(), _SIOCETHTOOL, struct.pack("16sP16x", interface[:15].encode(), address))
+	return value[1]
+
+
+def tx_checksum_enabled(interface: str) -> bool:
+	with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+		return _ethtool_value(sock, interface, _ETHTOOL_GTXCSUM) != 0
+
+
+def set_tx_checksum(interface: str, enabled: bool) -> None:
+	"""
+	Equivalent of `ethtool -K interface tx on|off`, requires CAP_NET_ADMIN
+	"""
+	with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+		_ethtool_value(sock, interface, _ETHTOOL_STXCSUM, 1 if enabled else 0)
+
+
+def host_client_network_state(leftnet_subnet: str) -> Tuple[str | None, Tuple[str, ...]]:
+	"""
+	Bridge of the leftnet compose network and the container veths attached to it, read from sysfs without privileges
+	Docker creates a new bridge for every network and a new veth for every container, a different state means the setup has to be redone
+	"""
+	bridge = find_bridge(leftnet_subnet)
+	return bridge, tuple(bridge_ports(bridge)) if bridge is not None else ()
+
+
+def reconcile_host_client_network(rightnet_subnet: str, via: str, leftnet_subnet: str) -> Dict:
+	"""
+	Reroute rightnet_subnet via the shaper and disable TX checksum offload on the leftnet veths, like `ip route replace` and `ethtool -K <veth> tx off`
+	By default containers do not compute UDP / TCP checksums, ns3 based shapers however require valid checksums (https://github.com/marten-seemann/quic-network-simulator/blob/master/endpoint/setup.sh)
+	Only what differs from the desired state is changed, returns what was done
+	"""
+	report = {"route": "unchanged", "tx_checksum_disabled": []}
+	netlink = RouteNetlink()
+	try:
+		routes = netlink.routes(rightnet_subnet)
+		if not any(route["gateway"] == via and route["metric"] == 0 for route in routes):
+			netlink.replace_route(rightnet_subnet, via)
+			report["route"] = "replaced"
+	finally:
+		netlink.close()
+
+	bridge, ports = host_client_network_state(leftnet_subnet)
+	report["bridge"] = bridge
+	for port in ports:
+		try:
+			if tx_checksum_enabled(port):
+				set_tx_checksum(port, False)
+				report["tx_checksum_disabled"].append(port)
+		except OSError as e:
+			if e.errno not in [errno.ENODEV, errno.ENXIO]:
+				raise
+			# The container of the veth stopped in the meantime
+	return report
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Route the rightnet of a slot via its shaper and disable TX checksum offload on the leftnet veths")
+	parser.add_argument("--rightnet", required=True)
+	parser.add_argument("--via", required=True)
+	parser.add_argument("--leftnet", required=True)
+	arguments = parser.parse_args()
+	try:
+		report = reconcile_host_client_network(arguments.rightnet, arguments.via, arguments.leftnet)
+	except (OSError, ValueError) as e:
+		print(f"Host client network setup failed | {e}", file=sys.stderr)
+		sys.exit(1)
+	print(json.dumps(report))
+
+
+if __name__ == "__main__":
+	main()
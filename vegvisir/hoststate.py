@@ -0,0 +1,157 @@
+from datetime import datetime
+import json
+import logging
+import os
+import socket
+import tempfile
+from typing import Callable, Dict, List
+
+from vegvisir.hostnetwork import RouteNetlink
+
+HOST_STATE_FILE = "host_state.json"
+HOST_STATE_DIFF_FILE = "host_state_diff.json"
+PROC_SYS = "/proc/sys"
+
+# Counters and random values that change on their own, differences in these say nothing about the experiment
+VOLATILE_SYSCTLS = (
+	"fs.aio-nr",
+	"fs.dentry-state",
+	"fs.file-nr",
+	"fs.inode-nr",
+	"fs.inode-state",
+	"fs.quota.",
+	"kernel.ns_last_pid",
+	"kernel.pty.nr",
+	"kernel.random.",
+	"net.netfilter.nf_conntrack_count",
+)
+
+
+def read_sysctls(proc_sys: str = PROC_SYS) -> Dict[str, str]:
+	"""
+	Every readable kernel parameter, keyed like `sysctl -a` (dots in path components, e.g., of interface names, become slashes)
+	Parameters only root can read are left out
+	"""
+	sysctls = {}
+	directories = [(proc_sys, "")]
+	while len(directories) > 0:
+		directory, prefix = directories.pop()
+		for entry in os.scandir(directory):
+			key = prefix + entry.name.replace(".", "/")
+			if entry.is_dir(follow_symlinks=False):
+				directories.append((entry.path, key + "."))
+				continue
+			try:
+				fd = os.open(entry.path, os.O_RDONLY | os.O_CLOEXEC)
+			except OSError:
+				continue  # Write-only or root-only
+			try:
+				value = os.read(fd, 65536)
+			except OSError:
+				continue  # Parameters that refuse to be read (e.g., EIO)
+			finally:
+				os.close(fd)
+			sysctls[key] = " ".join(value.decode("utf-8", errors="replace").split())
+	return dict(sorted(sysctls.items()))
+
+
+def _interface_name(index: int | None) -> str:
+	if index is None:
+		return "-"
+	try:
+		return socket.if_indextoname(index)
+	except OSError:
+		return str(index)  # Removed in the meantime
+
+
+def read_network() -> Dict[str, List[str]]:
+	"""
+	Addresses and main table routes of the host as sorted lines, similar to `ip address` and `ip route list`
+	"""
+	netlink = RouteNetlink()
+	try:
+		addresses = sorted(f"{_interface_name(address['interface'])} {address['address']}" for address in netlink.addresses())
+		routes = sorted(
+			f"{route['destination']}{' via ' + route['gateway'] if route['gateway'] is not None else ''} dev {_interface_name(route['oif'])} metric {route['metric']}"
+			for family in [socket.AF_INET, socket.AF_INET6] for route in netlink.all_routes(family)
+		)
+	finally:
+		netlink.close()
+	return {"addresses": addresses, "routes": routes}
+
+
+def capture_host_state() -> Dict:
+	state = {"captured": datetime.now().isoformat(), "sysctl": read_sysctls()}
+	try:
+		state.update(read_network())
+	except OSError as e:
+		logging.getLogger("root.HostState").warning(f"Could not read host addresses and routes | {e}")
+	return state
+
+
+def diff_host_state(baseline: Dict, current: Dict) -> Dict:
+	"""
+	Changes of current compared to baseline: changed, added and removed sysctls and added and removed addresses and routes
+	"""
+	before, after = baseline.get("sysctl", {}), current.get("sysctl", {})
+	sysctl = {
+		"changed": {key: [before[key], value] for key, value in after.items() if key in before and before[key] != value and not key.startswith(VOLATILE_SYSCTLS)},
+		"added": {key: value for key, value in after.items() if key not in before},
+		"removed": sorted(key for key in before if key not in after),
+	}
+	diff = {"sysctl": sysctl}
+	for key in ["addresses", "routes"]:
+		lines_before, lines_after = set(baseline.get(key, [])), set(current.get(key, []))
+		diff[key] = {"added": sorted(lines_after - lines_before), "removed": sorted(lines_before - lines_after)}
+	return diff
+
+
+def _write_json(path: str, data: Dict) -> None:
+	fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+	with os.fdopen(fd, "w") as fp:
+		json.dump(data, fp, indent=4)
+	os.replace(temporary_path, path)
+
+
+class HostStateSnapshot:
+	"""
+	Kernel parameters, addresses, routes and tool versions of the host, captured once per experiment in the root of its logs
+	Runs only store how the host differs from it, read directly from /proc/sys and netlink instead of running `sysctl -a` and `ip` as root
+	"""
+
+	def __init__(self, state: Dict) -> None:
+		self.state = state
+
+	@staticmethod
+	def load_or_capture(log_path_date: str, versions: Callable[[], Dict[str, str]]) -> "HostStateSnapshot":
+		"""
+		Resumed experiments keep the snapshot of their first start, so all their runs are compared against the same state
+		Versions are only probed when a new snapshot is captured
+		"""
+		path = os.path.join(log_path_date, HOST_STATE_FILE)
+		try:
+			with open(path, "r") as fp:
+				return HostStateSnapshot(json.load(fp))
+		except (OSError, json.JSONDecodeError):
+			pass
+		state = capture_host_state()
+		state["versions"] = versions()
+		_write_json(path, state)
+		return HostStateSnapshot(state)
+
+	def record_run(self, log_path_permutation: str) -> Dict:
+		"""
+		Write the differences of the current host state to the run directory, returns them
+		"""
+		diff = diff_host_state(self.state, capture_host_state())
+		_write_json(os.path.join(log_path_permutation, HOST_STATE_DIFF_FILE), diff)
+		return diff
+
+
+def summarize_diff(diff: Dict) -> str:
+	sysctl = diff["sysctl"]
+	return (
+		f"{len(sysctl['changed'])} changed, {len(sysctl['added'])} added and {len(sysctl['removed'])} removed sysctl(s), "
+		f"{len(diff['addresses']['added'])}/{len(diff['addresses']['removed'])} added/removed address(es), "
+		f"{len(diff['routes']['added'])}/{len(diff['routes']['removed'])} added/removed route(s)"
+	)
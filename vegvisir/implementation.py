@@ -1,7 +1,7 @@
 from dataclasses import fields
 from enum import Enum
+import functools
 import re
-import sys
 from typing import Dict, List, TextIO, Tuple
 
 from vegvisir.data import VegvisirArguments
@@ -168,59 +168,143 @@ class HostCommand:
 		# 	raise VegvisirCommandException(f"Command [{self.command}] serialized with non-dict type input.") 
 		
 		# Assume the hydrated_parameters have already been substituted, this implies that escaped parts have already been replaced
-		# Doing the substitution with infinite depth again will detect false cycles, we must limit it the substitution process to one cycle 
-		return ArgumentTemplate.substitute(self.command, hydrated_parameters, max_depth=1)
+		# Their values are inserted as is, substituting them again would unescape twice and detect false cycles
+		return ArgumentTemplate.compile(self.command).fill(hydrated_parameters)
 
 class ArgumentTemplate:
+	"""
+	A template compiled into its literal text and the parameters in between, so filling it in never touches the regex again
+	literals always holds one entry more than parameters, filling alternates between both starting with the first literal
+	"""
 	# pattern = re.compile(r"\$(?:(?:{(?P<parameter>(?:[A-Z]+[A-Z0-9]*))})|(?P<escaped>\${(?:[A-Z]+[A-Z0-9]*)}))")
 	pattern = re.compile(r"\!(?:(?:\{(?P<parameter>(?:[A-Z0-9_-]+))\})|(?P<escaped>\!)|(?:(?P<invalid>)))")
 
-	def _sub(template: str, hydrated_parameters: Dict[str, str], visited_nodes=[], max_depth=0):
-		def sub_rule(match_object: re.Match):
-			nonlocal visited_nodes
+	def __init__(self, template: str) -> None:
+		self.template = template
+		self.literals: List[str] = []
+		self.parameters: Tuple[str, ...] = ()
+
+		parameters: List[str] = []
+		literal: List[str] = []
+		position = 0
+		for match_object in ArgumentTemplate.pattern.finditer(template):
+			literal.append(template[position:match_object.start()])
+			position = match_object.end()
 			if match_object.group("escaped") is not None:
-				return match_object.group("escaped")
-			if match_object.group("parameter") is not None:
-				param = match_object.group("parameter")
-				if max_depth > 0 and len(visited_nodes) >= max_depth:
-					return f"!{{{param}}}"
-				if param not in hydrated_parameters:
-					raise VegvisirArgumentException(f"Argument [{template}] references unknown parameter [{param}].")
-				if param in visited_nodes:
-					raise VegvisirArgumentException(f"Cycle detected [{'->'.join([f'!{{{node}}}' for node in visited_nodes])}->!{{{param}}}]")
-				current_cycle_visited_nodes = list(visited_nodes)  # Each branch requires a copy of the list
-				current_cycle_visited_nodes.append(param)
-				collapsed_arg = ArgumentTemplate._sub(hydrated_parameters[param], hydrated_parameters, current_cycle_visited_nodes, max_depth)
-				hydrated_parameters[param] = collapsed_arg  # Some memoization can't hurt
-				return collapsed_arg
-			if match_object.group("invalid") is not None:
-				debug_template = template
-				if len(template) > 60:
-					debug_template = template[match_object.start()-30:match_object.start()+30]  # Python does not care about slicing out of bounds
-				error = "Invalid parameter syntax:\n"
-				debug_template = debug_template.replace("\n", "\\n").replace("\t", "\\t").replace("\r", "\\r")
-				error += f"\t\"{debug_template}\"\n"
-				replace_offset = debug_template.count("\\n", 0, match_object.start()) + debug_template.count("\\t", 0, match_object.start()) + debug_template.count("\\r", 0, match_object.start())
-				error += "\t" + (" " * (match_object.start() + 1 + replace_offset)) + f"^ Starting point of invalid syntax"
-				raise VegvisirArgumentException(error)
-		return ArgumentTemplate.pattern.sub(sub_rule, template)
-
-	def substitute(template: str, hydrated_parameters: Dict[str, str], override_provided_parameters=False, max_depth=0):
+				literal.append(match_object.group("escaped"))
+			elif match_object.group("parameter") is not None:
+				self.literals.append("".join(literal))
+				literal = []
+				parameters.append(match_object.group("parameter"))
+			else:
+				raise VegvisirArgumentException(ArgumentTemplate._invalid_syntax_error(template, match_object))
+		literal.append(template[position:])
+		self.literals.append("".join(literal))
+		self.parameters = tuple(parameters)
+
+	def _invalid_syntax_error(template: str, match_object: re.Match) -> str:
+		debug_template = template
+		if len(template) > 60:
+			debug_template = template[match_object.start()-30:match_object.start()+30]  # Python does not care about slicing out of bounds
+		error = "Invalid parameter syntax:\n"
+		debug_template = debug_template.replace("\n", "\\n").replace("\t", "\\t").replace("\r", "\\r")
+		error += f"\t\"{debug_template}\"\n"
+		replace_offset = debug_template.count("\\n", 0, match_object.start()) + debug_template.count("\\t", 0, match_object.start()) + debug_template.count("\\r", 0, match_object.start())
+		error += "\t" + (" " * (match_object.start() + 1 + replace_offset)) + f"^ Starting point of invalid syntax"
+		return error
+
+	@functools.lru_cache(maxsize=4096)
+	def compile(template: str) -> "ArgumentTemplate":
 		"""
-		Substitute arguments matched by the pattern regex with their respective contents from the uncollapsed hydrated_parameters
-		hydrated_parameters can contain values which themselves reference arguments, postulating the need for recursive substitution and cycle checking
-		This method will collapse and cycle check the provided hydrated_parameters such that the initial provided template can correctly be substituted 
+		Compiled template, templates recur for every permutation and are only parsed the first time
 		"""
-		try:
-			return ArgumentTemplate._sub(template, hydrated_parameters if override_provided_parameters else dict(hydrated_parameters), [], max_depth)
-		except RecursionError:
-			raise VegvisirArgumentException(f"Argument [{template}] too deeply nested. Max recursion depth of {sys.getrecursionlimit()} has been reached.")
+		return ArgumentTemplate(template)
+
+	def fill(self, values: Dict[str, str]) -> str:
+		"""
+		Template with its parameters replaced by values, the values are inserted as is
+		"""
+		if len(self.parameters) == 0:
+			return self.literals[0]
+		parts = [self.literals[0]]
+		for parameter, literal in zip(self.parameters, self.literals[1:]):
+			if parameter not in values:
+				raise VegvisirArgumentException(f"Argument [{self.template}] references unknown parameter [{parameter}].")
+			parts.append(values[parameter])
+			parts.append(literal)
+		return "".join(parts)
+
+	@functools.lru_cache(maxsize=1024)
+	def resolution_order(dependencies: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> Tuple[str, ...]:
+		"""
+		Order in which parameters referencing other parameters are filled, each one after the parameters it references
+		dependencies holds every parameter with references and the parameters it references, parameters without any are already final
+		Permutations of an experiment share their dependencies, the graph is only sorted the first time
+		"""
+		graph = dict(dependencies)
+		order: List[str] = []
+		state: Dict[str, bool] = {}  # False while the dependencies of a parameter are being visited, True once it is ordered
+		for root in graph:
+			if root in state:
+				continue
+			# Depth first without recursion, the path doubles as the cycle report
+			path = [root]
+			pending = [iter(graph[root])]
+			state[root] = False
+			while len(pending) > 0:
+				parameter = next(pending[-1], None)
+				if parameter is None:
+					state[path[-1]] = True
+					order.append(path.pop())
+					pending.pop()
+				elif state.get(parameter) is False:
+					cycle = path[path.index(parameter):] + [parameter]
+					raise VegvisirArgumentException(f"Cycle detected [{'->'.join([f'!{{{node}}}' for node in cycle])}]")
+				elif parameter not in state and parameter in graph:
+					state[parameter] = False
+					path.append(parameter)
+					pending.append(iter(graph[parameter]))
+		return tuple(order)
+
+	def resolve(parameters: Dict[str, str]) -> Dict[str, str]:
+		"""
+		Collapse parameters whose values reference other parameters into their final values
+		References are resolved in dependency order, every value is filled in exactly once
+		"""
+		resolved: Dict[str, str] = {}
+		templates: Dict[str, ArgumentTemplate] = {}
+		for parameter, value in parameters.items():
+			if "!" in value:
+				templates[parameter] = ArgumentTemplate.compile(value)
+			else:
+				resolved[parameter] = value  # Paths and plain values, nothing to parse
+		dependencies = []
+		for parameter, template in templates.items():
+			if len(template.parameters) == 0:
+				resolved[parameter] = template.literals[0]
+				continue
+			for reference in template.parameters:
+				if reference not in parameters:
+					raise VegvisirArgumentException(f"Argument [{template.template}] references unknown parameter [{reference}].")
+			dependencies.append((parameter, template.parameters))
+		for parameter in ArgumentTemplate.resolution_order(tuple(dependencies)):
+			resolved[parameter] = templates[parameter].fill(resolved)
+		return {parameter: resolved[parameter] for parameter in parameters}
+
+	def substitute(template: str, hydrated_parameters: Dict[str, str]) -> str:
+		"""
+		Substitute the parameters in template with their respective contents from the uncollapsed hydrated_parameters
+		hydrated_parameters can contain values which themselves reference arguments, these are collapsed (and cycle checked) first
+		"""
+		return ArgumentTemplate.compile(template).fill(ArgumentTemplate.resolve(hydrated_parameters))
 
 
 class Parameters:
 	# _vegvisir_provided_params: List[str] = ["ORIGIN", "LOG_PATH_CLIENT", "LOG_PATH_SERVER", "LOG_PATH_SHAPER", "CERT_FINGERPRINT", "WAITFORSERVER", "SCENARIO", "ROLE", "TESTCASE", "QLOGDIR", "SSLKEYLOGFILE"]
 	_vegvisir_provided_params: List[str] = [field.name for field in fields(VegvisirArguments)]
 
+	_vegvisir_provided_params_set = frozenset(_vegvisir_provided_params)
+
 	def __init__(self, parameters: Dict[str, bool] | None = None) -> None:
 		self.params: List[str] = []
 		self._required_params: List[str] = []
@@ -256,16 +340,12 @@ class Parameters:
 			hydrated_params[arg] = user_params[arg]
 
 		# System provided arguments
-		filtered_args = vegvisir_params.keys() & Parameters._vegvisir_provided_params
+		filtered_args = vegvisir_params.keys() & Parameters._vegvisir_provided_params_set
 		for arg in filtered_args:
 			hydrated_params[arg] = vegvisir_params[arg]
 
 		# Collapse params to one level
-		substituted_hydrated_params = {}
-		for (param, arg) in hydrated_params.items():
-			substituted_hydrated_params[param] = ArgumentTemplate.substitute(hydrated_params[param], hydrated_params, True)
-
-		return substituted_hydrated_params
+		return ArgumentTemplate.resolve(hydrated_params)
 
 	def hydrate_with_empty_arguments(self) -> Dict[str, str]:
 		empty_user_args: Dict[str, str] = {arg:"" for arg in self.params}
@@ -300,12 +380,13 @@ class Parameters:
 
 
 class Scenario:
-	def __init__(self, command: str, parameters: Parameters) -> None:
+	def __init__(self, command: str, parameters: Parameters, reconfigurable: bool = False) -> None:
 		self.command: str = command
 		self.parameters: Parameters = parameters
+		self.reconfigurable: bool = reconfigurable  # Shaper can apply new arguments in place over its control channel
 
 	def __repr__(self) -> str:
-		return f"Scenario<command: '{self.command}', parameters: {self.parameters}>"
+		return f"Scenario<command: '{self.command}', parameters: {self.parameters}, reconfigurable: {self.reconfigurable}>"
 
 class DockerImage:
 	def __init__(self, image: str) -> None:
@@ -327,6 +408,22 @@ class DockerImage:
 	def tag(self):
 		return get_tag_from_image(self._image)
 
+class DevToolsSession:
+	"""
+	Host client browser that is kept alive between runs and driven over its remote debugging protocol, see devtools
+	The url is hydrated like commands, every run navigates a fresh browser context to it
+	"""
+	def __init__(self, url: str, endpoint: str, ignore_certificate_errors: bool = False) -> None:
+		self.url = url
+		self.endpoint = endpoint
+		self.ignore_certificate_errors = ignore_certificate_errors
+
+	def serialize_url(self, hydrated_parameters: Dict[str, str]) -> str:
+		return ArgumentTemplate.compile(self.url).fill(hydrated_parameters)
+
+	def __repr__(self) -> str:
+		return f"DevToolsSession<{self.endpoint}, {self.url}>"
+
 class Endpoint:
 	"""
 	Client and server representation
@@ -345,6 +442,7 @@ class Endpoint:
 		self.parameters: Parameters = params
 		self.construct: List[HostCommand] = []
 		self.destruct: List[HostCommand] = []
+		self.devtools: DevToolsSession | None = None
 		
 	def __repr__(self) -> str:
 		return f"Endpoint<{self.name}, {self.type.name}, {self.image if self.image is not None else self.command}>"
@@ -0,0 +1,123 @@
+import codecs
+import json
+import re
+from typing import Any, Iterator
+
+CHUNK_SIZE = 1 << 20
+MAX_VALUE_SIZE = 64 << 20  # A single value larger than this is treated as a corrupt file instead of read into memory
+WHITESPACE = " \t\r\n"
+
+
+class JSONStreamReader:
+	"""
+	Incremental tokenizer for JSON files too large to parse as a whole (e.g., qlogs and net-logs)
+	The file is read in chunks, callers search for the keys they are interested in and decode the values behind them one by one
+	Only the current chunk and the value being decoded are kept in memory
+	"""
+
+	def __init__(self, path: str, chunk_size: int = CHUNK_SIZE) -> None:
+		self.path = path
+		self.chunk_size = chunk_size
+		self.truncated = False  # Set once the file ended halfway through a value
+		self._buffer = ""
+		self._position = 0
+		self._eof = False
+		self._decoder = json.JSONDecoder()
+		self._text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+		self._file = None
+
+	def __enter__(self) -> "JSONStreamReader":
+		self._file = open(self.path, "rb")
+		return self
+
+	def __exit__(self, *_) -> None:
+		self._file.close()
+
+	def _fill(self) -> bool:
+		if self._eof:
+			return False
+		chunk = self._file.read(self.chunk_size)
+		self._eof = len(chunk) == 0
+		self._buffer = self._buffer[self._position:] + self._text.decode(chunk, final=self._eof)
+		self._position = 0
+		return not self._eof
+
+	def head(self, size: int) -> str:
+		"""
+		First characters of the file, without consuming them
+		"""
+		while len(self._buffer) - self._position < size and self._fill():
+			pass
+		return self._buffer[self._position:self._position + size]
+
+	def skip(self, characters: str) -> str:
+		"""
+		Move past characters, returns the next character or an empty string at the end of the file
+		"""
+		while True:
+			while self._position < len(self._buffer) and self._buffer[self._position] in characters:
+				self._position += 1
+			if self._position < len(self._buffer):
+				return self._buffer[self._position]
+			if not self._fill():
+				return ""
+
+	def decode(self) -> Any:
+		"""
+		Decode the value at the current position, raises json.JSONDecodeError on invalid or truncated data
+		"""
+		while True:
+			try:
+				value, self._position = self._decoder.raw_decode(self._buffer, self._position)
+				return value
+			except json.JSONDecodeError:
+				if len(self._buffer) - self._position > MAX_VALUE_SIZE or not self._fill():
+					if self._eof:
+						self.truncated = True
+					raise
+
+	def find(self, pattern: re.Pattern) -> bool:
+		"""
+		Move right after the next match of pattern, False when the file has none left
+		Patterns should match tokens (e.g., a key and the colon behind it), matches are not checked for being inside a string
+		"""
+		while True:
+			match = pattern.search(self._buffer, self._position)
+			if match is not None:
+				self._position = match.end()
+				return True
+			self._position = max(self._position, len(self._buffer) - 64)  # A match can straddle two chunks
+			if not self._fill():
+				return False
+
+	def array_items(self) -> Iterator[Any]:
+		"""
+		Decode the items of the array whose opening bracket was just consumed
+		An array cut off by the end of the file yields the items before the cut and sets truncated
+		"""
+		while True:
+			character = self.skip(WHITESPACE + ",")
+			if character == "":
+				self.truncated = True
+				return
+			if character == "]":
+				self._position += 1
+				return
+			try:
+				yield self.decode()
+			except json.JSONDecodeError:
+				if not self._eof:
+					raise
+				return
+
+	def records(self, separators: str = "\x1e" + WHITESPACE) -> Iterator[Any]:
+		"""
+		Decode a sequence of top level values (JSON-SEQ / NDJSON), a record cut off by the end of the file sets truncated
+		"""
+		while self.skip(separators) != "":
+			try:
+				yield self.decode()
+			except json.JSONDecodeError:
+				if not self._eof:
+					raise
+				return
@@ -0,0 +1,81 @@
+import argparse
+import errno
+import json
+import os
+import shutil
+import sys
+from typing import Dict
+
+_CHUNK_SIZE = 1 << 20
+
+
+def _copy_data(source_fd: int, destination_path: str) -> int:
+	"""
+	Copy everything from the first data of source on, files truncated while their writer kept its offset start with a hole
+	Returns the number of bytes copied
+	"""
+	try:
+		offset = os.lseek(source_fd, 0, os.SEEK_DATA)
+	except OSError as e:
+		if e.errno != errno.ENXIO:
+			raise
+		return 0  # Only a hole
+	copied = 0
+	with open(destination_path, "wb") as destination:
+		while True:
+			chunk = os.pread(source_fd, _CHUNK_SIZE, offset + copied)
+			if len(chunk) == 0:
+				break
+			destination.write(chunk)
+			copied += len(chunk)
+	return copied
+
+
+def rotate_logs(source: str, destination: str) -> Dict:
+	"""
+	Copy the output of warm containers into a run directory and truncate it in place, like logrotate its copytruncate
+	Containers keep writing to the same files, hardlinking or moving them would let later runs write into the directory of this one
+	Directories are recreated but kept, as containers might not recreate them (e.g., QLOGDIR), empty files are left out
+	Bytes written between the copy and the truncation of a file are lost
+	"""
+	report = {"files": 0, "bytes": 0}
+	for directory, subdirectories, files in os.walk(source):
+		target_directory = os.path.join(destination, os.path.relpath(directory, source))
+		os.makedirs(target_directory, exist_ok=True)
+		for file in files:
+			path = os.path.join(directory, file)
+			try:
+				fd = os.open(path, os.O_RDWR | os.O_NOFOLLOW | os.O_CLOEXEC)
+			except OSError as e:
+				if e.errno in [errno.ENOENT, errno.ELOOP]:
+					continue  # Removed in the meantime or a symlink, neither is output of its own
+				raise
+			try:
+				if os.fstat(fd).st_size == 0:
+					continue
+				target = os.path.join(target_directory, file)
+				copied = _copy_data(fd, target)
+				shutil.copystat(path, target)
+				os.ftruncate(fd, 0)
+			finally:
+				os.close(fd)
+			report["files"] += 1
+			report["bytes"] += copied
+	return report
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Copy the output of warm containers into a run directory and truncate it in place")
+	parser.add_argument("--source", required=True)
+	parser.add_argument("--destination", required=True)
+	arguments = parser.parse_args()
+	try:
+		report = rotate_logs(arguments.source, arguments.destination)
+	except OSError as e:
+		print(f"Rotating logs failed | {e}", file=sys.stderr)
+		sys.exit(1)
+	print(json.dumps(report))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,122 @@
+import dataclasses
+from datetime import datetime
+from enum import Enum
+import json
+import logging
+import os
+import threading
+from typing import Dict, List
+
+from vegvisir.data import ExperimentPaths
+
+MANIFEST_FILE = "manifest.jsonl"
+
+
+class RunStatus(Enum):
+	COMPLETED = "completed"
+	ABORTED = "aborted"  # Interrupted by the user, the run directory is incomplete
+	FAILED = "failed"
+	CACHED = "cached"  # Results of an identical earlier run were linked into the run directory
+
+
+class ExperimentManifest:
+	"""
+	Append-only record of every run of an experiment and its post-hook, one JSON object per line in the root of the experiment logs
+	Entries are synced to disk immediately, a crash or reboot loses at most the runs that were active at that moment
+	Runs are identified by their log directory relative to the experiment root (e.g., run_3/client__shaper__server)
+	"""
+
+	def __init__(self, log_path_date: str) -> None:
+		self.log_path_date = log_path_date
+		self.path = os.path.join(log_path_date, MANIFEST_FILE)
+		self._runs: Dict[str, Dict] = {}  # Latest run entry per run directory
+		self._post_hooks: Dict[str, str] = {}  # Latest post-hook status per run directory
+		self._lock = threading.Lock()
+		self.logger = logging.getLogger("root.ExperimentManifest")
+
+		self._load()
+		self._file = open(self.path, "a")
+		if self._file.tell() > 0 and not self._ends_with_newline():
+			self._file.write("\n")  # A crash cut off the last entry, don't glue the next one onto it
+
+	def _load(self) -> None:
+		if not os.path.exists(self.path):
+			return
+		with open(self.path, "r") as fp:
+			for line_number, line in enumerate(fp, 1):
+				if len(line.strip()) == 0:
+					continue
+				try:
+					entry = json.loads(line)
+				except json.JSONDecodeError:
+					self.logger.warning(f"Skipping unreadable manifest entry on line {line_number} of {self.path}")
+					continue
+				if entry.get("event") == "run":
+					self._runs[entry["run"]] = entry
+				elif entry.get("event") == "post_hook":
+					self._post_hooks[entry["run"]] = entry["status"]
+
+	def _ends_with_newline(self) -> bool:
+		with open(self.path, "rb") as fp:
+			fp.seek(-1, os.SEEK_END)
+			return fp.read(1) == b"\n"
+
+	def _append(self, entry: Dict) -> None:
+		entry["timestamp"] = datetime.now().isoformat()
+		line = json.dumps(entry)
+		with self._lock:
+			if self._file.closed:
+				return  # Post-hooks that outlive an aborted experiment
+			self._file.write(line + "\n")
+			self._file.flush()
+			os.fsync(self._file.fileno())
+
+	def run_key(self, log_path_permutation: str) -> str:
+		return os.path.relpath(log_path_permutation, self.log_path_date)
+
+	def is_completed(self, log_path_permutation: str) -> bool:
+		entry = self._runs.get(self.run_key(log_path_permutation))
+		return entry is not None and entry["status"] in [RunStatus.COMPLETED.value, RunStatus.CACHED.value]
+
+	def run_entry(self, log_path_permutation: str) -> Dict | None:
+		"""
+		Latest manifest entry of a run, None when the run was never recorded
+		"""
+		with self._lock:
+			return self._runs.get(self.run_key(log_path_permutation))
+
+	def record_run(self, client: str, shaper: str, server: str, iteration: int, paths: ExperimentPaths, status: RunStatus, source: str | None = None) -> None:
+		key = self.run_key(paths.log_path_permutation)
+		entry = {
+			"event": "run",
+			"run": key,
+			"client": client,
+			"shaper": shaper,
+			"server": server,
+			"iteration": iteration,
+			"status": status.value,
+			"paths": dataclasses.asdict(paths),
+		}
+		if source is not None:
+			entry["source"] = source
+		self._append(entry)
+		with self._lock:
+			self._runs[key] = entry
+
+	def record_post_hook(self, paths: ExperimentPaths, status: RunStatus) -> None:
+		key = self.run_key(paths.log_path_permutation)
+		self._append({"event": "post_hook", "run": key, "status": status.value})
+		with self._lock:
+			self._post_hooks[key] = status.value
+
+	def pending_post_hooks(self) -> List[ExperimentPaths]:
+		"""
+		Paths of completed runs whose post-hook never finished (e.g., the experiment crashed while hooks were queued)
+		"""
+		with self._lock:
+			return [ExperimentPaths(**entry["paths"]) for key, entry in self._runs.items() if entry["status"] == RunStatus.COMPLETED.value and key not in self._post_hooks]
+
+	def close(self) -> None:
+		with self._lock:
+			if not self._file.closed:
+				self._file.close()
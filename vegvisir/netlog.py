@@ -0,0 +1,253 @@
+from dataclasses import dataclass
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Set
+
+from vegvisir.environments.samplefile import open_sample_file, read_sample_file
+from vegvisir.jsonstream import WHITESPACE, JSONStreamReader
+
+INDEXED_FORMAT = "vegvisir-netlog"
+INDEX_FORMAT = "vegvisir-netlog-index"
+INDEXED_EXTENSION = ".events"
+INDEX_EXTENSION = ".events.idx"
+
+# Index rows point into the event file, events of one source or type are found without reading the others
+INDEX_FIELDS = [
+	"offset",  # Byte offset of the event line
+	"time_ms",
+	"source_id",
+	"type",  # Event type id, see the event_types table of the event file header
+	"phase",
+]
+
+QUIC_EVENT_TYPES = {
+	"QUIC_SESSION",
+	"QUIC_SESSION_CLOSED",
+	"QUIC_SESSION_HANDSHAKE_CONFIRMED",
+	"QUIC_SESSION_PACKET_SENT",
+	"QUIC_SESSION_PACKET_RECEIVED",
+}
+REQUEST_EVENT_TYPES = {
+	"REQUEST_ALIVE",
+	"URL_REQUEST_START_JOB",
+	"HTTP_TRANSACTION_SEND_REQUEST",
+	"HTTP_TRANSACTION_READ_HEADERS",
+}
+
+_CONSTANTS = re.compile(r'"constants"\s*:')
+_EVENTS_ARRAY = re.compile(r'"events"\s*:\s*\[')
+
+
+@dataclass
+class NetLogEvent:
+	time: int  # Milliseconds since the epoch
+	type: str
+	phase: str  # PHASE_BEGIN, PHASE_END or PHASE_NONE
+	source_id: int
+	source_type: str
+	params: Dict | None = None
+
+
+class NetLogConstants:
+	"""
+	Lookup tables of a net-log, Chrome writes events with numeric ids that only the constants of the same file can resolve
+	"""
+
+	def __init__(self, constants: Dict) -> None:
+		self.event_types: Dict[int, str] = {value: name for name, value in constants.get("logEventTypes", {}).items()}
+		self.source_types: Dict[int, str] = {value: name for name, value in constants.get("logSourceType", {}).items()}
+		self.phases: Dict[int, str] = {value: name for name, value in constants.get("logEventPhase", {}).items()}
+		# Event times are ticks in milliseconds, the offset converts them to the epoch
+		self.time_tick_offset = int(constants.get("timeTickOffset", 0))
+
+	def event_type_ids(self, names: Set[str]) -> Set[int]:
+		return {value for value, name in self.event_types.items() if name in names}
+
+
+class NetLogReader(JSONStreamReader):
+	"""
+	Streams the events of a Chrome net-log (--log-net-log), in memory bounded by the largest single event
+	Chrome writes the constants before the events and leaves the file without its closing brackets when it gets killed, both are expected
+	"""
+
+	def __init__(self, path: str, **kwargs) -> None:
+		super().__init__(path, **kwargs)
+		self.constants: NetLogConstants | None = None
+
+	def read_constants(self) -> NetLogConstants:
+		if self.constants is None:
+			if not self.find(_CONSTANTS):
+				raise ValueError(f"Net-log [{self.path}] contains no constants")
+			self.skip(WHITESPACE)
+			self.constants = NetLogConstants(self.decode())
+		return self.constants
+
+	def raw_events(self, types: Set[str] | None = None) -> Iterator[Dict]:
+		"""
+		Events as Chrome wrote them, optionally only those with a type in types
+		"""
+		self.read_constants()
+		type_ids = self.constants.event_type_ids(types) if types is not None else None
+		if not self.find(_EVENTS_ARRAY):
+			return
+		for event in self.array_items():
+			if type_ids is None or event.get("type") in type_ids:
+				yield event
+
+	def events(self, types: Set[str] | None = None) -> Iterator[NetLogEvent]:
+		"""
+		Events with their ids resolved through the constants of the file, optionally only those with a type in types
+		"""
+		for event in self.raw_events(types):
+			yield self.resolve(event)
+
+	def resolve(self, event: Dict) -> NetLogEvent:
+		source = event.get("source", {})
+		return NetLogEvent(
+			time=int(event.get("time", 0)) + self.constants.time_tick_offset,
+			type=self.constants.event_types.get(event.get("type"), str(event.get("type"))),
+			phase=self.constants.phases.get(event.get("phase"), str(event.get("phase"))),
+			source_id=source.get("id", -1),
+			source_type=self.constants.source_types.get(source.get("type"), str(source.get("type"))),
+			params=event.get("params"),
+		)
+
+
+def extract_timings(path: str) -> Dict:
+	"""
+	QUIC session and request timings of a net-log, times in milliseconds since the epoch
+	Only events of QUIC_EVENT_TYPES and REQUEST_EVENT_TYPES are resolved, events Chrome did not log (e.g., on older versions) stay None
+	"""
+	sessions: Dict[int, Dict] = {}
+	requests: Dict[int, Dict] = {}
+	with NetLogReader(path) as reader:
+		for event in reader.events(QUIC_EVENT_TYPES | REQUEST_EVENT_TYPES):
+			params = event.params or {}
+			if event.type in QUIC_EVENT_TYPES:
+				session = sessions.setdefault(event.source_id, {"host": None, "start": None, "handshake_confirmed": None, "closed": None, "end": None, "error": None, "packets_sent": 0, "packets_received": 0})
+				if event.type == "QUIC_SESSION":
+					if event.phase == "PHASE_BEGIN":
+						session["start"] = event.time
+						session["host"] = params.get("host")
+					elif event.phase == "PHASE_END":
+						session["end"] = event.time
+				elif event.type == "QUIC_SESSION_HANDSHAKE_CONFIRMED" and session["handshake_confirmed"] is None:
+					session["handshake_confirmed"] = event.time
+				elif event.type == "QUIC_SESSION_CLOSED":
+					session["closed"] = event.time
+					session["error"] = params.get("quic_error")
+				elif event.type == "QUIC_SESSION_PACKET_SENT":
+					session["packets_sent"] += 1
+				else:
+					session["packets_received"] += 1
+			else:
+				request = requests.setdefault(event.source_id, {"url": None, "method": None, "start": None, "request_sent": None, "headers_received": None, "end": None})
+				if event.type == "REQUEST_ALIVE":
+					request["start" if event.phase == "PHASE_BEGIN" else "end"] = event.time
+				elif event.type == "URL_REQUEST_START_JOB" and event.phase == "PHASE_BEGIN" and request["url"] is None:
+					request["url"] = params.get("url")
+					request["method"] = params.get("method")
+				elif event.type == "HTTP_TRANSACTION_SEND_REQUEST" and event.phase == "PHASE_BEGIN" and request["request_sent"] is None:
+					request["request_sent"] = event.time
+				elif event.type == "HTTP_TRANSACTION_READ_HEADERS" and event.phase == "PHASE_END" and request["headers_received"] is None:
+					request["headers_received"] = event.time
+		truncated = reader.truncated
+	return {
+		"truncated": truncated,
+		"quic_sessions": [{"source_id": source_id, **session} for source_id, session in sessions.items()],
+		# Sources of REQUEST_ALIVE include sockets and streams, only those that requested a url are requests
+		"requests": [{"source_id": source_id, **request} for source_id, request in requests.items() if request["url"] is not None],
+	}
+
+
+def _index_path(events_path: str) -> str:
+	if events_path.endswith(INDEXED_EXTENSION):
+		return events_path[:-len(INDEXED_EXTENSION)] + INDEX_EXTENSION
+	return events_path + ".idx"
+
+
+def convert_to_indexed(path: str, output: str | None = None) -> str:
+	"""
+	Convert a net-log to the compact indexed format, returns the path of the event file
+	The event file holds the resolved constants in its header line, followed by one line per event: [time_ms, type, phase, source_id, source_type, params]
+	The index next to it (see INDEX_FIELDS) allows IndexedNetLog to read single events without parsing the rest
+	"""
+	output = output or os.path.splitext(path)[0] + INDEXED_EXTENSION
+	index_path = _index_path(output)
+	with NetLogReader(path) as reader:
+		constants = reader.read_constants()
+		with open(output, "wb") as events:
+			events.write((json.dumps({
+				"format": INDEXED_FORMAT,
+				"version": 1,
+				"source": os.path.abspath(path),
+				"event_types": constants.event_types,
+				"source_types": constants.source_types,
+				"phases": constants.phases,
+				"time_tick_offset": constants.time_tick_offset,
+			}) + "\n").encode())
+			index = open_sample_file(index_path, INDEX_FORMAT, INDEX_FIELDS, 65536, events=os.path.basename(output))
+			try:
+				for raw_event in reader.raw_events():
+					source = raw_event.get("source", {})
+					time = int(raw_event.get("time", 0)) + constants.time_tick_offset
+					index.append([events.tell(), time, source.get("id", -1), raw_event.get("type", -1), raw_event.get("phase", -1)])
+					events.write((json.dumps([time, raw_event.get("type"), raw_event.get("phase"), source.get("id"), source.get("type"), raw_event.get("params")], separators=(",", ":")) + "\n").encode())
+			finally:
+				index.close()
+	return output
+
+
+class IndexedNetLog:
+	"""
+	Random access to a net-log converted by convert_to_indexed
+	"""
+
+	def __init__(self, path: str) -> None:
+		self.path = path
+		self._file = open(path, "rb")
+		header = json.loads(self._file.readline())
+		if header.get("format") != INDEXED_FORMAT:
+			self._file.close()
+			raise ValueError(f"[{path}] is not an indexed net-log")
+		self.event_types: Dict[int, str] = {int(value): name for value, name in header["event_types"].items()}
+		self.source_types: Dict[int, str] = {int(value): name for value, name in header["source_types"].items()}
+		self.phases: Dict[int, str] = {int(value): name for value, name in header["phases"].items()}
+		_, self.index = read_sample_file(_index_path(path))
+
+	def __enter__(self) -> "IndexedNetLog":
+		return self
+
+	def __exit__(self, *_) -> None:
+		self.close()
+
+	def __len__(self) -> int:
+		return len(self.index["offset"])
+
+	def event(self, position: int) -> NetLogEvent:
+		self._file.seek(self.index["offset"][position])
+		time, event_type, phase, source_id, source_type, params = json.loads(self._file.readline())
+		return NetLogEvent(
+			time=time,
+			type=self.event_types.get(event_type, str(event_type)),
+			phase=self.phases.get(phase, str(phase)),
+			source_id=source_id,
+			source_type=self.source_types.get(source_type, str(source_type)),
+			params=params,
+		)
+
+	def positions(self, source_id: int | None = None, types: Set[str] | None = None) -> List[int]:
+		"""
+		Positions of the events of a source and/or with a type in types, found through the index alone
+		"""
+		type_ids = {value for value, name in self.event_types.items() if name in types} if types is not None else None
+		source_ids, event_types = self.index["source_id"], self.index["type"]
+		return [position for position in range(len(self)) if (source_id is None or source_ids[position] == source_id) and (type_ids is None or event_types[position] in type_ids)]
+
+	def events(self, source_id: int | None = None, types: Set[str] | None = None) -> Iterator[NetLogEvent]:
+		for position in self.positions(source_id, types):
+			yield self.event(position)
+
+	def close(self) -> None:
+		self._file.close()
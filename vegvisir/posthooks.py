@@ -0,0 +1,120 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+import multiprocessing
+import os
+import threading
+import time
+from typing import Callable, List, Set, Tuple
+
+from vegvisir import tracing
+from vegvisir.data import ExperimentPaths
+from vegvisir.environments.base_environment import BaseEnvironment
+
+# Post-hooks that can be queued or running per worker before runs have to wait
+POST_HOOK_BACKLOG_PER_WORKER = 4
+
+
+class PostHookExecutorType(Enum):
+	THREAD = "thread"
+	PROCESS = "process"
+
+
+# Every pool process runs the post-hooks of its own environment instance, created once when the process starts
+_worker_environment: BaseEnvironment | None = None
+
+
+def _initialize_worker(environment_class: type) -> None:
+	global _worker_environment
+	_worker_environment = environment_class()
+
+
+def _worker_post_hook(experiment_paths: ExperimentPaths) -> None:
+	_worker_environment.post_run_hook(experiment_paths)
+
+
+def _timed_post_hook(hook: Callable[[ExperimentPaths], None], analyses: List[Callable[[ExperimentPaths], None]], experiment_paths: ExperimentPaths) -> Tuple[int, int, int, str]:
+	"""
+	Run a post-hook followed by the built-in analyses, returns their start and duration in trace units and the worker they ran on
+	Pool processes have no tracer of their own, their timings are recorded by the experiment
+	"""
+	start = tracing.now()
+	perf_start = time.perf_counter_ns()
+	hook(experiment_paths)
+	for analysis in analyses:
+		analysis(experiment_paths)
+	duration = (time.perf_counter_ns() - perf_start) // 1000
+	if multiprocessing.parent_process() is not None:
+		return start, duration, os.getpid(), f"post_hook_worker{os.getpid()}"
+	thread = threading.current_thread()
+	return start, duration, thread.ident, thread.name
+
+
+class PostHookExecutor:
+	"""
+	Runs environment post-hooks on a pool of worker threads or processes, every submitted hook returns a future
+	At most backlog hooks are queued or running at once, submitting another one blocks until a hook completes
+	Process workers sidestep the GIL for CPU bound hooks (e.g., qlog analysis), each worker creates its own instance of the environment class
+	Analyses run after the post-hook of the environment, they have to be module level functions so process workers can unpickle them
+	"""
+
+	def __init__(self, workers: int, executor_type: PostHookExecutorType, environment_class: type, backlog: int, analyses: List[Callable[[ExperimentPaths], None]] = []) -> None:
+		self.executor_type = executor_type
+		self.analyses = list(analyses)
+		self._executor: Executor
+		if executor_type == PostHookExecutorType.PROCESS:
+			# Spawned instead of forked, the experiment runs plenty of threads whose locks a fork could copy while held
+			self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_initialize_worker, initargs=(environment_class,))
+		else:
+			self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="post_hook_processor")
+		self._backlog = threading.BoundedSemaphore(backlog)
+		self._pending: Set[Future] = set()
+		self._lock = threading.Lock()
+		self._idle = threading.Condition(self._lock)
+
+	def submit(self, environment: BaseEnvironment, experiment_paths: ExperimentPaths, on_done: Callable[[Future], None]) -> Future:
+		"""
+		Queue the post-hook of a run, blocks while the backlog is full
+		on_done receives the future once the hook finished, its result holds the timings of _timed_post_hook
+		"""
+		self._backlog.acquire()
+		hook = _worker_post_hook if self.executor_type == PostHookExecutorType.PROCESS else environment.post_run_hook
+		try:
+			future = self._executor.submit(_timed_post_hook, hook, self.analyses, experiment_paths)
+		except BaseException:
+			self._backlog.release()
+			raise
+		with self._lock:
+			self._pending.add(future)
+		future.add_done_callback(lambda done: self._complete(done, on_done))
+		return future
+
+	def _complete(self, future: Future, on_done: Callable[[Future], None]) -> None:
+		try:
+			if not future.cancelled():
+				on_done(future)
+		finally:
+			with self._lock:
+				self._pending.discard(future)
+				self._idle.notify_all()
+			self._backlog.release()
+
+	@property
+	def pending(self) -> int:
+		with self._lock:
+			return len(self._pending)
+
+	def wait(self, timeout: float | None = None) -> int:
+		"""
+		Wait until all submitted hooks completed or the timeout expired, returns the number of hooks still queued or running
+		A hook counts as completed once its on_done callback returned
+		"""
+		with self._idle:
+			self._idle.wait_for(lambda: len(self._pending) == 0, timeout)
+			return len(self._pending)
+
+	def shutdown(self, cancel_pending: bool = False) -> None:
+		"""
+		Stop the workers, cancelled hooks never run and their callbacks are not invoked
+		Without cancel_pending all queued hooks complete first
+		"""
+		self._executor.shutdown(wait=not cancel_pending, cancel_futures=cancel_pending)
@@ -0,0 +1,317 @@
+import argparse
+import ipaddress
+import json
+import logging
+import os
+import re
+import select
+import shlex
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from vegvisir import tracing
+from vegvisir.exceptions import VegvisirException
+from vegvisir.hostnetwork import reconcile_host_client_network
+from vegvisir.logrotate import rotate_logs
+
+SOCKET_FILE = "helper.sock"
+READY_MESSAGE = "ready"
+START_TIMEOUT = 30  # Seconds, includes the sudo authentication
+OPERATION_TIMEOUT = 600
+
+_HOSTNAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9.-]{0,252}$")
+
+PrivilegedResult = Tuple[int, str, str]  # Return code, stdout and stderr, like HostInterface.spawn_blocking_subprocess
+
+
+class PrivilegedOperationContext:
+	"""
+	What operations may touch: the user that receives ownership of output and the directory all paths have to lie in
+	"""
+
+	def __init__(self, uid: int, gid: int, root: str, directory: str) -> None:
+		self.uid = uid
+		self.gid = gid
+		self.root = os.path.realpath(root)
+		self.directory = directory  # Working directory of the experiment, commands run in it
+
+	def path(self, path) -> str:
+		if type(path) is not str or not os.path.isabs(path):
+			raise ValueError(f"[{path}] is not an absolute path")
+		resolved = os.path.realpath(path)
+		if os.path.commonpath([resolved, self.root]) != self.root or resolved == self.root:
+			raise ValueError(f"[{path}] is not inside [{self.root}]")
+		return resolved
+
+
+def _subnet(value) -> str:
+	return str(ipaddress.ip_network(value))
+
+
+def _address(value) -> str:
+	return str(ipaddress.ip_address(value))
+
+
+def _hostname(value) -> str:
+	if type(value) is not str or _HOSTNAME.match(value) is None:
+		raise ValueError(f"[{value}] is not a hostname")
+	return value
+
+
+def _rotate_logs_arguments(arguments: Dict, context: PrivilegedOperationContext) -> Tuple[str, str]:
+	return context.path(arguments.get("source")), context.path(arguments.get("destination"))
+
+
+def _rotate_logs_command(arguments: Dict, context: PrivilegedOperationContext) -> List[List[str]]:
+	source, destination = _rotate_logs_arguments(arguments, context)
+	return [[sys.executable, "-m", "vegvisir.logrotate", "--source", source, "--destination", destination]]
+
+
+def _rotate_logs(arguments: Dict, context: PrivilegedOperationContext) -> PrivilegedResult:
+	try:
+		return 0, json.dumps(rotate_logs(*_rotate_logs_arguments(arguments, context))), ""
+	except OSError as e:
+		return 1, "", f"Rotating logs failed | {e}"
+
+
+def _host_client_network_arguments(arguments: Dict) -> Tuple[str, str, str]:
+	return _subnet(arguments.get("rightnet")), _address(arguments.get("via")), _subnet(arguments.get("leftnet"))
+
+
+def _host_client_network_command(arguments: Dict, _: PrivilegedOperationContext) -> List[List[str]]:
+	rightnet, via, leftnet = _host_client_network_arguments(arguments)
+	return [[sys.executable, "-m", "vegvisir.hostnetwork", "--rightnet", rightnet, "--via", via, "--leftnet", leftnet]]
+
+
+def _host_client_network(arguments: Dict, _: PrivilegedOperationContext) -> PrivilegedResult:
+	try:
+		return 0, json.dumps(reconcile_host_client_network(*_host_client_network_arguments(arguments))), ""
+	except OSError as e:
+		return 1, "", f"Host client network setup failed | {e}"
+
+
+# The only operations the helper performs, every one builds its commands from validated arguments, nothing is passed to a shell
+OPERATIONS: Dict[str, Callable[[Dict, PrivilegedOperationContext], List[List[str]]]] = {
+	"enable_ipv6": lambda arguments, context: [["modprobe", "ip6table_filter"]],
+	"host_client_network": _host_client_network_command,
+	"hosts_add": lambda arguments, context: [["hostman", "add", _address(arguments.get("address")), _hostname(arguments.get("name"))]],
+	"hosts_remove": lambda arguments, context: [["hostman", "remove", f"--names={_hostname(arguments.get('name'))}"]],
+	"chown_output": lambda arguments, context: [["chown", "-R", f"{context.uid}:{context.gid}", context.path(arguments.get("path"))]],
+	"remove_tree": lambda arguments, context: [["rm", "-rf", context.path(arguments.get("path"))]],
+	"rotate_logs": _rotate_logs_command,
+}
+
+# Operations the helper performs itself instead of running their commands, these only run as a command when falling back to sudo
+IN_PROCESS_OPERATIONS: Dict[str, Callable[[Dict, PrivilegedOperationContext], PrivilegedResult]] = {
+	"host_client_network": _host_client_network,
+	"rotate_logs": _rotate_logs,
+}
+
+
+def operation_commands(operation: str, arguments: Dict, context: PrivilegedOperationContext) -> List[List[str]]:
+	"""
+	Commands of a whitelisted operation, raises ValueError for unknown operations and arguments that do not validate
+	"""
+	if operation not in OPERATIONS:
+		raise ValueError(f"Unknown operation [{operation}]")
+	if type(arguments) is not dict:
+		raise ValueError(f"Arguments of [{operation}] must be an object")
+	return OPERATIONS[operation](arguments, context)
+
+
+def _run_operation(operation: str, arguments: Dict, context: PrivilegedOperationContext) -> PrivilegedResult:
+	try:
+		commands = operation_commands(operation, arguments, context)
+	except ValueError as e:
+		return -1, "", f"Operation [{operation}] rejected | {e}"
+	if operation in IN_PROCESS_OPERATIONS:
+		return IN_PROCESS_OPERATIONS[operation](arguments, context)
+	out, err = [], []
+	for command in commands:
+		try:
+			proc = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, timeout=OPERATION_TIMEOUT, cwd=context.directory)
+		except (OSError, subprocess.TimeoutExpired) as e:
+			return -1, "\n".join(out), "\n".join(err + [str(e)])
+		out.append(proc.stdout.decode("utf-8", errors="replace").strip())
+		err.append(proc.stderr.decode("utf-8", errors="replace").strip())
+		if proc.returncode != 0:
+			return proc.returncode, "\n".join(filter(None, out)), "\n".join(filter(None, err))
+	return 0, "\n".join(filter(None, out)), "\n".join(filter(None, err))
+
+
+def _serve_connection(connection: socket.socket, context: PrivilegedOperationContext) -> None:
+	with connection, connection.makefile("rwb") as stream:
+		for line in stream:
+			try:
+				request = json.loads(line)
+				operations = request["operations"]
+				stop_on_error = request.get("stop_on_error", True) is True
+			except (ValueError, KeyError, TypeError):
+				return  # Not a client of ours
+			results = []
+			for operation in operations:
+				if type(operation) is not list or len(operation) != 2:
+					results.append((-1, "", "Malformed operation"))
+				else:
+					results.append(_run_operation(operation[0], operation[1], context))
+				if stop_on_error and results[-1][0] != 0:
+					break
+			stream.write((json.dumps({"results": results}) + "\n").encode())
+			stream.flush()
+
+
+def serve(socket_path: str, context: PrivilegedOperationContext) -> None:
+	"""
+	Helper side, runs as root until its stdin is closed, i.e., when the experiment that started it exits in any way
+	Only processes of the user that started the helper (and root) are served, checked through the peer credentials of every connection
+	"""
+	server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	umask = os.umask(0o177)
+	try:
+		server.bind(socket_path)
+	finally:
+		os.umask(umask)
+	os.chown(socket_path, context.uid, context.gid)
+	server.listen(16)
+
+	def wait_for_parent():
+		# sudo hands the rest of stdin over to the helper, including the newline behind the password
+		while len(sys.stdin.buffer.read1(4096)) > 0:
+			pass
+		try:
+			os.unlink(socket_path)
+		finally:
+			os._exit(0)
+	threading.Thread(target=wait_for_parent, daemon=True).start()
+
+	sys.stdout.write(READY_MESSAGE + "\n")
+	sys.stdout.flush()
+	while True:
+		connection, _ = server.accept()
+		_, peer_uid, _ = struct.unpack("3i", connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))
+		if peer_uid not in [context.uid, 0]:
+			connection.close()
+			continue
+		threading.Thread(target=_serve_connection, args=(connection, context), daemon=True).start()
+
+
+class PrivilegedHelper:
+	"""
+	Experiment side of the helper, authenticates through sudo once and sends batches of whitelisted operations over a unix socket
+	Every thread (e.g., parallel slots) gets its own connection, operations of different threads run concurrently
+	"""
+
+	def __init__(self, host_interface, root: str) -> None:
+		self.host_interface = host_interface
+		self.root = root
+		self._directory: str | None = None
+		self._process: subprocess.Popen | None = None
+		self._local = threading.local()
+		self._connections: List[socket.socket] = []
+		self._lock = threading.Lock()
+		self.logger = logging.getLogger("root.PrivilegedHelper")
+
+	@property
+	def socket_path(self) -> str:
+		return os.path.join(self._directory, SOCKET_FILE)
+
+	def start(self) -> None:
+		"""
+		Raises VegvisirException when the helper did not come up, e.g., a wrong password or a user without sudo rights
+		"""
+		self._directory = tempfile.mkdtemp(prefix="vegvisir_privileged_")  # Private (0700) directory, only we can reach the socket
+		command = shlex.join([
+			sys.executable, "-m", "vegvisir.privileged",
+			"--socket", self.socket_path,
+			"--uid", str(os.getuid()),
+			"--gid", str(os.getgid()),
+			"--root", os.path.abspath(self.root),
+			"--directory", os.getcwd(),
+		])
+		with tracing.span("privileged_helper_start"):
+			self._process = self.host_interface.spawn_parallel_subprocess(command, True, False)
+			try:
+				# The password is written without a newline, sudo only continues once the line is complete
+				self._process.stdin.write(b"\n")
+				self._process.stdin.flush()
+			except BrokenPipeError:
+				pass
+			ready, _, _ = select.select([self._process.stdout], [], [], START_TIMEOUT)
+			line = self._process.stdout.readline().decode().strip() if len(ready) > 0 else ""
+		if line != READY_MESSAGE:
+			process = self._process
+			self.close()
+			err = process.stderr.read().decode("utf-8", errors="replace").strip() if process.returncode is not None else ""
+			raise VegvisirException(f"Privileged helper did not start{' in time' if len(ready) == 0 else ''} | {' '.join(filter(None, [line, err]))}")
+		self.logger.debug(f"Privileged helper listening on [{self.socket_path}]")
+
+	def _connection(self) -> Tuple[socket.socket, object]:
+		connection = getattr(self._local, "connection", None)
+		if connection is None:
+			sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			sock.connect(self.socket_path)
+			connection = (sock, sock.makefile("rwb"))
+			self._local.connection = connection
+			with self._lock:
+				self._connections.append(sock)
+		return connection
+
+	def execute(self, operations: List[Tuple[str, Dict]], stop_on_error: bool = True) -> List[PrivilegedResult]:
+		"""
+		Run a batch of operations in order in a single round trip, with stop_on_error the batch ends at the first failing operation
+		Raises OSError when the helper can not be reached (anymore)
+		"""
+		with tracing.span("privileged_operations", "subprocess", operations=[operation for operation, _ in operations]):
+			sock, stream = self._connection()
+			try:
+				stream.write((json.dumps({"operations": [[operation, arguments] for operation, arguments in operations], "stop_on_error": stop_on_error}) + "\n").encode())
+				stream.flush()
+				response = stream.readline()
+				if len(response) == 0:
+					raise ConnectionResetError("Privileged helper closed the connection")
+			except OSError:
+				self._local.connection = None
+				sock.close()
+				raise
+		return [tuple(result) for result in json.loads(response)["results"]]
+
+	def close(self) -> None:
+		with self._lock:
+			for sock in self._connections:
+				sock.close()
+			self._connections = []
+		if self._process is not None:
+			# Closing stdin ends the helper
+			try:
+				self._process.stdin.close()
+			except BrokenPipeError:
+				pass
+			try:
+				self._process.wait(5)
+			except subprocess.TimeoutExpired:
+				self.logger.warning("Privileged helper did not exit, it stops once its stdin is closed")
+			self._process = None
+		if self._directory is not None:
+			shutil.rmtree(self._directory, ignore_errors=True)
+			self._directory = None
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Vegvisir privileged helper, started by experiments with the privileged_helper setting")
+	parser.add_argument("--socket", required=True)
+	parser.add_argument("--uid", type=int, required=True)
+	parser.add_argument("--gid", type=int, required=True)
+	parser.add_argument("--root", required=True)
+	parser.add_argument("--directory", required=True)
+	arguments = parser.parse_args()
+	serve(arguments.socket, PrivilegedOperationContext(arguments.uid, arguments.gid, arguments.root, arguments.directory))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,162 @@
+from array import array
+import json
+import os
+import re
+import statistics
+from typing import Dict, Iterator, List, Set, Tuple
+
+from vegvisir.data import ExperimentPaths
+from vegvisir.jsonstream import WHITESPACE, JSONStreamReader
+
+SUMMARY_FILE = "qlog_summary.json"
+QLOG_EXTENSIONS = (".qlog", ".sqlog")
+SUMMARY_PERCENTILES = [5, 25, 50, 75, 90, 95, 99]
+
+_EVENTS_ARRAY = re.compile(r'"events"\s*:\s*\[')
+_SEQUENCE_FORMAT = re.compile(r'"qlog_format"\s*:\s*"(JSON-SEQ|NDJSON)"')
+
+
+class QlogReader(JSONStreamReader):
+	"""
+	Streams the events of a qlog file, the file is read in chunks and never parsed as a whole
+	Handles the JSON format (events arrays of every trace) and the sequential formats (JSON-SEQ / NDJSON, one record per event)
+	A file that ends halfway through an event (e.g., an endpoint that got killed) yields the events before it and sets truncated
+	"""
+
+	def events(self) -> Iterator[Dict | List]:
+		head = self.head(4096)
+		if head.lstrip(WHITESPACE).startswith("\x1e") or _SEQUENCE_FORMAT.search(head) is not None:
+			for record in self.records():
+				if isinstance(record, dict) and "qlog_version" not in record and "qlog_format" not in record:
+					yield record
+		else:
+			while self.find(_EVENTS_ARRAY):
+				yield from self.array_items()
+				if self.truncated:
+					return
+
+
+def _normalize_event(event: Dict | List) -> Tuple[float | None, str, Dict]:
+	"""
+	Time (ms), name without category and data of an event
+	Draft-01 events are lists in the default event_fields order (relative_time, category, event, data)
+	"""
+	if isinstance(event, list):
+		if len(event) < 4:
+			return None, "", {}
+		time, name, data = event[0], event[2], event[3]
+	else:
+		time = event.get("time", event.get("relative_time"))
+		name = event.get("name") or event.get("event") or ""
+		data = event.get("data")
+	try:
+		time = float(time) if time is not None else None
+	except (TypeError, ValueError):
+		time = None
+	return time, str(name).rsplit(":", 1)[-1], data if isinstance(data, dict) else {}
+
+
+def describe(values: array) -> Dict:
+	if len(values) == 0:
+		return {"count": 0}
+	summary = {"count": len(values), "min": min(values), "mean": statistics.fmean(values), "max": max(values)}
+	if len(values) > 1:
+		cut_points = statistics.quantiles(values, n=100, method="inclusive")
+		summary.update({f"p{point}": cut_points[point - 1] for point in SUMMARY_PERCENTILES})
+	else:
+		summary.update({f"p{point}": values[0] for point in SUMMARY_PERCENTILES})
+	return summary
+
+
+def analyze_qlog(path: str) -> Dict:
+	"""
+	RTT, congestion window, bytes in flight, packet loss and stream completion times of a single qlog file
+	Times are in milliseconds relative to the start of the trace, window and flight sizes in bytes
+	"""
+	latest_rtt, smoothed_rtt, congestion_window, bytes_in_flight = array("d"), array("d"), array("d"), array("d")
+	min_rtt: float | None = None
+	packets_sent, packets_received, packets_lost = 0, 0, 0
+	stream_first: Dict[Tuple[str, int], float] = {}  # (packet direction, stream id) -> time of its first frame
+	stream_finished: Set[Tuple[str, int]] = set()
+	stream_completion = array("d")
+	last_completion: float | None = None
+	first_time, last_time, event_count = None, None, 0
+
+	with QlogReader(path) as reader:
+		for event in reader.events():
+			time, name, data = _normalize_event(event)
+			event_count += 1
+			if time is not None:
+				first_time = time if first_time is None else min(first_time, time)
+				last_time = time if last_time is None else max(last_time, time)
+
+			if name == "metrics_updated":
+				for key, values in [("latest_rtt", latest_rtt), ("smoothed_rtt", smoothed_rtt), ("congestion_window", congestion_window), ("bytes_in_flight", bytes_in_flight)]:
+					if isinstance(data.get(key), (int, float)):
+						values.append(data[key])
+				if isinstance(data.get("min_rtt"), (int, float)):
+					min_rtt = data["min_rtt"]
+			elif name == "packet_lost":
+				packets_lost += 1
+			elif name in ["packet_sent", "packet_received"]:
+				if name == "packet_sent":
+					packets_sent += 1
+				else:
+					packets_received += 1
+				if time is None:
+					continue
+				for frame in data.get("frames") or []:
+					if not isinstance(frame, dict) or frame.get("frame_type") != "stream":
+						continue
+					stream = (name, frame.get("stream_id"))
+					first = stream_first.setdefault(stream, time)
+					if frame.get("fin") is True and stream not in stream_finished:  # Retransmitted FIN frames do not count twice
+						stream_finished.add(stream)
+						stream_completion.append(time - first)
+						last_completion = time if last_completion is None else max(last_completion, time)
+
+	return {
+		"events": event_count,
+		"truncated": reader.truncated,
+		"duration_ms": last_time - first_time if first_time is not None else None,
+		"rtt_ms": {
+			"latest": describe(latest_rtt),
+			"smoothed": describe(smoothed_rtt),
+			"min": min_rtt,
+		},
+		"congestion_window": describe(congestion_window),
+		"bytes_in_flight": describe(bytes_in_flight),
+		"packets": {
+			"sent": packets_sent,
+			"received": packets_received,
+			"lost": packets_lost,
+			"loss_rate": packets_lost / packets_sent if packets_sent > 0 else None,
+		},
+		"streams": {
+			"completed": len(stream_completion),
+			"completion_ms": describe(stream_completion),
+			"last_completion_ms": last_completion,
+		},
+	}
+
+
+def analyze_run(experiment_paths: ExperimentPaths) -> None:
+	"""
+	Post-hook stage, summarizes every qlog the client and server of a run wrote into qlog_summary.json in the permutation log directory
+	Files that can not be analysed are listed with the reason instead
+	"""
+	summary: Dict[str, Dict] = {}
+	for log_path in [experiment_paths.log_path_client, experiment_paths.log_path_server]:
+		if log_path is None or not os.path.isdir(log_path):
+			continue
+		for directory, _, files in os.walk(log_path):
+			for file in sorted(files):
+				if not file.endswith(QLOG_EXTENSIONS):
+					continue
+				path = os.path.join(directory, file)
+				try:
+					summary[os.path.relpath(path, experiment_paths.log_path_permutation)] = analyze_qlog(path)
+				except (OSError, ValueError) as e:
+					summary[os.path.relpath(path, experiment_paths.log_path_permutation)] = {"error": str(e)}
+	with open(os.path.join(experiment_paths.log_path_permutation, SUMMARY_FILE), "w") as fp:
+		json.dump({"files": summary}, fp, indent=4)
@@ -0,0 +1,78 @@
+from datetime import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+	try:
+		os.link(source, destination)
+	except OSError:
+		shutil.copy2(source, destination)  # Different filesystem or hardlinks not permitted
+
+
+class ResultCache:
+	"""
+	Content-addressed index of measured runs, shared by all experiments that log to the same directory
+	A key hashes everything that determines the outcome of a run, its index entry points to the log directory of the run that measured it
+	"""
+
+	def __init__(self, directory: str) -> None:
+		self.directory = directory
+		os.makedirs(directory, exist_ok=True)
+
+	@staticmethod
+	def key(components: Dict) -> str:
+		return hashlib.sha256(json.dumps(components, sort_keys=True, default=str).encode()).hexdigest()
+
+	def _entry_path(self, key: str) -> str:
+		return os.path.join(self.directory, key[:2], key + ".json")
+
+	def lookup(self, key: str) -> str | None:
+		"""
+		Log directory of an earlier run with the same key, None when there is none or its logs were removed since
+		"""
+		try:
+			with open(self._entry_path(key), "r") as fp:
+				entry = json.load(fp)
+		except (OSError, json.JSONDecodeError):
+			return None
+		if not os.path.isdir(entry.get("path", "")):
+			return None
+		return entry["path"]
+
+	def store(self, key: str, log_path_permutation: str, components: Dict) -> None:
+		entry_path = self._entry_path(key)
+		os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+		# Written aside and moved in place, parallel slots and experiments never see a partial entry
+		fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+		with os.fdopen(fd, "w") as fp:
+			json.dump({"path": log_path_permutation, "stored": datetime.now().isoformat(), "components": components}, fp, default=str)
+		os.replace(temporary_path, entry_path)
+
+	@staticmethod
+	def tree_digest(path: str) -> str:
+		"""
+		Hash of the names, sizes and modification times of every file below path, content is not read as the tree can be large
+		"""
+		listing = []
+		for directory, subdirectories, files in os.walk(path, followlinks=True):
+			subdirectories.sort()
+			for file in sorted(files):
+				file_path = os.path.join(directory, file)
+				try:
+					stat = os.stat(file_path)
+				except OSError:
+					continue  # Dangling symlink
+				listing.append([os.path.relpath(file_path, path), stat.st_size, stat.st_mtime_ns])
+		return hashlib.sha256(json.dumps(listing).encode()).hexdigest()
+
+	@staticmethod
+	def link(source: str, destination: str) -> None:
+		"""
+		Hardlink the files of an earlier run into destination, files are shared so neither copy should be modified afterwards
+		"""
+		shutil.copytree(source, destination, symlinks=True, copy_function=_link_or_copy, dirs_exist_ok=True)
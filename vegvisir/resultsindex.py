@@ -0,0 +1,274 @@
+from datetime import datetime
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+from vegvisir.manifest import MANIFEST_FILE
+
+INDEX_FILE = "results.sqlite"
+RUN_METADATA_FILE = "run.json"
+SCHEMA_VERSION = 1
+
+# Summaries written next to the run output, their numeric values become metrics prefixed with the key
+METRIC_FILES = {
+	"qlog": "qlog_summary.json",
+	"throughput": "interface_throughput.json",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+	id INTEGER PRIMARY KEY,
+	path TEXT NOT NULL UNIQUE,
+	label TEXT,
+	started TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+	id INTEGER PRIMARY KEY,
+	experiment_id INTEGER NOT NULL REFERENCES experiments(id) ON DELETE CASCADE,
+	run TEXT NOT NULL,
+	path TEXT NOT NULL,
+	client TEXT,
+	shaper TEXT,
+	scenario TEXT,
+	server TEXT,
+	iteration INTEGER,
+	status TEXT,
+	post_hook TEXT,
+	sensor_outcome TEXT,
+	started TEXT,
+	ended TEXT,
+	duration REAL,
+	client_image TEXT,
+	shaper_image TEXT,
+	server_image TEXT,
+	source TEXT,
+	manifest_timestamp TEXT,
+	UNIQUE (experiment_id, run)
+);
+CREATE TABLE IF NOT EXISTS arguments (
+	run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+	role TEXT NOT NULL,
+	name TEXT NOT NULL,
+	value TEXT,
+	PRIMARY KEY (run_id, role, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS metrics (
+	run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+	name TEXT NOT NULL,
+	value REAL,
+	PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_permutation ON runs (client, shaper, server, started);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE INDEX IF NOT EXISTS arguments_value ON arguments (role, name, value, run_id);
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics (name, run_id, value);
+"""
+
+
+def _flatten(prefix: str, value, metrics: Dict[str, float]) -> None:
+	if isinstance(value, dict):
+		for key, item in value.items():
+			_flatten(f"{prefix}.{key}", item, metrics)
+	elif isinstance(value, (int, float)) and not isinstance(value, bool):
+		metrics[prefix] = value
+
+
+def extract_metrics(log_path_permutation: str) -> Dict[str, float]:
+	"""
+	Numeric values of the summaries in a run directory, e.g., qlog.client.rtt_ms.smoothed.p50 or throughput.networks.leftnet.p50
+	Qlogs are named after their role, the second qlog of a role becomes qlog.client#2
+	"""
+	metrics: Dict[str, float] = {}
+	for prefix, file in METRIC_FILES.items():
+		try:
+			with open(os.path.join(log_path_permutation, file), "r") as fp:
+				summary = json.load(fp)
+		except (OSError, json.JSONDecodeError):
+			continue
+		if prefix == "qlog":
+			roles: Dict[str, int] = {}
+			for path, file_summary in sorted(summary.get("files", {}).items()):
+				role = path.split(os.sep, 1)[0]
+				roles[role] = roles.get(role, 0) + 1
+				_flatten(f"qlog.{role}" if roles[role] == 1 else f"qlog.{role}#{roles[role]}", file_summary, metrics)
+		elif prefix == "throughput":
+			_flatten("throughput.networks", summary.get("networks", {}), metrics)
+			for interface in summary.get("interfaces", []):
+				_flatten(f"throughput.{interface.get('network')}.{interface.get('name')}", {"rx": interface.get("rx"), "tx": interface.get("tx")}, metrics)
+	return metrics
+
+
+def read_run_metadata(log_path_permutation: str) -> Dict:
+	try:
+		with open(os.path.join(log_path_permutation, RUN_METADATA_FILE), "r") as fp:
+			return json.load(fp)
+	except (OSError, json.JSONDecodeError):
+		return {}  # Runs that failed early or were recorded by older versions
+
+
+def run_metrics(log_path_permutation: str, metadata: Dict) -> Dict[str, float]:
+	"""
+	Metrics of a run as they are indexed, the summaries in its directory and its durations (run.duration_s, run.client_duration_s)
+	"""
+	metrics = extract_metrics(log_path_permutation)
+	for key in ["duration", "client_duration"]:
+		if metadata.get(key) is not None:
+			metrics[f"run.{key}_s"] = metadata[key]
+	return metrics
+
+
+class ResultsIndex:
+	"""
+	SQLite index of the runs of all experiments that log to the same directory, their metadata and extracted metrics
+	Runs are added as their post-hooks complete, `vegvisir index` catches up on experiments that ran without it
+	Safe to use from multiple threads, every update is a single transaction
+	"""
+
+	def __init__(self, path: str) -> None:
+		self.path = path
+		self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+		self._lock = threading.Lock()
+		self._closed = False
+		with self._lock:
+			# WAL lets queries run while experiments add runs
+			self._connection.execute("PRAGMA journal_mode=WAL")
+			self._connection.execute("PRAGMA synchronous=NORMAL")
+			self._connection.execute("PRAGMA foreign_keys=ON")
+			self._connection.executescript(_SCHEMA)
+			self._connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+			self._connection.commit()
+		self.logger = logging.getLogger("root.ResultsIndex")
+
+	def _experiment_id(self, log_path_date: str) -> int:
+		log_path_date = os.path.abspath(log_path_date)
+		row = self._connection.execute("SELECT id FROM experiments WHERE path = ?", (log_path_date,)).fetchone()
+		if row is not None:
+			return row[0]
+		started = None
+		try:
+			started = datetime.strptime(os.path.basename(log_path_date.rstrip(os.sep)), "%Y-%m-%dT_%H-%M-%S").isoformat()
+		except ValueError:
+			pass
+		label = os.path.basename(os.path.dirname(log_path_date.rstrip(os.sep)))
+		return self._connection.execute("INSERT INTO experiments (path, label, started) VALUES (?, ?, ?)", (log_path_date, label, started)).lastrowid
+
+	def record_run(self, log_path_date: str, manifest_entry: Dict, post_hook: str | None = None) -> None:
+		"""
+		Add or replace a run, described by its latest manifest entry, together with its run.json metadata and metrics
+		"""
+		log_path_permutation = os.path.join(log_path_date, manifest_entry["run"])
+		metadata = read_run_metadata(log_path_permutation)
+		metrics = run_metrics(log_path_permutation, metadata)
+
+		with self._lock:
+			if self._closed:
+				return  # Post-hooks that outlive an aborted experiment
+			with self._connection:
+				self._record_run(log_path_date, log_path_permutation, manifest_entry, post_hook, metadata, metrics)
+
+	def _record_run(self, log_path_date: str, log_path_permutation: str, manifest_entry: Dict, post_hook: str | None, metadata: Dict, metrics: Dict[str, float]) -> None:
+		images = metadata.get("images", {})
+		experiment_id = self._experiment_id(log_path_date)
+		self._connection.execute("DELETE FROM runs WHERE experiment_id = ? AND run = ?", (experiment_id, manifest_entry["run"]))
+		run_id = self._connection.execute(
+			"INSERT INTO runs (experiment_id, run, path, client, shaper, scenario, server, iteration, status, post_hook, sensor_outcome, started, ended, duration, client_image, shaper_image, server_image, source, manifest_timestamp) "
+			"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+			(
+				experiment_id, manifest_entry["run"], os.path.abspath(log_path_permutation),
+				manifest_entry.get("client"), manifest_entry.get("shaper"), metadata.get("scenario"), manifest_entry.get("server"),
+				manifest_entry.get("iteration"), manifest_entry.get("status"), post_hook, metadata.get("sensor_outcome"),
+				metadata.get("started"), metadata.get("ended"), metadata.get("duration"),
+				images.get("client"), images.get("shaper"), images.get("server"),
+				manifest_entry.get("source"), manifest_entry.get("timestamp"),
+			),
+		).lastrowid
+		self._connection.executemany(
+			"INSERT INTO arguments (run_id, role, name, value) VALUES (?, ?, ?, ?)",
+			[(run_id, role, name, str(value)) for role, parameters in metadata.get("parameters", {}).items() for name, value in parameters.items()],
+		)
+		self._connection.executemany("INSERT INTO metrics (run_id, name, value) VALUES (?, ?, ?)", [(run_id, name, value) for name, value in metrics.items()])
+
+	def _indexed_runs(self, log_path_date: str) -> Dict[str, Tuple[str, str]]:
+		with self._lock:
+			rows = self._connection.execute(
+				"SELECT runs.run, runs.manifest_timestamp, runs.post_hook FROM runs JOIN experiments ON experiments.id = runs.experiment_id WHERE experiments.path = ?",
+				(os.path.abspath(log_path_date),),
+			).fetchall()
+		return {run: (timestamp, post_hook) for run, timestamp, post_hook in rows}
+
+	def index_experiment(self, log_path_date: str, rebuild: bool = False) -> int:
+		"""
+		Index the runs in the manifest of an experiment, returns the number of runs that were added or updated
+		Runs whose manifest entries did not change since they were indexed are skipped, unless rebuilding
+		"""
+		runs: Dict[str, Dict] = {}
+		post_hooks: Dict[str, str] = {}
+		try:
+			with open(os.path.join(log_path_date, MANIFEST_FILE), "r") as fp:
+				for line in fp:
+					try:
+						entry = json.loads(line)
+					except json.JSONDecodeError:
+						continue
+					if entry.get("event") == "run":
+						runs[entry["run"]] = entry
+					elif entry.get("event") == "post_hook":
+						post_hooks[entry["run"]] = entry["status"]
+		except OSError as e:
+			self.logger.warning(f"Could not read manifest of experiment [{log_path_date}] | {e}")
+			return 0
+
+		indexed = {} if rebuild else self._indexed_runs(log_path_date)
+		updated = 0
+		for run, entry in runs.items():
+			if indexed.get(run) == (entry.get("timestamp"), post_hooks.get(run)):
+				continue
+			self.record_run(log_path_date, entry, post_hooks.get(run))
+			updated += 1
+		return updated
+
+	def index_tree(self, log_directory: str, rebuild: bool = False) -> Tuple[int, int]:
+		"""
+		Index every experiment below log_directory, returns the number of experiments found and runs added or updated
+		"""
+		experiments, updated = 0, 0
+		for log_path_date in find_experiments(log_directory):
+			experiments += 1
+			updated += self.index_experiment(log_path_date, rebuild)
+		return experiments, updated
+
+	def query(self, sql: str, parameters: Tuple | Dict = ()) -> List[Tuple]:
+		with self._lock:
+			return self._connection.execute(sql, parameters).fetchall()
+
+	def close(self) -> None:
+		with self._lock:
+			if not self._closed:
+				self._closed = True
+				self._connection.close()
+
+
+def find_experiments(log_directory: str) -> Iterator[str]:
+	"""
+	Experiment log directories (those with a manifest) below log_directory, run directories themselves are not searched
+	"""
+	for directory, subdirectories, files in os.walk(log_directory):
+		if MANIFEST_FILE in files:
+			subdirectories.clear()
+			yield directory
+		else:
+			subdirectories[:] = [subdirectory for subdirectory in subdirectories if not subdirectory.startswith(".")]
+
+
+def write_run_metadata(log_path_permutation: str, metadata: Dict) -> None:
+	"""
+	Describe a run for the index, written aside and moved in place so files shared with cached runs are never modified
+	"""
+	fd, temporary_path = tempfile.mkstemp(dir=log_path_permutation, suffix=".tmp")
+	with os.fdopen(fd, "w") as fp:
+		json.dump(metadata, fp, indent=4, default=str)
+	os.replace(temporary_path, os.path.join(log_path_permutation, RUN_METADATA_FILE))
@@ -1,27 +1,43 @@
+from concurrent.futures import Future
 import dataclasses
 from datetime import datetime
-import getpass
-import grp
 import logging
 import os
 import pathlib
 import queue
-import shlex
 import sys
 import subprocess
 import threading
 import time
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Tuple
 import tempfile
 import re
 import shutil
+import sqlite3
+from vegvisir import backends, qlog, tracing
+from vegvisir.adaptive import IterationStopRule
+from vegvisir.backends.base_backend import BaseContainerBackend, ComposeProject
 from vegvisir.hostinterface import HostInterface
+from vegvisir.hostnetwork import host_client_network_state
+from vegvisir.hoststate import HOST_STATE_DIFF_FILE, HOST_STATE_FILE, HostStateSnapshot, summarize_diff
+from vegvisir.certificates import CertificatePool
+from vegvisir.devtools import DevToolsBrowser, DevToolsRunProcess
 from vegvisir.configuration import Configuration
-from vegvisir.data import VegvisirArguments
+from vegvisir.data import ExperimentPaths, VegvisirArguments
 from vegvisir.environments.base_environment import BaseEnvironment
-from vegvisir.exceptions import VegvisirException, VegvisirRunFailedException
+from vegvisir.environments.sensors import SensorContext
+from vegvisir.exceptions import VegvisirException, VegvisirRunFailedException, VegvisirShaperControlException
+from vegvisir.manifest import ExperimentManifest, RunStatus
+from vegvisir.posthooks import POST_HOOK_BACKLOG_PER_WORKER, PostHookExecutor
+from vegvisir.resultcache import ResultCache
+from vegvisir.resultsindex import ResultsIndex, read_run_metadata, run_metrics, write_run_metadata
+from vegvisir.shapercontrol import reconfigure_shaper
+from vegvisir.slot import RunTeardown, Slot, WarmBrowser, WarmContainers
 
-from .implementation import Parameters, Endpoint
+from .implementation import Parameters, Endpoint, Scenario
+
+# Output of every container is streamed into this file in its log directory
+CONTAINER_LOG_FILE = "container_output.txt"
 
 class LogFileFormatter(logging.Formatter):
 	def format(self, record):
@@ -33,12 +49,25 @@ class Experiment:
 	def __init__(self, sudo_password: str, configuration_object: Configuration):
 		self.configuration = configuration_object
 
-		self.post_hook_processors: List[threading.Thread] = []
-		self.post_hook_processor_request_stop: bool = False
-		self.post_hook_processor_queue: queue.Queue = queue.Queue()  # contains tuples (method pointer, path dataclass)
+		self.post_hook_executor: PostHookExecutor | None = None
+
+		self.slots: List[Slot] = []
+		self.slots_request_stop: bool = False
 
 		# self._sudo_password = sudo_password
 		self.host_interface = HostInterface(sudo_password)
+		self.container_backend: BaseContainerBackend = None
+		self.certificate_pool: CertificatePool | None = None
+		self.experiment_trace_start: int = 0
+		self.manifest: ExperimentManifest | None = None
+		self.result_cache: ResultCache | None = None
+		self.bypass_result_cache: bool = False
+		self.result_cache_candidates: Dict[str, Tuple[str, Dict]] = {}  # Permutation log path -> cache key and components, stored once the post-hook completed
+		self.results_index: ResultsIndex | None = None
+		self.adaptive_stop_rules: Dict[str, IterationStopRule] = {}  # Permutation log path -> stopping rule that awaits the metric of the run
+		self.host_state: HostStateSnapshot | None = None
+		self.image_ids: Dict[str, str | None] = {}
+		self.www_digest: str | None = None  # Listing of the www directory, computed once for the result cache
 		# self._debug = debug
 
 		self.logger = logging.getLogger("root.Experiment")
@@ -114,339 +143,963 @@ class Experiment:
 	# 				if hasattr(x, 'image_name') and x.image_name == tag:
 	# 					x.images.append(Image(img))
 
-	def _post_hook_processor(self):
-		while not self.post_hook_processor_request_stop:
-			try:
-				task, experiment_paths = self.post_hook_processor_queue.get(timeout=5)
-				try:
-					task(experiment_paths)
-				except Exception as e:
-					self.logger.error(f"Post-hook encountered an exception | {e}")
-			except queue.Empty:
-				pass  # We can ignore this one
+	def _queue_post_hook(self, environment: BaseEnvironment, experiment_paths: ExperimentPaths) -> None:
+		"""
+		Hand the post-hook of a run to the executor, blocks while the executor backlog is full
+		"""
+		enqueued_at = tracing.now()
+		self.post_hook_executor.submit(environment, experiment_paths, lambda future: self._post_hook_done(experiment_paths, enqueued_at, future))
 
+	def _post_hook_done(self, experiment_paths: ExperimentPaths, enqueued_at: int, future: Future) -> None:
+		try:
+			start, duration, worker_id, worker_name = future.result()
+		except Exception as e:
+			self.logger.error(f"Post-hook encountered an exception | {e}")
+			self.manifest.record_post_hook(experiment_paths, RunStatus.FAILED)
+			self.result_cache_candidates.pop(experiment_paths.log_path_permutation, None)
+			self.adaptive_stop_rules.pop(experiment_paths.log_path_permutation, None)
+			self._index_run(experiment_paths, RunStatus.FAILED)
+			return
+		worker = (worker_id, worker_name)
+		tracing.record("post_hook_queue_wait", "vegvisir", enqueued_at, max(0, start - enqueued_at), {"permutation": experiment_paths.log_path_permutation}, worker)
+		tracing.record("post_run_hook", "vegvisir", start, duration, {"permutation": experiment_paths.log_path_permutation}, worker)
+		self.manifest.record_post_hook(experiment_paths, RunStatus.COMPLETED)
+		self._store_result_cache_entry(experiment_paths)
+		self._index_run(experiment_paths, RunStatus.COMPLETED)
+		stop_rule = self.adaptive_stop_rules.pop(experiment_paths.log_path_permutation, None)
+		if stop_rule is not None:
+			self._add_adaptive_sample(stop_rule, experiment_paths.log_path_permutation)
+
+	def _index_run(self, experiment_paths: ExperimentPaths, post_hook_status: RunStatus | None = None) -> None:
+		"""
+		Add a run to the results index as soon as its results are final, i.e., its post-hook completed or it was linked from the cache
+		"""
+		if self.results_index is None:
+			return
+		entry = self.manifest.run_entry(experiment_paths.log_path_permutation)
+		if entry is None:
+			return
+		try:
+			with tracing.span("results_index", "vegvisir"):
+				self.results_index.record_run(self.configuration.path_collection.log_path_date, entry, post_hook_status.value if post_hook_status is not None else None)
+		except (sqlite3.Error, OSError) as e:
+			self.logger.warning(f"Could not add [{experiment_paths.log_path_permutation}] to the results index | {e}")
 
 	def _enable_ipv6(self):
 		"""
 		sudo modprobe ip6table_filter
 		"""
-		_, out, err = self.host_interface.spawn_blocking_subprocess("modprobe ip6table_filter", True, False)
+		_, out, err = self.host_interface.run_privileged([("enable_ipv6", {})])[0]
 		if out != "" or err != "":
 			self.logger.debug(f"Enabling ipv6 resulted in non empty output | STDOUT [{out}] | STDERR [{err}]")
 
-	def print_debug_information(self, command: str) -> None:
-		_, out, err = self.host_interface.spawn_blocking_subprocess(command, True, False)
-		self.logger.debug(f"Command [{command}]:\n{out}")
-		if err is not None and len(err) > 0:
-			self.logger.warning(f"Command [{command}] returned stderr output:\n{err}")
-
-	def run(self):
+	def run(self, resume_log_path: str | None = None, force: bool = False):
+		"""
+		Runs every permutation of the experiment, resume_log_path continues an earlier experiment in its own log directory
+		Runs the manifest of that experiment lists as completed are skipped
+		Runs identical to an earlier measured run are linked from the result cache, unless forced to run again
+		"""
 		vegvisir_start_time = datetime.now()
 
 		# Root path for logs needs to be known and exist for metadata copies
-		self.configuration.path_collection.log_path_date = os.path.join(self.configuration.path_collection.log_path_root, "{:%Y-%m-%dT_%H-%M-%S}".format(vegvisir_start_time))
-		pathlib.Path(self.configuration.path_collection.log_path_date).mkdir(parents=True, exist_ok=True)
+		if resume_log_path is not None:
+			if not os.path.isdir(resume_log_path):
+				raise VegvisirException(f"Can not resume experiment, log directory [{resume_log_path}] does not exist")
+			self.configuration.path_collection.log_path_date = os.path.abspath(resume_log_path)
+		else:
+			self.configuration.path_collection.log_path_date = os.path.join(self.configuration.path_collection.log_path_root, "{:%Y-%m-%dT_%H-%M-%S}".format(vegvisir_start_time))
+			pathlib.Path(self.configuration.path_collection.log_path_date).mkdir(parents=True, exist_ok=True)
+
+		# Timings of every phase end up next to the logs
+		tracing.activate(tracing.Tracer(os.path.join(self.configuration.path_collection.log_path_date, tracing.TRACE_SPANS_FILE)))
+		self.experiment_trace_start = tracing.now()
+		self.manifest = ExperimentManifest(self.configuration.path_collection.log_path_date)
+		if self.configuration.result_cache_enabled:
+			self.result_cache = ResultCache(self.configuration.result_cache_path)
+			self.bypass_result_cache = force
+		if self.configuration.results_index_enabled:
+			try:
+				self.results_index = ResultsIndex(self.configuration.results_index_path)
+			except sqlite3.Error as e:
+				self.logger.warning(f"Could not open results index [{self.configuration.results_index_path}], runs are not indexed | {e}")
 		
 		# Copy the implementations and experiment configurations for reproducibility purposes
 		# For now, assume json files
-		implementations_destination = os.path.join(self.configuration.path_collection.log_path_date, "implementations.json")
-		experiment_destination = os.path.join(self.configuration.path_collection.log_path_date, "experiment.json")
-		try:
-			shutil.copy2(self.configuration.path_collection.implementations_configuration_file_path, implementations_destination) 
-		except IOError as e:
-			self.logger.warning(f"Could not copy over implementations configuration to root of experiment logs: {implementations_destination} | {e}")
-		try:
-			shutil.copy2(self.configuration.path_collection.experiment_configuration_file_path, experiment_destination) 
-		except IOError as e:
-			self.logger.warning(f"Could not copy over experiment configuration to root of experiment logs: {experiment_destination} | {e}")
+		# A resumed experiment keeps the copies of its first start
+		if resume_log_path is None:
+			implementations_destination = os.path.join(self.configuration.path_collection.log_path_date, "implementations.json")
+			experiment_destination = os.path.join(self.configuration.path_collection.log_path_date, "experiment.json")
+			try:
+				shutil.copy2(self.configuration.path_collection.implementations_configuration_file_path, implementations_destination) 
+			except IOError as e:
+				self.logger.warning(f"Could not copy over implementations configuration to root of experiment logs: {implementations_destination} | {e}")
+			try:
+				shutil.copy2(self.configuration.path_collection.experiment_configuration_file_path, experiment_destination) 
+			except IOError as e:
+				self.logger.warning(f"Could not copy over experiment configuration to root of experiment logs: {experiment_destination} | {e}")
 
-		for _ in range(max(1, self.configuration.hook_processor_count)):
-			processor = threading.Thread(target=self._post_hook_processor)
-			processor.start()
-			self.post_hook_processors.append(processor)
+		# Runs wait for a free spot in the backlog once post-hooks fall behind, the backlog grows with the number of workers
+		hook_processor_count = max(1, self.configuration.hook_processor_count)
+		post_hook_analyses = [qlog.analyze_run] if self.configuration.qlog_analysis else []
+		self.post_hook_executor = PostHookExecutor(hook_processor_count, self.configuration.hook_executor_type, type(self.configuration.environment), hook_processor_count * POST_HOOK_BACKLOG_PER_WORKER, post_hook_analyses)
 
-		self._enable_ipv6()
+		if resume_log_path is not None:
+			pending_post_hooks = self.manifest.pending_post_hooks()
+			if len(pending_post_hooks) > 0:
+				self.logger.info(f"Resuming experiment in [{self.configuration.path_collection.log_path_date}], requeueing {len(pending_post_hooks)} unfinished post-hook(s)")
+			for experiment_paths in pending_post_hooks:
+				self._queue_post_hook(self.configuration.environment, experiment_paths)
+
+		with tracing.span("experiment_setup"):
+			if self.configuration.privileged_helper:
+				try:
+					self.host_interface.start_privileged_helper(self.configuration.path_collection.log_path_date)
+				except VegvisirException as e:
+					self.logger.warning(f"Could not start the privileged helper, root commands are run through sudo | {e}")
+			self._enable_ipv6()
+			self.container_backend = self._spawn_container_backend()
+
+			# Kernel parameters, addresses, routes and versions are stored once, runs only store how the host differs
+			with tracing.span("host_state"):
+				try:
+					self.host_state = HostStateSnapshot.load_or_capture(self.configuration.path_collection.log_path_date, lambda: {self.container_backend.backend_name: self.container_backend.version()})
+					self.logger.debug(f"Container backend [{self.container_backend.backend_name}]:\n{self.host_state.state.get('versions', {}).get(self.container_backend.backend_name)}")
+				except OSError as e:
+					self.logger.warning(f"Could not store the host state of the experiment, runs do not record host differences | {e}")
+
+			# Slot 0 reuses the environment of the configuration, every additional slot requires its own sensors
+			self.slots = [Slot(0, self.configuration.environment)]
+			for index in range(1, self.configuration.parallel_slot_count):
+				self.slots.append(Slot(index, self.configuration.spawn_environment()))
+			self.slots_request_stop = False
+
+			# Fresh chains for every run are generated ahead of time, slots sharing a chain only need one each
+			if not self._reuse_cert_chain(self.configuration.environment):
+				self.certificate_pool = CertificatePool(len(self.slots) + 1, self.configuration.environment.certificate_chain_length, self.configuration.cert_key_type)
+				self.certificate_pool.start()
+				for slot in self.slots:
+					slot.environment.certificate_pool = self.certificate_pool
 
 		experiment_permutation_total = len(self.configuration.shaper_configurations) * len(self.configuration.server_configurations) * len(self.configuration.client_configurations) * self.configuration.iterations
-		experiment_permutation_counter = 0
+		completed = False
+		try:
+			if len(self.slots) == 1:
+				yield from self._run_sequential(experiment_permutation_total)
+			else:
+				yield from self._run_parallel(experiment_permutation_total)
+			completed = True
+		finally:
+			with tracing.span("experiment_teardown"):
+				for slot in self.slots:
+					try:
+						slot.wait_for_teardown()
+					except Exception as e:
+						self.logger.warning(f"Teardown of the last run of slot {slot.index} failed | {e}")
+					self._release_warm_containers(slot)
+					self._release_warm_browser(slot)
+					slot.cleanup()
+				self.container_backend.close()
+				if self.certificate_pool is not None:
+					self.certificate_pool.stop()
+				if self.configuration.reuse_containers:
+					# Only empty directories remain, some of which are created by the containers themselves
+					warm_log_path = os.path.join(self.configuration.path_collection.log_path_date, ".warm")
+					self.host_interface.run_privileged([("remove_tree", {"path": warm_log_path})])
+			if not completed:
+				# Queued post-hooks are dropped, running ones will not show up in the trace or manifest, a resume requeues them
+				self.post_hook_executor.shutdown(cancel_pending=True)
+				self._finish_trace()
+				self.host_interface.stop_privileged_helper()
+				self.manifest.close()
+				if self.results_index is not None:
+					self.results_index.close()
+		
+		yield None, None, None, None, None
+
+		# Wait for the remaining post-hooks, the executor wakes us as soon as the last one completes
+		while self.post_hook_executor.wait(10) > 0:
+			self.logger.info(f"Vegvisir is waiting for {self.post_hook_executor.pending} post-hook(s) to complete. If this message persists, perform CTRL + C")
+		self.post_hook_executor.shutdown()
+
+		self._finish_trace()
+		self.host_interface.stop_privileged_helper()
+		self.manifest.close()
+		if self.results_index is not None:
+			self.results_index.close()
+
+	def _finish_trace(self) -> None:
+		"""
+		Close the span file of the experiment and derive the Chrome trace from it
+		"""
+		tracing.record("experiment", "vegvisir", self.experiment_trace_start, tracing.now() - self.experiment_trace_start)
+		tracing.deactivate()
+		spans_path = os.path.join(self.configuration.path_collection.log_path_date, tracing.TRACE_SPANS_FILE)
+		trace_path = os.path.join(self.configuration.path_collection.log_path_date, tracing.TRACE_CHROME_FILE)
+		try:
+			tracing.export_chrome_trace(spans_path, trace_path)
+		except OSError as e:
+			self.logger.warning(f"Could not export Chrome trace to {trace_path} | {e}")
+
+	def _spawn_container_backend(self) -> BaseContainerBackend:
+		"""
+		Container backend selected in the experiment settings, falls back to the docker compose CLI when the selected backend is unavailable
+		"""
+		backend_name = self.configuration.container_backend
+		container_backend = backends.available_container_backends[backend_name](self.host_interface, self.configuration.docker_socket_path)
+		if not container_backend.is_available():
+			self.logger.warning(f"Container backend [{backend_name}] is unavailable, falling back to [{backends.default_container_backend}]")
+			container_backend.close()
+			container_backend = backends.available_container_backends[backends.default_container_backend](self.host_interface, self.configuration.docker_socket_path)
+		self.logger.debug(f"Using container backend [{container_backend.backend_name}]")
+		return container_backend
+
+	def _permutations(self, client_type: Endpoint.Type | None = None):
+		"""
+		Permutations in run order, optionally only those with a client of client_type
+		Sweeps in the configuration are expanded while iterating, permutations are never collected up front
+		"""
 		for shaper_config in self.configuration.shaper_configurations:
 			for server_config in self.configuration.server_configurations:
 				for client_config in self.configuration.client_configurations:
-					yield client_config["name"], shaper_config["name"], server_config["name"], experiment_permutation_counter, experiment_permutation_total
-					self.logger.info(f'Running {client_config["name"]} over {shaper_config["name"]} against {server_config["name"]}')
-					shaper = self.configuration.shapers[shaper_config["name"]]
-					server = self.configuration.server_endpoints[server_config["name"]]
-					client = self.configuration.client_endpoints[client_config["name"]]
-
-					# SETUP
-					if client.type == Endpoint.Type.HOST:
-						_, out, err = self.host_interface.spawn_blocking_subprocess("hostman add 193.167.100.100 server4", True, False)
-						self.logger.debug("Vegvisir: append entry to hosts: %s", out.strip())
-						if err is not None and len(err) > 0:
-							self.logger.debug("Vegvisir: appending entry to hosts file resulted in error: %s", err)
-
-					for run_number in range(0,self.configuration.iterations):
-						# self._run_individual_test()
-						iteration_start_time = datetime.now()
-						
-						# Paths, we create the folders so we can later bind them as docker volumes for direct logging output
-						# Avoids docker "no space left on device" errors
-						self.configuration.path_collection.log_path_iteration = os.path.join(self.configuration.path_collection.log_path_date, f"run_{run_number}/") if self.configuration.iterations > 1 else self.configuration.path_collection.log_path_date
-						self.configuration.path_collection.log_path_permutation = os.path.join(self.configuration.path_collection.log_path_iteration, f"{client_config.get('log_name', client_config['name'])}__{shaper_config.get('log_name', shaper_config['name'])}__{server_config.get('log_name', server_config['name'])}")
-						self.configuration.path_collection.log_path_client = os.path.join(self.configuration.path_collection.log_path_permutation, 'client')
-						self.configuration.path_collection.log_path_server = os.path.join(self.configuration.path_collection.log_path_permutation, 'server')
-						self.configuration.path_collection.log_path_shaper = os.path.join(self.configuration.path_collection.log_path_permutation, 'shaper')
-						self.configuration.path_collection.download_path_client = os.path.join(self.configuration.path_collection.log_path_permutation, 'downloads')
-						for log_dir in [self.configuration.path_collection.log_path_client, self.configuration.path_collection.log_path_server, self.configuration.path_collection.log_path_shaper, self.configuration.path_collection.download_path_client]:
-							pathlib.Path(log_dir).mkdir(parents=True, exist_ok=True)
-						pathlib.Path(os.path.join(self.configuration.path_collection.log_path_iteration, "client__shaper__server")).touch()						
-
-						# We want all output to be saved to file for later evaluation/debugging
-						log_file = os.path.join(self.configuration.path_collection.log_path_permutation, "output.txt")
-						log_handler = logging.FileHandler(log_file)
-						log_handler.setLevel(logging.DEBUG)
-						self.logger.addHandler(log_handler)
-
-						path_collection_copy = dataclasses.replace(self.configuration.path_collection)
-
-						self.logger.debug("Calling environment pre_hook")
-						pre_hook_start = datetime.now()
-						try:
-							self.configuration.environment.pre_run_hook(path_collection_copy)
-							pre_hook_total = datetime.now() - pre_hook_start
-							if pre_hook_total.total_seconds() > 5:
-								self.logger.debug(f"Pre-hook took {datetime.now() - pre_hook_start} to complete.")
-						except Exception as e:
-							self.logger.error(f"Pre-hook encountered an exception | {e}")
-
-						vegvisirBaseArguments = VegvisirArguments()
-						vegvisirBaseArguments.LOG_PATH_CLIENT = self.configuration.path_collection.log_path_client
-						vegvisirBaseArguments.LOG_PATH_SERVER = self.configuration.path_collection.log_path_server
-						vegvisirBaseArguments.LOG_PATH_SHAPER = self.configuration.path_collection.log_path_shaper
-						vegvisirBaseArguments.DOWNLOAD_PATH_CLIENT = self.configuration.path_collection.download_path_client
-
-						client_image = client.image.full if client.type == Endpoint.Type.DOCKER else "none"  # Docker compose v2 requires an image name, can't default to blank string
-
-						cert_path = tempfile.TemporaryDirectory(dir="/tmp", prefix="vegvisir_certs_")
-						vegvisirBaseArguments.CERT_FINGERPRINT = self.configuration.environment.generate_cert_chain(cert_path.name)
-
-						# TODO pick a better/cleaner spot to do this
-						vegvisirBaseArguments.ORIGIN = "server4"
-						vegvisirBaseArguments.ORIGIN_IPV4 = "server4"
-						vegvisirBaseArguments.ORIGIN_IPV6 = "server6" # TODO hostman this
-						vegvisirBaseArguments.ORIGIN_PORT = "443"
-						vegvisirBaseArguments.WAITFORSERVER = "server4:443"
-						vegvisirBaseArguments.SSLKEYLOGFILE = "/logs/keys.log"
-						vegvisirBaseArguments.QLOGDIR = "/logs/qlog/"
-						vegvisirBaseArguments.ENVIRONMENT = self.configuration.environment.environment_name if self.configuration.environment.environment_name != "" else None
-						# vegvisirBaseArguments.SCENARIO = shaper.scenarios[shaper_config["scenario"]].command  # TODO jherbots Check if client and server need this?
-
-						vegvisirServerArguments = dataclasses.replace(vegvisirBaseArguments, ROLE="server", TESTCASE=self.configuration.environment.get_QIR_compatibility_testcase(BaseEnvironment.Perspective.SERVER))
-						vegvisirShaperArguments = dataclasses.replace(vegvisirBaseArguments, ROLE="shaper", SCENARIO = shaper.scenarios[shaper_config["scenario"]].command, WAITFORSERVER="server:443")  # Important edgecase! Shaper uses server instead of server4
-
-						docker_compose_vars = (
-							"CLIENT=" + client_image + " "
-							"SERVER=" + server.image.full + " "
-							"SHAPER=" + shaper.image.full + " "
-
-							"CERTS=" + cert_path.name + " "
-							"WWW=" + self.configuration.www_path + " "
-							"DOWNLOAD_PATH_CLIENT=\"" + self.configuration.path_collection.download_path_client + "\" "
-
-							"LOG_PATH_CLIENT=\"" + self.configuration.path_collection.log_path_client + "\" "
-							"LOG_PATH_SERVER=\"" + self.configuration.path_collection.log_path_server + "\" "
-							"LOG_PATH_SHAPER=\"" + self.configuration.path_collection.log_path_shaper + "\" "
-						)
-
-						
-						# server_params = server.parameters.hydrate_with_arguments(server_config.get("arguments", {}), {"ROLE": "server", "SSLKEYLOGFILE": "/logs/keys.log", "QLOGDIR": "/logs/qlog/", "TESTCASE": self.configuration.environment.get_QIR_compatibility_testcase(BaseEnvironment.Perspective.SERVER)})
-						server_params = server.parameters.hydrate_with_arguments(server_config.get("arguments", {}), vegvisirServerArguments.dict())
-						# shaper_params = shaper.scenarios[shaper_config["scenario"]].parameters.hydrate_with_arguments(shaper_config.get("arguments", {}), {"WAITFORSERVER": "server:443", "SCENARIO": shaper.scenarios[shaper_config["scenario"]].command})
-						shaper_params = shaper.scenarios[shaper_config["scenario"]].parameters.hydrate_with_arguments(shaper_config.get("arguments", {}), vegvisirShaperArguments.dict())
-						
-						with open("server.env", "w") as fp:
-							Parameters.serialize_to_env_file(server_params, fp)
-						with open("shaper.env", "w") as fp:
-							Parameters.serialize_to_env_file(shaper_params, fp)
-
-						# params += " ".join(testcase.additional_envs())
-						# params += " ".join(shaper.additional_envs())
-						# params += " ".join(server.additional_envs())
-						# containers = "sim server " + " ".join(testcase.additional_containers())
-						containers = "sim server"
-
-						cmd = (
-							docker_compose_vars
-							+ " docker compose up -d "
-							+ containers
-						)
-						# self.host_interface.spawn_parallel_subprocess(cmd, False, True)
-						self.host_interface.spawn_blocking_subprocess(cmd, False, True) # TODO Test out if this truly fixes the RNETLINK error? This call might be too slow
-						
-						# Host applications require some packet rerouting to be able to reach docker containers
-						if self.configuration.client_endpoints[client_config["name"]].type == Endpoint.Type.HOST:
-							self.logger.debug("Detected local client, rerouting localhost traffic to 193.167.100.0/24 via 193.167.0.2")
-							_, out, err = self.host_interface.spawn_blocking_subprocess("ip route del 193.167.100.0/24", True, False)
-							if err is not None and len(err) > 0:
-								raise VegvisirRunFailedException(f"Failed to remove route to 193.167.100.0/24 | STDOUT [{out}] | STDERR [{err}]")
-							self.logger.debug("Removed docker compose route to 193.167.100.0/24")
-
-							_, out, err = self.host_interface.spawn_blocking_subprocess("ip route add 193.167.100.0/24 via 193.167.0.2", True, False)
-							if err is not None and len(err) > 0:
-								raise VegvisirRunFailedException(f"Failed to reroute 193.167.100.0/24 via 193.167.0.2 | STDOUT [{out}] | STDERR [{err}]")
-							self.logger.debug("Rerouted 193.167.100.0/24 via 193.167.0.2")
-
-							_, out, err = self.host_interface.spawn_blocking_subprocess("./veth-checksum.sh", True, False)
-							if err is not None and len(err) > 0:
-								raise VegvisirRunFailedException(f"Virtual ethernet device checksum failed | STDOUT [{out}] | STDERR [{err}]")								
-
-						# Log kernel/net parameters
-						self.print_debug_information("ip address")
-						self.print_debug_information("ip route list")
-						self.print_debug_information("sysctl -a")
-						self.print_debug_information("docker version")
-						self.print_debug_information("docker compose version")
-
-						# Setup client
-						vegvisirClientArguments = dataclasses.replace(vegvisirBaseArguments, ROLE = "client", TESTCASE = self.configuration.environment.get_QIR_compatibility_testcase(BaseEnvironment.Perspective.CLIENT))
-						client_params = client.parameters.hydrate_with_arguments(client_config.get("arguments", {}), vegvisirClientArguments.dict())
-						
-						client_cmd = ""
-						client_proc = None
-						if client.type == Endpoint.Type.DOCKER:
-							with open("client.env", "w") as fp:
-								Parameters.serialize_to_env_file(client_params, fp)
-							
-							# params += " ".join(client.additional_envs())
-							client_cmd = (
-								docker_compose_vars
-								+ " docker compose up --abort-on-container-exit --timeout 1 "
-								+ "client"
-							)
-							client_proc = self.host_interface.spawn_parallel_subprocess(client_cmd, False, True)
-
-						elif client.type == Endpoint.Type.HOST:
-							for constructor in client.construct:
-								constructor_command = constructor.serialize_command(client_params)
-								self.logger.debug(f"Issuing client construct command [{constructor_command}]")
-								_, out, err = self.host_interface.spawn_blocking_subprocess(constructor_command, constructor.requires_root, True)
-								if out is not None and len(out) > 0:
-									self.logger.debug(f"Construct command STDOUT:\n{out}")
-								if err is not None and len(err) > 0:
-									self.logger.debug(f"Construct command STDERR:\n{err}")
-							client_cmd = client.command.serialize_command(client_params)
-							client_proc = self.host_interface.spawn_parallel_subprocess(client_cmd)
-						self.logger.debug("Vegvisir: running client: %s", client_cmd)
-
-						try:
-							self.configuration.environment.start_sensors(client_proc, self.configuration.path_collection)
-							self.configuration.environment.waitfor_sensors()
-							self.configuration.environment.clean_and_reset_sensors()
-						except KeyboardInterrupt:
-							self.configuration.environment.forcestop_sensors()
-							self.configuration.environment.clean_and_reset_sensors()
-							with open(os.path.join(self.configuration.path_collection.log_path_permutation, "crashreport.txt"), "w") as fp:
-								fp.write("Test aborted by user interaction.")
-							self.logger.info("CTRL-C test interrupted")
-
-						client_proc.terminate() # TODO redundant?
-						if client.type == Endpoint.Type.HOST:
-							# Doing this for docker will nullify the sensor system
-							# Docker client logs are retrieved with "docker compose logs"
-							out, err = client_proc.communicate()
-							self.logger.debug(out.decode("utf-8"))
-							self.logger.debug(err.decode("utf-8"))
-
-						_, out, err = self.host_interface.spawn_blocking_subprocess(docker_compose_vars + " docker compose logs --timestamps server", False, True)
-						self.logger.debug(out)
-						self.logger.debug(err)
-						_, out, err = self.host_interface.spawn_blocking_subprocess(docker_compose_vars + " docker compose logs --timestamps sim", False, True)
-						self.logger.debug(out)
-						self.logger.debug(err)
-						_, out, err = self.host_interface.spawn_blocking_subprocess(docker_compose_vars + " docker compose logs --timestamps client", False, True)
-						self.logger.debug(out)
-						self.logger.debug(err)
-
-						_, out ,err = self.host_interface.spawn_blocking_subprocess(docker_compose_vars + " docker compose down", False, True) # TODO TEMP
-						self.logger.debug(out)
-
-					# BREAKDOWN
-					if client.type == Endpoint.Type.HOST:
-						for destructor in client.destruct:
-								destructor_command = destructor.serialize_command(client_params)
-								self.logger.debug(f"Issuing client destruct command [{destructor_command}]")
-								_, out, err = self.host_interface.spawn_blocking_subprocess(destructor_command, destructor.requires_root, True)
-								if out is not None and len(out) > 0:
-									self.logger.debug(f"Destruct command STDOUT:\n{out}")
-								if err is not None and len(err) > 0:
-									self.logger.debug(f"Destruct command STDERR:\n{err}")
-
-						_, out, err = self.host_interface.spawn_blocking_subprocess("hostman remove --names=server4", True, False)
-						self.logger.debug("Vegvisir: remove entry from hosts: %s", out.strip())
-						if err is not None and len(err) > 0:
-							self.logger.debug("Vegvisir: removing entry from hosts file resulted in error: %s", err)
-
-					# Change ownership of docker output to running user
+					if client_type is None or self.configuration.client_endpoints[client_config["name"]].type == client_type:
+						yield client_config, shaper_config, server_config
+
+	def _run_sequential(self, experiment_permutation_total: int):
+		slot = self.slots[0]
+		experiment_permutation_counter = 0
+		for client_config, shaper_config, server_config in self._permutations():
+			yield client_config["name"], shaper_config["name"], server_config["name"], experiment_permutation_counter, experiment_permutation_total
+			experiment_permutation_counter += self._run_permutation(slot, client_config, shaper_config, server_config)
+		self._wait_for_teardown(slot)
+
+	def _run_parallel(self, experiment_permutation_total: int):
+		"""
+		Every slot runs permutations in its own thread, progress is reported back to the generator through an event queue
+		Host clients alter the routing table and hosts file of the host itself, these permutations are bound to slot 0
+		A keyboard interrupt aborts all active runs and stops the scheduling of new permutations
+		"""
+		# Slots take turns drawing from the same generators, the lock keeps them from advancing one concurrently
+		host_permutations = self._permutations(Endpoint.Type.HOST)
+		docker_permutations = self._permutations(Endpoint.Type.DOCKER)
+		permutation_lock = threading.Lock()
+
+		events = queue.Queue()
+		workers: List[threading.Thread] = []
+		for slot in self.slots:
+			permutation_sources = [host_permutations, docker_permutations] if slot.index == 0 else [docker_permutations]
+			worker = threading.Thread(target=self._slot_worker, args=(slot, permutation_sources, permutation_lock, events,), name=f"slot{slot.index}")
+			worker.start()
+			workers.append(worker)
+
+		experiment_permutation_counter = 0
+		active_workers = len(workers)
+		failure = None
+		try:
+			while active_workers > 0:
+				event, payload = events.get()
+				if event == "start":
+					client_name, shaper_name, server_name = payload
+					yield client_name, shaper_name, server_name, experiment_permutation_counter, experiment_permutation_total
+				elif event == "done":
+					experiment_permutation_counter += payload
+				elif event == "error":
+					failure = failure or payload
+					self._request_slots_stop()
+				elif event == "exit":
+					active_workers -= 1
+		except KeyboardInterrupt:
+			self.logger.info("CTRL-C experiment interrupted, waiting for active slots to clean up")
+			self._request_slots_stop()
+
+		for worker in workers:
+			worker.join()
+		if failure is not None:
+			raise failure
+
+	def _slot_worker(self, slot: Slot, permutation_sources: List[Iterator], permutation_lock: threading.Lock, events: queue.Queue):
+		try:
+			for permutations in permutation_sources:
+				while not self.slots_request_stop:
+					with permutation_lock:
+						permutation = next(permutations, None)
+					if permutation is None:
+						break
+					client_config, shaper_config, server_config = permutation
+					events.put(("start", (client_config["name"], shaper_config["name"], server_config["name"])))
+					events.put(("done", self._run_permutation(slot, client_config, shaper_config, server_config)))
+			self._wait_for_teardown(slot)
+		except Exception as e:
+			slot.logger.error(f"Slot {slot.index} encountered an exception, halting experiment | {e}")
+			events.put(("error", e))
+		finally:
+			events.put(("exit", slot.index))
+
+	def _request_slots_stop(self):
+		self.slots_request_stop = True
+		for slot in self.slots:
+			slot.environment.interrupt_sensors()
+
+	def _run_permutation(self, slot: Slot, client_config: Dict, shaper_config: Dict, server_config: Dict) -> int:
+		"""
+		Run all iterations of a single permutation on the provided slot
+		Returns the number of runs that were executed, completed before the experiment was resumed or linked from the result cache
+		"""
+		logger = slot.logger
+		log_path_date = self.configuration.path_collection.log_path_date
+		pending_runs = [run_number for run_number in range(0, self.configuration.iterations) if not self.manifest.is_completed(self._run_log_paths(log_path_date, client_config, shaper_config, server_config, run_number)[1])]
+		skipped_runs = self.configuration.iterations - len(pending_runs)
+		if skipped_runs > 0:
+			logger.info(f'Skipping {skipped_runs} completed run(s) of {client_config["name"]} over {shaper_config["name"]} against {server_config["name"]}')
+
+		# Runs identical to a run measured earlier are satisfied by linking its results, new results become available to later experiments
+		cache_entries: Dict[int, Tuple[str, Dict] | None] = {}
+		if self.result_cache is not None and len(pending_runs) > 0:
+			with tracing.span("result_cache_lookup"):
+				cache_entries = {run_number: self._result_cache_entry(slot.environment, client_config, shaper_config, server_config, run_number) for run_number in pending_runs}
+				cached_runs = []
+				if not self.bypass_result_cache:
+					cached_runs = [run_number for run_number in pending_runs if cache_entries[run_number] is not None and self._link_cached_run(logger, client_config, shaper_config, server_config, run_number, cache_entries[run_number][0])]
+			if len(cached_runs) > 0:
+				logger.info(f'Linked {len(cached_runs)} run(s) of {client_config["name"]} over {shaper_config["name"]} against {server_config["name"]} from identical earlier runs')
+				pending_runs = [run_number for run_number in pending_runs if run_number not in cached_runs]
+				skipped_runs += len(cached_runs)
+
+		# Runs completed before a resume or linked from the cache are the first samples of adaptive iterations
+		stop_rule = None
+		if self.configuration.adaptive_iterations is not None:
+			stop_rule = IterationStopRule(self.configuration.adaptive_iterations)
+			for run_number in range(0, self.configuration.iterations):
+				if run_number not in pending_runs:
+					self._add_adaptive_sample(stop_rule, self._run_log_paths(log_path_date, client_config, shaper_config, server_config, run_number)[1])
+			if stop_rule.converged():
+				logger.info(f'Earlier runs of {client_config["name"]} over {shaper_config["name"]} against {server_config["name"]} converged, {stop_rule.describe()}')
+				return self.configuration.iterations
+
+		if len(pending_runs) == 0:
+			return skipped_runs
+
+		logger.info(f'Running {client_config["name"]} over {shaper_config["name"]} against {server_config["name"]}')
+		client = self.configuration.client_endpoints[client_config["name"]]
+
+		# SETUP
+		if client.type == Endpoint.Type.HOST:
+			_, out, err = self.host_interface.run_privileged([("hosts_add", {"address": slot.server_ipv4, "name": "server4"})])[0]
+			logger.debug("Vegvisir: append entry to hosts: %s", out.strip())
+			if err is not None and len(err) > 0:
+				logger.debug("Vegvisir: appending entry to hosts file resulted in error: %s", err)
+
+		runs = 0
+		client_params = {}
+		for index, run_number in enumerate(pending_runs):
+			if self.slots_request_stop:
+				break
+			# Samples of post-hook metrics arrive while later runs are already going, these runs are not waited for
+			if stop_rule is not None and stop_rule.converged():
+				logger.info(f'Stopping {client_config["name"]} over {shaper_config["name"]} against {server_config["name"]} after {runs} run(s), {stop_rule.describe()}')
+				skipped_runs += len(pending_runs) - index
+				break
+			log_path_iteration, log_path_permutation = self._run_log_paths(log_path_date, client_config, shaper_config, server_config, run_number)
+			if cache_entries.get(run_number) is not None:
+				self.result_cache_candidates[log_path_permutation] = cache_entries[run_number]
+			if stop_rule is not None:
+				self.adaptive_stop_rules[log_path_permutation] = stop_rule
+			try:
+				with tracing.span("iteration", slot=slot.index, client=client_config["name"], shaper=shaper_config["name"], server=server_config["name"], run=run_number):
+					client_params = self._run_iteration(slot, client_config, shaper_config, server_config, run_number)
+			except Exception:
+				self.result_cache_candidates.pop(log_path_permutation, None)
+				self.adaptive_stop_rules.pop(log_path_permutation, None)
+				failed_paths = dataclasses.replace(self.configuration.path_collection, log_path_iteration=log_path_iteration, log_path_permutation=log_path_permutation)
+				self.manifest.record_run(client_config["name"], shaper_config["name"], server_config["name"], run_number, failed_paths, RunStatus.FAILED)
+				raise
+			runs += 1
+		else:
+			if stop_rule is not None:
+				logger.info(f'{client_config["name"]} over {shaper_config["name"]} against {server_config["name"]} reached {self.configuration.iterations} iterations, {stop_rule.describe()}')
+
+		# BREAKDOWN
+		if client.type == Endpoint.Type.HOST:
+			self._wait_for_teardown(slot)
+			# Browsers of devtools clients outlive the permutation, their destruct commands run once they are closed
+			if runs > 0 and client.devtools is None:
+				self._run_client_setup_commands("destruct", [(destructor.serialize_command(client_params), destructor.requires_root) for destructor in client.destruct], logger)
+
+			_, out, err = self.host_interface.run_privileged([("hosts_remove", {"name": "server4"})])[0]
+			logger.debug("Vegvisir: remove entry from hosts: %s", out.strip())
+			if err is not None and len(err) > 0:
+				logger.debug("Vegvisir: removing entry from hosts file resulted in error: %s", err)
+
+		return runs + skipped_runs
+
+	def _www_digest(self) -> str:
+		if self.www_digest is None:
+			with tracing.span("www_digest"):
+				self.www_digest = ResultCache.tree_digest(self.configuration.www_path)
+		return self.www_digest
+
+	def _image_id(self, image: str) -> str | None:
+		if image not in self.image_ids:
+			try:
+				self.image_ids[image] = self.container_backend.image_id(image)
+			except VegvisirException as e:
+				self.logger.debug(f"Could not determine the ID of image [{image}], its runs are not cached | {e}")
+				self.image_ids[image] = None
+		return self.image_ids[image]
+
+	def _result_cache_entry(self, environment: BaseEnvironment, client_config: Dict, shaper_config: Dict, server_config: Dict, run_number: int) -> Tuple[str, Dict] | None:
+		"""
+		Result cache key of a run and the components it hashes, None when an image is not available locally (yet)
+		Parameters are hydrated with placeholder paths, the log directories and certificate fingerprint differ every run without influencing its outcome
+		The served files and the kind of certificate chain do influence it, they are part of the key
+		"""
+		shaper = self.configuration.shapers[shaper_config["name"]]
+		server = self.configuration.server_endpoints[server_config["name"]]
+		client = self.configuration.client_endpoints[client_config["name"]]
+		scenario = shaper.scenarios[shaper_config["scenario"]]
+
+		placeholder_arguments = dataclasses.replace(self._base_arguments(environment), LOG_PATH_CLIENT="/logs/client", LOG_PATH_SERVER="/logs/server", LOG_PATH_SHAPER="/logs/shaper", DOWNLOAD_PATH_CLIENT="/downloads", CERT_FINGERPRINT="CERT_FINGERPRINT")
+		client_arguments, server_arguments, shaper_arguments = self._role_arguments(placeholder_arguments, environment, scenario)
+		client_params = client.parameters.hydrate_with_arguments(client_config.get("arguments", {}), client_arguments.dict())
+		if client.type == Endpoint.Type.DOCKER:
+			client_program = self._image_id(client.image.full)
+		else:
+			client_program = [command.serialize_command(client_params) for command in [*client.construct, client.command, *client.destruct]]
+			if client.devtools is not None:
+				client_program.append(client.devtools.serialize_url(client_params))
+
+		components = {
+			"iteration": run_number,
+			"client": client_program,
+			"client_parameters": client_params,
+			"server": self._image_id(server.image.full),
+			"server_parameters": server.parameters.hydrate_with_arguments(server_config.get("arguments", {}), server_arguments.dict()),
+			"shaper": self._image_id(shaper.image.full),
+			"shaper_parameters": scenario.parameters.hydrate_with_arguments(shaper_config.get("arguments", {}), shaper_arguments.dict()),
+			"scenario": scenario.command,
+			"environment": self.configuration.environment_name,
+			"sensors": self.configuration.environment_sensor_configurations,
+			"www": self.configuration.www_path,
+			"www_listing": self._www_digest(),
+			"cert_key_type": self.configuration.cert_key_type.value,
+			"cert_chain_length": environment.certificate_chain_length,
+		}
+		if any(components[program] is None for program in ["client", "server", "shaper"]):
+			return None
+		return ResultCache.key(components), components
+
+	def _link_cached_run(self, logger: logging.Logger, client_config: Dict, shaper_config: Dict, server_config: Dict, run_number: int, cache_key: str) -> bool:
+		"""
+		Link the results of an identical earlier run into the run directory
+		Returns False when there is no such run or its results could not be linked, the run has to be executed instead
+		"""
+		log_path_iteration, log_path_permutation = self._run_log_paths(self.configuration.path_collection.log_path_date, client_config, shaper_config, server_config, run_number)
+		cached_path = self.result_cache.lookup(cache_key)
+		if cached_path is None or os.path.exists(log_path_permutation):
+			return False
+		try:
+			ResultCache.link(cached_path, log_path_permutation)
+		except OSError as e:
+			logger.warning(f"Could not link cached results from [{cached_path}], running again | {e}")
+			shutil.rmtree(log_path_permutation, ignore_errors=True)
+			return False
+		pathlib.Path(os.path.join(log_path_iteration, "client__shaper__server")).touch()
+		cached_paths = dataclasses.replace(self.configuration.path_collection, log_path_iteration=log_path_iteration, log_path_permutation=log_path_permutation)
+		self.manifest.record_run(client_config["name"], shaper_config["name"], server_config["name"], run_number, cached_paths, RunStatus.CACHED, cached_path)
+		self._index_run(cached_paths)
+		logger.debug(f"Run {run_number} linked from [{cached_path}]")
+		return True
+
+	def _store_result_cache_entry(self, experiment_paths: ExperimentPaths) -> None:
+		"""
+		Completed runs become available to later experiments once their post-hook finished, aborted runs never do
+		"""
+		candidate = self.result_cache_candidates.pop(experiment_paths.log_path_permutation, None)
+		if candidate is None or not self.manifest.is_completed(experiment_paths.log_path_permutation):
+			return
+		cache_key, components = candidate
+		try:
+			self.result_cache.store(cache_key, experiment_paths.log_path_permutation, components)
+		except OSError as e:
+			self.logger.warning(f"Could not store result cache entry for [{experiment_paths.log_path_permutation}] | {e}")
+
+	def _add_adaptive_sample(self, stop_rule: IterationStopRule, log_path_permutation: str) -> None:
+		"""
+		Sample the metric of a finished run from its directory, runs that failed, timed out or lack the metric are left out
+		"""
+		metadata = read_run_metadata(log_path_permutation)
+		if metadata.get("status", RunStatus.COMPLETED.value) != RunStatus.COMPLETED.value or "timeout" in (metadata.get("sensor_outcome") or "").split(","):
+			return
+		value = run_metrics(log_path_permutation, metadata).get(stop_rule.settings.metric)
+		if value is not None:
+			stop_rule.add(value)
+
+	def _run_log_paths(self, log_path_date: str, client_config: Dict, shaper_config: Dict, server_config: Dict, run_number: int) -> Tuple[str, str]:
+		"""
+		Iteration and permutation log directories of a single run
+		"""
+		log_path_iteration = os.path.join(log_path_date, f"run_{run_number}/") if self.configuration.iterations > 1 else log_path_date
+		log_path_permutation = os.path.join(log_path_iteration, f"{client_config.get('log_name', client_config['name'])}__{shaper_config.get('log_name', shaper_config['name'])}__{server_config.get('log_name', server_config['name'])}")
+		return log_path_iteration, log_path_permutation
+
+	def _run_iteration(self, slot: Slot, client_config: Dict, shaper_config: Dict, server_config: Dict, run_number: int) -> Dict[str, str]:
+		"""
+		Single run of a permutation on the provided slot
+		Returns the hydrated client parameters, host clients require these for their destruct commands
+		"""
+		logger = slot.logger
+		environment = slot.environment
+		shaper = self.configuration.shapers[shaper_config["name"]]
+		server = self.configuration.server_endpoints[server_config["name"]]
+		client = self.configuration.client_endpoints[client_config["name"]]
+
+		iteration_start_time = datetime.now()
+		
+		# Paths, we create the folders so we can later bind them as docker volumes for direct logging output
+		# Avoids docker "no space left on device" errors
+		# Every run receives its own copy of the path collection, slots can not share one
+		path_collection = dataclasses.replace(self.configuration.path_collection)
+		path_collection.log_path_iteration, path_collection.log_path_permutation = self._run_log_paths(path_collection.log_path_date, client_config, shaper_config, server_config, run_number)
+		if os.path.exists(path_collection.log_path_permutation):
+			# Leftovers of a run that never completed (resumed experiment), kept aside instead of mixing them with the new output
+			interrupted_path = path_collection.log_path_permutation + "__interrupted_{:%Y-%m-%dT_%H-%M-%S}".format(iteration_start_time)
+			os.rename(path_collection.log_path_permutation, interrupted_path)
+			logger.info(f"Moved output of an incomplete earlier run to [{interrupted_path}]")
+		path_collection.log_path_client = os.path.join(path_collection.log_path_permutation, 'client')
+		path_collection.log_path_server = os.path.join(path_collection.log_path_permutation, 'server')
+		path_collection.log_path_shaper = os.path.join(path_collection.log_path_permutation, 'shaper')
+		path_collection.download_path_client = os.path.join(path_collection.log_path_permutation, 'downloads')
+		for log_dir in [path_collection.log_path_client, path_collection.log_path_server, path_collection.log_path_shaper, path_collection.download_path_client]:
+			pathlib.Path(log_dir).mkdir(parents=True, exist_ok=True)
+		pathlib.Path(os.path.join(path_collection.log_path_iteration, "client__shaper__server")).touch()						
+
+		# We want all output to be saved to file for later evaluation/debugging
+		log_file = os.path.join(path_collection.log_path_permutation, "output.txt")
+		log_handler = logging.FileHandler(log_file)
+		log_handler.setLevel(logging.DEBUG)
+		logger = slot.run_logger(log_handler)
+
+		path_collection_copy = dataclasses.replace(path_collection)
+
+		logger.debug("Calling environment pre_hook")
+		with tracing.span("pre_run_hook"):
+			pre_hook_start = datetime.now()
+			try:
+				environment.pre_run_hook(path_collection_copy)
+				pre_hook_total = datetime.now() - pre_hook_start
+				if pre_hook_total.total_seconds() > 5:
+					logger.debug(f"Pre-hook took {datetime.now() - pre_hook_start} to complete.")
+			except Exception as e:
+				logger.error(f"Pre-hook encountered an exception | {e}")
+
+		vegvisirBaseArguments = self._base_arguments(environment)
+		vegvisirBaseArguments.LOG_PATH_CLIENT = path_collection.log_path_client
+		vegvisirBaseArguments.LOG_PATH_SERVER = path_collection.log_path_server
+		vegvisirBaseArguments.LOG_PATH_SHAPER = path_collection.log_path_shaper
+		vegvisirBaseArguments.DOWNLOAD_PATH_CLIENT = path_collection.download_path_client
+
+		client_image = client.image.full if client.type == Endpoint.Type.DOCKER else "none"  # Docker compose v2 requires an image name, can't default to blank string
+
+		# Warm containers write their logs to slot specific directories, these get copied into the run directories and truncated after every run
+		reuse_containers = self.configuration.reuse_containers
+		log_path_server_containers = path_collection.log_path_server
+		log_path_shaper_containers = path_collection.log_path_shaper
+		if reuse_containers:
+			warm_log_path = os.path.join(path_collection.log_path_date, ".warm", f"slot{slot.index}")
+			log_path_server_containers = os.path.join(warm_log_path, "server")
+			log_path_shaper_containers = os.path.join(warm_log_path, "shaper")
+			for log_dir in [log_path_server_containers, log_path_shaper_containers]:
+				pathlib.Path(log_dir).mkdir(parents=True, exist_ok=True)
+
+		# A running server can not switch certificates, warm slots keep one chain for the whole experiment
+		# Other slots do the same when asked to and the environment permits it
+		with tracing.span("cert_chain"):
+			cert_path = None
+			if self._reuse_cert_chain(environment):
+				if slot.shared_cert_path is None:
+					slot.shared_cert_path = os.path.join(slot.working_directory, "certs")
+					slot.shared_cert_fingerprint = environment.generate_cert_chain(slot.shared_cert_path, environment.certificate_chain_length)
+				cert_directory = slot.shared_cert_path
+				vegvisirBaseArguments.CERT_FINGERPRINT = slot.shared_cert_fingerprint
+			else:
+				cert_path = tempfile.TemporaryDirectory(dir=slot.working_directory, prefix="vegvisir_certs_")
+				cert_directory = cert_path.name
+				vegvisirBaseArguments.CERT_FINGERPRINT = environment.generate_cert_chain(cert_directory, environment.certificate_chain_length)
+
+		vegvisirClientArguments, vegvisirServerArguments, vegvisirShaperArguments = self._role_arguments(vegvisirBaseArguments, environment, shaper.scenarios[shaper_config["scenario"]])
+		vegvisirServerArguments = dataclasses.replace(vegvisirServerArguments, LOG_PATH_SERVER=log_path_server_containers, LOG_PATH_SHAPER=log_path_shaper_containers)
+		vegvisirShaperArguments = dataclasses.replace(vegvisirShaperArguments, LOG_PATH_SERVER=log_path_server_containers, LOG_PATH_SHAPER=log_path_shaper_containers)
+
+		compose_project = ComposeProject(slot.project_name, {
+			**slot.compose_variables(),
+			"CLIENT": client_image,
+			"SERVER": server.image.full,
+			"SHAPER": shaper.image.full,
+
+			"CERTS": cert_directory,
+			"WWW": self.configuration.www_path,
+			"DOWNLOAD_PATH_CLIENT": path_collection.download_path_client,
+
+			"LOG_PATH_CLIENT": path_collection.log_path_client,
+			"LOG_PATH_SERVER": log_path_server_containers,
+			"LOG_PATH_SHAPER": log_path_shaper_containers,
+		})
+
+		
+		# server_params = server.parameters.hydrate_with_arguments(server_config.get("arguments", {}), {"ROLE": "server", "SSLKEYLOGFILE": "/logs/keys.log", "QLOGDIR": "/logs/qlog/", "TESTCASE": self.configuration.environment.get_QIR_compatibility_testcase(BaseEnvironment.Perspective.SERVER)})
+		server_params = server.parameters.hydrate_with_arguments(server_config.get("arguments", {}), vegvisirServerArguments.dict())
+		# shaper_params = shaper.scenarios[shaper_config["scenario"]].parameters.hydrate_with_arguments(shaper_config.get("arguments", {}), {"WAITFORSERVER": "server:443", "SCENARIO": shaper.scenarios[shaper_config["scenario"]].command})
+		shaper_params = shaper.scenarios[shaper_config["scenario"]].parameters.hydrate_with_arguments(shaper_config.get("arguments", {}), vegvisirShaperArguments.dict())
+
+		# Everything up to here overlaps with the teardown of the previous run, its containers and networks have to be gone before the slot continues
+		self._wait_for_teardown(slot)
+
+		start_containers = True
+		if reuse_containers:
+			scenario = shaper.scenarios[shaper_config["scenario"]]
+			warm_key = (
+				shaper.image.full,
+				server.image.full,
+				shaper_config["scenario"],
+				self._warm_container_arguments(server_params),
+			)
+			warm_shaper_arguments = self._warm_container_arguments(shaper_params)
+			if slot.warm_containers is not None and slot.warm_containers.key == warm_key:
+				if slot.warm_containers.shaper_arguments == warm_shaper_arguments:
+					logger.debug("Reusing warm sim and server containers")
+					start_containers = False
+				elif scenario.reconfigurable:
 					try:
-						real_username = getpass.getuser()
-						real_primary_groupname = grp.getgrgid(os.getgid()).gr_name
-						chown_to = f"{real_username}:{real_primary_groupname}"
-						_, out, err = self.host_interface.spawn_blocking_subprocess(f"chown -R {chown_to} {self.configuration.path_collection.log_path_permutation}", True, False)
-						if len(err) > 0:
-							raise VegvisirException(err)
-						self.logger.debug(f"Changed ownership of output logs to {chown_to} | {self.configuration.path_collection.log_path_permutation}")
-					except (KeyError, TypeError):
-						self.logger.warning(f"Could not change log output ownership @ {self.configuration.path_collection.log_path_permutation}, groupname might not be found?")
-					except VegvisirException as e:
-						self.logger.warning(f"Could not change log output ownership [{e}] @ {self.configuration.path_collection.log_path_permutation}")
-
-					self.post_hook_processor_queue.put((self.configuration.environment.post_run_hook, path_collection_copy))  # Queue is infinite, should not block
-
-					experiment_permutation_counter += 1
-
-					if self.configuration.iterations > 1:
-						self.logger.info(f'Test run {run_number}/{self.configuration.iterations} duration: {datetime.now() - iteration_start_time}')
-					else:
-						self.logger.info(f'Test run duration: {datetime.now() - iteration_start_time}')
-					
-					self.logger.removeHandler(log_handler)
-					log_handler.close()
+						with tracing.span("reconfigure_shaper"):
+							reconfigure_shaper(slot.shaper_leftnet_ipv4, shaper_params["SCENARIO"])
+						slot.warm_containers.shaper_arguments = warm_shaper_arguments
+						logger.debug(f"Reusing warm sim and server containers, shaper reconfigured to [{shaper_params['SCENARIO']}]")
+						start_containers = False
+					except VegvisirShaperControlException as e:
+						logger.warning(f"Shaper reconfiguration failed, restarting containers instead | {e}")
+			if start_containers:
+				self._release_warm_containers(slot, logger)
+
+		if start_containers:
+			with open(os.path.join(slot.working_directory, "server.env"), "w") as fp:
+				Parameters.serialize_to_env_file(server_params, fp)
+			with open(os.path.join(slot.working_directory, "shaper.env"), "w") as fp:
+				Parameters.serialize_to_env_file(shaper_params, fp)
+
+			containers = ["sim", "server"]
+
+			# Blocking start, TODO Test out if this truly fixes the RNETLINK error? This call might be too slow
+			with tracing.span("containers_up", services=containers):
+				self.container_backend.up(compose_project, containers)
+			if reuse_containers:
+				slot.warm_containers = WarmContainers(warm_key, warm_shaper_arguments, compose_project, log_path_server_containers, log_path_shaper_containers)
+
+		# Container output is followed live into the run directories, warm containers only contribute what they log during this run
+		with tracing.span("follow_logs"):
+			logs_since = iteration_start_time if reuse_containers else None
+			log_followers = [
+				self.container_backend.follow_logs(compose_project, "server", os.path.join(path_collection.log_path_server, CONTAINER_LOG_FILE), logs_since),
+				self.container_backend.follow_logs(compose_project, "sim", os.path.join(path_collection.log_path_shaper, CONTAINER_LOG_FILE), logs_since),
+			]
 		
-		yield None, None, None, None, None
+		# Host applications require some packet rerouting to be able to reach docker containers
+		# Routes and offload settings stay in place as long as the compose networks and containers exist (e.g., warm containers)
+		if client.type == Endpoint.Type.HOST:
+			with tracing.span("routes"):
+				network_state = host_client_network_state(slot.leftnet_subnet)
+				if network_state[0] is not None and network_state == slot.host_network_state:
+					logger.debug(f"Leftnet bridge {network_state[0]} and its veths are unchanged, {slot.rightnet_subnet} is still routed via {slot.shaper_leftnet_ipv4}")
+				else:
+					logger.debug(f"Detected local client, rerouting localhost traffic to {slot.rightnet_subnet} via {slot.shaper_leftnet_ipv4}")
+					returncode, out, err = self.host_interface.run_privileged([("host_client_network", {"rightnet": slot.rightnet_subnet, "via": slot.shaper_leftnet_ipv4, "leftnet": slot.leftnet_subnet})])[0]
+					if returncode != 0 or len(err) > 0:
+						raise VegvisirRunFailedException(f"Failed to reroute {slot.rightnet_subnet} via {slot.shaper_leftnet_ipv4} | STDOUT [{out}] | STDERR [{err}]")
+					logger.debug(f"Rerouted {slot.rightnet_subnet} via {slot.shaper_leftnet_ipv4} | {out}")
+					slot.host_network_state = network_state
 
-		# Halt the hook processors
-		wait_for_hook_processors_counter = 0
-		while True:
-			if self.post_hook_processor_queue.qsize() == 0:
-				self.post_hook_processor_request_stop = True
-			states = [t.is_alive() for t in self.post_hook_processors]
-			time.sleep(5)
-			if not any(states):
-				for t in self.post_hook_processors:
-					t.join()
-				break
-			if wait_for_hook_processors_counter % 2 == 0:
-				hooks_todo = self.post_hook_processor_queue.qsize()
-				if hooks_todo > 0:
-					self.logger.info(f"Vegvisir is waiting for all post-hooks to process, approximately {self.post_hook_processor_queue.qsize()} request(s) still in queue.")
+		# Kernel/net parameters that differ from the host state at the start of the experiment
+		if self.host_state is not None:
+			with tracing.span("host_state"):
+				try:
+					host_state_diff = self.host_state.record_run(path_collection.log_path_permutation)
+					logger.debug(f"Host state compared to {HOST_STATE_FILE}: {summarize_diff(host_state_diff)}, see {HOST_STATE_DIFF_FILE}")
+				except OSError as e:
+					logger.warning(f"Could not record the host state of the run | {e}")
+
+		# Setup client
+		client_params = client.parameters.hydrate_with_arguments(client_config.get("arguments", {}), vegvisirClientArguments.dict())
+		
+		with tracing.span("client_start", client_type=client.type.value):
+			client_cmd = ""
+			client_proc = None
+			if client.type == Endpoint.Type.DOCKER:
+				with open(os.path.join(slot.working_directory, "client.env"), "w") as fp:
+					Parameters.serialize_to_env_file(client_params, fp)
+			
+				# Aborting on container exit would also stop the warm containers, without dependencies compose only attaches to the client
+				client_cmd = f"{self.container_backend.backend_name}: up client"
+				client_proc = self.container_backend.run(compose_project, "client", not reuse_containers, os.path.join(path_collection.log_path_client, CONTAINER_LOG_FILE))
+
+			elif client.type == Endpoint.Type.HOST:
+				client_cmd = client.command.serialize_command(client_params)
+				if client.devtools is not None:
+					client_proc = self._start_devtools_run(slot, client, client_params, client_cmd, path_collection, logger)
 				else:
-					self.logger.info(f"Vegvisir is waiting for {sum(states)} post-hook processor(s) to stop. If this message persists, perform CTRL + C")
-			wait_for_hook_processors_counter += 1
-
-
-	def _copy_logs(self, container: str, dir: tempfile.TemporaryDirectory, params: str):
-		r = subprocess.run(
-			'docker cp "$('
-			+ params + " "
-			+ 'docker-compose --log-level ERROR ps -q '
-			+ container
-			+ ')":/logs/. '
-			+ dir.name,
-			shell=True,
-			stdout=subprocess.PIPE,
-			stderr=subprocess.STDOUT,
+					self._run_client_setup_commands("construct", [(constructor.serialize_command(client_params), constructor.requires_root) for constructor in client.construct], logger)
+					client_proc = self.host_interface.spawn_parallel_subprocess(client_cmd)
+			logger.debug("Vegvisir: running client: %s", client_cmd)
+
+		run_status = RunStatus.COMPLETED
+		client_start_time = datetime.now()
+		with tracing.span("sensors"):
+			try:
+				sensor_context = SensorContext(
+					container_pids=lambda service: self.container_backend.container_pid(compose_project, service),
+					networks={"leftnet": slot.leftnet_subnet, "rightnet": slot.rightnet_subnet},
+				)
+				environment.start_sensors(client_proc, path_collection, sensor_context)
+				environment.waitfor_sensors()
+				environment.clean_and_reset_sensors()
+				if self.slots_request_stop:
+					run_status = RunStatus.ABORTED
+					with open(os.path.join(path_collection.log_path_permutation, "crashreport.txt"), "w") as fp:
+						fp.write("Test aborted by user interaction.")
+			except KeyboardInterrupt:
+				run_status = RunStatus.ABORTED
+				environment.forcestop_sensors()
+				environment.clean_and_reset_sensors()
+				with open(os.path.join(path_collection.log_path_permutation, "crashreport.txt"), "w") as fp:
+					fp.write("Test aborted by user interaction.")
+				logger.info("CTRL-C test interrupted")
+		client_duration = datetime.now() - client_start_time
+
+		with tracing.span("client_stop"):
+			client_proc.terminate() # TODO redundant?
+			if client.type == Endpoint.Type.HOST:
+				# Doing this for docker will nullify the sensor system
+				# Docker client logs are retrieved through the container backend
+				out, err = client_proc.communicate()
+				logger.debug(out.decode("utf-8"))
+				logger.debug(err.decode("utf-8"))
+			else:
+				# The client log is complete once the client has been waited for
+				try:
+					client_proc.wait(30)
+				except subprocess.TimeoutExpired:
+					logger.warning("Client container did not stop in time, its log might be incomplete")
+					client_proc.kill()
+
+		run_metadata = {
+			"client": client_config["name"],
+			"shaper": shaper_config["name"],
+			"scenario": shaper_config["scenario"],
+			"server": server_config["name"],
+			"iteration": run_number,
+			"sensor_outcome": environment.sensor_outcome(),
+			"started": iteration_start_time.isoformat(),
+			"client_duration": client_duration.total_seconds(),
+			"parameters": {"client": client_params, "shaper": shaper_params, "server": server_params},
+			"images": {
+				"client": self._image_id(client.image.full) if client.type == Endpoint.Type.DOCKER else None,
+				"shaper": self._image_id(shaper.image.full),
+				"server": self._image_id(server.image.full),
+			},
+		}
+		teardown = RunTeardown(
+			client_config["name"], shaper_config["name"], server_config["name"], run_number,
+			logger, log_handler, path_collection, path_collection_copy,
+			compose_project, log_followers, cert_path, client.type == Endpoint.Type.DOCKER, run_status, iteration_start_time, run_metadata,
 		)
-		if r.returncode != 0:
-			logging.info(
-				"Copying logs from %s failed: %s", container, r.stdout.decode("utf-8")
-			)
+		if self.configuration.overlap_teardown:
+			slot.submit_teardown(self._teardown_run, slot, teardown)
+		else:
+			self._teardown_run(slot, teardown)
+		return client_params
+
+
+	def _teardown_run(self, slot: Slot, teardown: RunTeardown) -> None:
+		"""
+		Stop or reset the containers of a finished run, collect its output and queue its post-hook
+		Runs in the background when teardowns overlap with the next run, a failure is raised once the slot waits for it
+		"""
+		logger = teardown.logger
+		path_collection = teardown.path_collection
+		reuse_containers = self.configuration.reuse_containers
+		try:
+			with tracing.span("teardown", slot=slot.index, client=teardown.client, shaper=teardown.shaper, server=teardown.server, run=teardown.run_number):
+				with tracing.span("container_teardown", warm=reuse_containers):
+					if reuse_containers:
+						self._reset_warm_containers(slot, teardown.compose_project, path_collection, logger, teardown.remove_client)
+						# Warm containers keep running, their streams are cut after a short grace period for lines still in flight
+						followers_deadline = time.monotonic() + 0.5
+						for log_follower in teardown.log_followers:
+							log_follower.stop(max(0.0, followers_deadline - time.monotonic()))
+					else:
+						out, err = self.container_backend.down(teardown.compose_project) # TODO TEMP
+						logger.debug(out)
+						# Streams end together with their containers
+						for log_follower in teardown.log_followers:
+							log_follower.stop(5)
+				if teardown.cert_path is not None:
+					teardown.cert_path.cleanup()
+				logger.debug(f"Container output streamed to {CONTAINER_LOG_FILE} in the client, server and shaper log directories")
+
+				# Change ownership of docker output to running user
+				with tracing.span("chown"):
+					_, out, err = self.host_interface.run_privileged([("chown_output", {"path": path_collection.log_path_permutation})])[0]
+					if len(err) > 0:
+						logger.warning(f"Could not change log output ownership [{err}] @ {path_collection.log_path_permutation}")
+					else:
+						logger.debug(f"Changed ownership of output logs to {os.getuid()}:{os.getgid()} | {path_collection.log_path_permutation}")
+
+			ended = datetime.now()
+			try:
+				write_run_metadata(path_collection.log_path_permutation, {
+					**teardown.metadata,
+					"status": teardown.run_status.value,
+					"ended": ended.isoformat(),
+					"duration": (ended - teardown.start_time).total_seconds(),
+				})
+			except OSError as e:
+				logger.warning(f"Could not write run metadata to [{path_collection.log_path_permutation}] | {e}")
+
+			# Recorded before the post-hook is queued, a resume requeues hooks of completed runs that never finished
+			self.manifest.record_run(teardown.client, teardown.shaper, teardown.server, teardown.run_number, teardown.post_hook_paths, teardown.run_status)
+			# The client duration is sampled once the run is recorded, other metrics of adaptive iterations once the post-hook completed
+			adaptive_iterations = self.configuration.adaptive_iterations
+			if adaptive_iterations is not None and adaptive_iterations.immediate:
+				stop_rule = self.adaptive_stop_rules.pop(path_collection.log_path_permutation, None)
+				if stop_rule is not None:
+					self._add_adaptive_sample(stop_rule, path_collection.log_path_permutation)
+			self._queue_post_hook(slot.environment, teardown.post_hook_paths)
+		except Exception:
+			self.result_cache_candidates.pop(path_collection.log_path_permutation, None)
+			self.adaptive_stop_rules.pop(path_collection.log_path_permutation, None)
+			self.manifest.record_run(teardown.client, teardown.shaper, teardown.server, teardown.run_number, teardown.post_hook_paths, RunStatus.FAILED)
+			raise
+		finally:
+			if self.configuration.iterations > 1:
+				logger.info(f'Test run {teardown.run_number}/{self.configuration.iterations} duration: {datetime.now() - teardown.start_time}')
+			else:
+				logger.info(f'Test run duration: {datetime.now() - teardown.start_time}')
+			logger.removeHandler(teardown.log_handler)
+			teardown.log_handler.close()
+
+	def _wait_for_teardown(self, slot: Slot) -> None:
+		if not slot.teardown_pending:
+			return
+		with tracing.span("teardown_wait", slot=slot.index):
+			slot.wait_for_teardown()
+
+	def _base_arguments(self, environment: BaseEnvironment) -> VegvisirArguments:
+		"""
+		Arguments shared by all roles that do not depend on the run itself
+		"""
+		vegvisirBaseArguments = VegvisirArguments()
+		# TODO pick a better/cleaner spot to do this
+		vegvisirBaseArguments.ORIGIN = "server4"
+		vegvisirBaseArguments.ORIGIN_IPV4 = "server4"
+		vegvisirBaseArguments.ORIGIN_IPV6 = "server6" # TODO hostman this
+		vegvisirBaseArguments.ORIGIN_PORT = "443"
+		vegvisirBaseArguments.WAITFORSERVER = "server4:443"
+		vegvisirBaseArguments.SSLKEYLOGFILE = "/logs/keys.log"
+		vegvisirBaseArguments.QLOGDIR = "/logs/qlog/"
+		vegvisirBaseArguments.ENVIRONMENT = environment.environment_name if environment.environment_name != "" else None
+		# vegvisirBaseArguments.SCENARIO = shaper.scenarios[shaper_config["scenario"]].command  # TODO jherbots Check if client and server need this?
+		return vegvisirBaseArguments
+
+	def _role_arguments(self, base_arguments: VegvisirArguments, environment: BaseEnvironment, scenario: Scenario) -> Tuple[VegvisirArguments, VegvisirArguments, VegvisirArguments]:
+		"""
+		Client, server and shaper arguments derived from the arguments all roles share
+		"""
+		client_arguments = dataclasses.replace(base_arguments, ROLE="client", TESTCASE=environment.get_QIR_compatibility_testcase(BaseEnvironment.Perspective.CLIENT))
+		server_arguments = dataclasses.replace(base_arguments, ROLE="server", TESTCASE=environment.get_QIR_compatibility_testcase(BaseEnvironment.Perspective.SERVER))
+		shaper_arguments = dataclasses.replace(base_arguments, ROLE="shaper", SCENARIO=scenario.command, WAITFORSERVER="server:443")  # Important edgecase! Shaper uses server instead of server4
+		return client_arguments, server_arguments, shaper_arguments
+
+	def _reuse_cert_chain(self, environment: BaseEnvironment) -> bool:
+		return self.configuration.reuse_containers or (self.configuration.reuse_cert_chain and environment.cert_chain_reuse_permitted)
+
+	def _warm_container_arguments(self, hydrated_parameters: Dict[str, str]) -> Tuple:
+		"""
+		Hydrated arguments relevant for the identity of warm containers
+		Client specific paths change every run but do not influence the shaper or server
+		"""
+		return tuple(sorted((key, value) for key, value in hydrated_parameters.items() if key not in ["LOG_PATH_CLIENT", "DOWNLOAD_PATH_CLIENT"]))
+
+	def _reset_warm_containers(self, slot: Slot, compose_project: ComposeProject, path_collection: ExperimentPaths, logger: logging.Logger, remove_client: bool) -> None:
+		"""
+		Reset the per run state of warm containers
+		Removes the client container, rearms the shaper netcat sync and copies the container logs into the run directories
+		"""
+		if remove_client:
+			out, err = self.container_backend.remove(compose_project, "client")
+			logger.debug(out)
+
+		# Shapers that keep listening themselves (e.g., ns3) will simply refuse the second listener
+		out, err = self.container_backend.exec_detached(compose_project, "sim", ["netcat", "-l", "57832"])
+		if err is not None and len(err) > 0:
+			logger.debug(f"Rearming shaper sync resulted in error: {err}")
+
+		# Files are copied into the run directory and truncated in place, containers keep their files open across runs (e.g., keys.log, pcaps)
+		# Hardlinking them would let later runs write into this run directory, and into the result cache entries sharing its files
+		warm_containers = slot.warm_containers
+		results = self.host_interface.run_privileged([
+			("rotate_logs", {"source": warm_containers.log_path_server, "destination": path_collection.log_path_server}),
+			("rotate_logs", {"source": warm_containers.log_path_shaper, "destination": path_collection.log_path_shaper}),
+		])
+		err = "\n".join(err for _, _, err in results if len(err) > 0)
+		if len(err) > 0:
+			logger.warning(f"Rotating warm container logs into [{path_collection.log_path_permutation}] resulted in error: {err}")
+
+	def _release_warm_containers(self, slot: Slot, logger: logging.Logger | None = None) -> None:
+		if slot.warm_containers is None:
+			return
+		logger = logger or slot.logger
+		logger.debug("Releasing warm sim and server containers")
+		out, err = self.container_backend.down(slot.warm_containers.compose_project)
+		logger.debug(out)
+		slot.warm_containers = None
+
+	def _run_client_setup_commands(self, setup_type: str, commands: List[Tuple[str, bool]], logger: logging.Logger) -> None:
+		for command, requires_root in commands:
+			logger.debug(f"Issuing client {setup_type} command [{command}]")
+			_, out, err = self.host_interface.spawn_blocking_subprocess(command, requires_root, True)
+			if out is not None and len(out) > 0:
+				logger.debug(f"{setup_type.capitalize()} command STDOUT:\n{out}")
+			if err is not None and len(err) > 0:
+				logger.debug(f"{setup_type.capitalize()} command STDERR:\n{err}")
+
+	def _start_devtools_run(self, slot: Slot, client: Endpoint, client_params: Dict[str, str], client_cmd: str, path_collection: ExperimentPaths, logger: logging.Logger) -> DevToolsRunProcess:
+		"""
+		Navigate the browser of the slot to the url of the client in a fresh browser context, (re)starts the browser when required
+		The browser is restarted when its command or construct commands differ, i.e., when they contain parameters that change every run
+		"""
+		key = (client.name, client_cmd, tuple(constructor.serialize_command(client_params) for constructor in client.construct))
+		if slot.warm_browser is not None:
+			if slot.warm_browser.browser.key != key:
+				logger.debug("Browser was started with other arguments, restarting it")
+				self._release_warm_browser(slot, logger)
+			elif not slot.warm_browser.browser.alive:
+				logger.warning("Browser exited since the previous run, restarting it")
+				self._release_warm_browser(slot, logger)
+
+		if slot.warm_browser is None:
+			self._run_client_setup_commands("construct", [(constructor.serialize_command(client_params), constructor.requires_root) for constructor in client.construct], logger)
+			browser = DevToolsBrowser(key, client.devtools.endpoint)
+			browser.start(self.host_interface, client_cmd, os.path.join(path_collection.log_path_date, f"devtools_browser_slot{slot.index}.txt"))
+			slot.warm_browser = WarmBrowser(browser, [(destructor.serialize_command(client_params), destructor.requires_root) for destructor in client.destruct])
+		else:
+			logger.debug(f"Reusing browser listening on [{client.devtools.endpoint}]")
+
+		url = client.devtools.serialize_url(client_params)
+		logger.debug(f"Navigating a new browser context to [{url}]")
+		return slot.warm_browser.browser.start_run(url, path_collection.download_path_client, client.devtools.ignore_certificate_errors)
+
+	def _release_warm_browser(self, slot: Slot, logger: logging.Logger | None = None) -> None:
+		if slot.warm_browser is None:
+			return
+		logger = logger or slot.logger
+		logger.debug("Closing browser of devtools client")
+		slot.warm_browser.browser.close()
+		self._run_client_setup_commands("destruct", slot.warm_browser.destruct, logger)
+		slot.warm_browser = None
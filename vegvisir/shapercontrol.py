@@ -0,0 +1,33 @@
+import socket
+
+from vegvisir.exceptions import VegvisirShaperControlException
+
+SHAPER_CONTROL_PORT = 57833
+
+
+def reconfigure_shaper(address: str, scenario: str, timeout: float = 10.0) -> None:
+	"""
+	Ask a running shaper to apply a new scenario in place over its control channel
+	The shaper answers a single line, "OK" on success or "ERR <output>" when the scenario could not be changed
+	See docker-images/tc-netem/run.sh for the shaper side of the channel
+	"""
+	# Scenario commands are often quoted for the env file, the channel expects the bare command
+	scenario = scenario.strip().strip("\"'")
+	if "\n" in scenario:
+		raise VegvisirShaperControlException(f"Scenario [{scenario}] can not span multiple lines.")
+
+	try:
+		with socket.create_connection((address, SHAPER_CONTROL_PORT), timeout=timeout) as connection:
+			connection.sendall(scenario.encode() + b"\n")
+			reply = b""
+			while not reply.endswith(b"\n"):
+				data = connection.recv(4096)
+				if not data:
+					break
+				reply += data
+	except OSError as e:
+		raise VegvisirShaperControlException(f"Could not reach shaper control channel at {address}:{SHAPER_CONTROL_PORT} | {e}")
+
+	reply = reply.decode("utf-8", errors="replace").strip()
+	if reply != "OK":
+		raise VegvisirShaperControlException(f"Shaper refused scenario [{scenario}] | {reply if reply else 'no reply'}")
@@ -0,0 +1,171 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import shutil
+import tempfile
+from typing import Callable, Dict, List, Tuple
+
+from vegvisir.backends.base_backend import ComposeProject, LogFollower
+from vegvisir.data import ExperimentPaths
+from vegvisir.devtools import DevToolsBrowser
+from vegvisir.environments.base_environment import BaseEnvironment
+from vegvisir.manifest import RunStatus
+
+
+@dataclass
+class WarmContainers:
+	"""
+	Shaper and server containers kept alive between runs of a slot
+	The key captures everything the containers were started with, runs with another key require new containers
+	Shaper arguments are tracked separately, reconfigurable scenarios can change these without new containers
+	"""
+	key: Tuple
+	shaper_arguments: Tuple
+	compose_project: ComposeProject
+	log_path_server: str
+	log_path_shaper: str
+
+
+@dataclass
+class WarmBrowser:
+	"""
+	Host client browser kept alive between runs of a slot, runs only open a new browser context in it
+	Destruct commands are hydrated with the parameters the browser was constructed with, they run once it is closed
+	"""
+	browser: DevToolsBrowser
+	destruct: List[Tuple[str, bool]]  # Command and whether it requires root
+
+
+@dataclass
+class RunTeardown:
+	"""
+	Everything required to finish a run once its client stopped
+	"""
+	client: str
+	shaper: str
+	server: str
+	run_number: int
+	logger: logging.Logger
+	log_handler: logging.Handler
+	path_collection: ExperimentPaths
+	post_hook_paths: ExperimentPaths  # Copy handed to the environment, the pre-hook received an identical one
+	compose_project: ComposeProject
+	log_followers: List[LogFollower]
+	cert_path: tempfile.TemporaryDirectory | None
+	remove_client: bool
+	run_status: RunStatus
+	start_time: datetime
+	metadata: Dict  # Written to run.json once the run is torn down, see resultsindex
+
+
+class Slot:
+	"""
+	Isolated execution slot, a slot runs one permutation at a time
+	Each slot owns a docker compose project, its own leftnet/rightnet subnets, container names and a private directory for env files and certificates
+	Slot 0 uses the addresses hardcoded in most QIR images (193.167.0.0/24 and 193.167.100.0/24) and the legacy container names
+	Other slots stay within 193.167.0.0/16 with the shaper on .2, which the QIR endpoint setup scripts rely on to derive their gateway
+	"""
+	MAX_SLOTS = 100
+
+	def __init__(self, index: int, environment: BaseEnvironment) -> None:
+		if index < 0 or index >= Slot.MAX_SLOTS:
+			raise ValueError(f"Slot index must be in range [0, {Slot.MAX_SLOTS})")
+		self.index = index
+		self.environment = environment
+
+		self.project_name = f"vegvisir_slot{index}"
+		self.container_prefix = "" if index == 0 else f"vegvisir_slot{index}_"
+
+		self.leftnet_ipv4_prefix = f"193.167.{index}"
+		self.rightnet_ipv4_prefix = f"193.167.{100 + index}"
+		self.leftnet_ipv6_prefix = f"fd00:cafe:cafe:{index:x}"
+		self.rightnet_ipv6_prefix = f"fd00:cafe:cafe:{0x100 + index:x}"
+
+		self.working_directory = tempfile.mkdtemp(dir="/tmp", prefix=f"vegvisir_slot{index}_")
+
+		# Warm container pool, only used when containers are reused between runs
+		self.warm_containers: WarmContainers | None = None
+
+		# Browser of devtools host clients, see devtools
+		self.warm_browser: WarmBrowser | None = None
+
+		# Leftnet bridge and veths the routes and checksum offload of host clients were last set up for, see hostnetwork
+		self.host_network_state: Tuple[str | None, Tuple[str, ...]] | None = None
+
+		# Certificate chain shared by all runs of this slot, only used when the chain is reused between runs
+		self.shared_cert_path: str | None = None
+		self.shared_cert_fingerprint: str | None = None
+
+		self.logger = logging.getLogger(f"root.Experiment.slot{index}")
+
+		# Runs are torn down one at a time in the background, the next run of the slot is prepared in the meantime
+		self._teardown_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"slot{index}_teardown")
+		self._pending_teardown: Future | None = None
+
+	@property
+	def leftnet_subnet(self) -> str:
+		return f"{self.leftnet_ipv4_prefix}.0/24"
+
+	@property
+	def rightnet_subnet(self) -> str:
+		return f"{self.rightnet_ipv4_prefix}.0/24"
+
+	@property
+	def shaper_leftnet_ipv4(self) -> str:
+		return f"{self.leftnet_ipv4_prefix}.2"
+
+	@property
+	def server_ipv4(self) -> str:
+		return f"{self.rightnet_ipv4_prefix}.100"
+
+	def container_name(self, service: str) -> str:
+		return f"{self.container_prefix}{service}"
+
+	def compose_variables(self) -> Dict[str, str]:
+		"""
+		Variables consumed by docker-compose.yml to separate this slot from all others
+		"""
+		return {
+			"COMPOSE_PROJECT_NAME": self.project_name,
+			"CONTAINER_PREFIX": self.container_prefix,
+			"ENV_DIR": self.working_directory,
+			"LEFTNET_V4_PREFIX": self.leftnet_ipv4_prefix,
+			"RIGHTNET_V4_PREFIX": self.rightnet_ipv4_prefix,
+			"LEFTNET_V6_PREFIX": self.leftnet_ipv6_prefix,
+			"RIGHTNET_V6_PREFIX": self.rightnet_ipv6_prefix,
+		}
+
+	def run_logger(self, handler: logging.Handler) -> logging.Logger:
+		"""
+		Logger of a single run, its records are passed on to the slot logger
+		Consecutive runs of a slot overlap during teardown, each one requires its own output file handler
+		The logger is not registered with the logging module, it is discarded together with the run
+		"""
+		logger = logging.Logger(f"{self.logger.name}.run")
+		logger.parent = self.logger
+		logger.addHandler(handler)
+		return logger
+
+	@property
+	def teardown_pending(self) -> bool:
+		return self._pending_teardown is not None
+
+	def submit_teardown(self, teardown: Callable, *args) -> None:
+		self.wait_for_teardown()
+		self._pending_teardown = self._teardown_executor.submit(teardown, *args)
+
+	def wait_for_teardown(self) -> None:
+		"""
+		Block until the previous run of this slot is torn down, exceptions raised by its teardown are raised here
+		"""
+		pending_teardown, self._pending_teardown = self._pending_teardown, None
+		if pending_teardown is not None:
+			pending_teardown.result()
+
+	def cleanup(self) -> None:
+		self._teardown_executor.shutdown(wait=True)
+		shutil.rmtree(self.working_directory, ignore_errors=True)
+
+	def __repr__(self) -> str:
+		return f"Slot<{self.index}, {self.project_name}, {self.leftnet_subnet}, {self.rightnet_subnet}>"
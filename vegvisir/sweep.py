@@ -0,0 +1,246 @@
+import itertools
+import math
+import re
+import string
+from typing import Dict, Iterator, List, Set, Tuple
+
+from vegvisir.exceptions import VegvisirInvalidExperimentConfigurationException
+
+ZIP_KEY = "zip"
+
+_UNSAFE_LOG_NAME = re.compile(r"[^A-Za-z0-9.+-]+")
+
+
+def _format_value(value) -> str:
+	if isinstance(value, float):
+		value = round(value, 9)  # Hides the float error of accumulated range steps (e.g., 0.30000000000000004)
+		if value.is_integer():
+			value = int(value)
+	return str(value)
+
+
+def _log_name_value(value: str) -> str:
+	"""
+	Argument value as part of a log directory name, e.g., https://server4/1MB.bin becomes https-server4-1MB.bin
+	"""
+	return _UNSAFE_LOG_NAME.sub("-", value).strip("-")
+
+
+def _range_values(specification, debug_str: str) -> List[str]:
+	"""
+	Values of a {"range": [start, stop, step]} sweep, stop is exclusive like the builtin range
+	"""
+	if type(specification) is not list or not 2 <= len(specification) <= 3 or not all(type(bound) in [int, float] for bound in specification):
+		raise VegvisirInvalidExperimentConfigurationException(f"{debug_str} must be a range of numbers [start, stop] or [start, stop, step].")
+	start, stop, step = specification if len(specification) == 3 else (*specification, 1)
+	if step == 0:
+		raise VegvisirInvalidExperimentConfigurationException(f"{debug_str} has a step of 0.")
+	size = max(0, math.ceil(round((stop - start) / step, 9)))
+	return [_format_value(start + index * step) for index in range(size)]
+
+
+class ArgumentSweep:
+	"""
+	A single client, server or shaper entry of the experiment configuration, whose arguments can describe multiple values
+	Arguments with a list ([10, 20, 30]) or range ({"range": [10, 110, 10]}) value are swept, every combination of their values becomes an entry of its own
+	Swept arguments combine as a cartesian product, except for the groups listed under the "zip" key of the entry which advance together
+	Entries are produced while iterating, their combinations are never stored
+	"""
+
+	def __init__(self, configuration: Dict, debug_str: str) -> None:
+		self.configuration = configuration
+		self._dimensions: List[Tuple[List[str], List[Tuple[str, ...]]]] = []  # (argument names, their values per step)
+
+		name = configuration.get("name")
+		arguments = configuration.get("arguments")
+		swept: Dict[str, List[str]] = {}
+		if type(arguments) is dict:
+			for argument, value in arguments.items():
+				argument_str = f"{debug_str.capitalize()} [{name}] argument [{argument}]"
+				if type(value) is list:
+					if len(value) == 0:
+						raise VegvisirInvalidExperimentConfigurationException(f"{argument_str} sweeps an empty list.")
+					if not all(type(item) in [str, int, float, bool] for item in value):
+						raise VegvisirInvalidExperimentConfigurationException(f"{argument_str} can only sweep over strings and numbers.")
+					swept[argument] = [_format_value(item) for item in value]
+				elif type(value) is dict:
+					if list(value.keys()) != ["range"]:
+						raise VegvisirInvalidExperimentConfigurationException(f"{argument_str} must be a value, a list or a {{\"range\": [start, stop, step]}} sweep.")
+					swept[argument] = _range_values(value["range"], argument_str)
+					if len(swept[argument]) == 0:
+						raise VegvisirInvalidExperimentConfigurationException(f"{argument_str} sweeps an empty range.")
+
+		zip_groups = configuration.get(ZIP_KEY, [])
+		if type(zip_groups) is not list or not all(type(group) is list for group in zip_groups):
+			raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] '{ZIP_KEY}' must be a list of argument name lists.")
+		zipped = set()
+		for group in zip_groups:
+			for argument in group:
+				if argument not in swept:
+					raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] zips argument [{argument}] which is not swept.")
+				if argument in zipped:
+					raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] zips argument [{argument}] more than once.")
+				zipped.add(argument)
+			if len({len(swept[argument]) for argument in group}) > 1:
+				raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] zips arguments {group} of different lengths.")
+			if len(group) > 0:
+				self._dimensions.append((group, list(zip(*[swept[argument] for argument in group]))))
+		for argument, values in swept.items():
+			if argument not in zipped:
+				self._dimensions.append(([argument], [(value,) for value in values]))
+		for names, steps in self._dimensions:
+			if len({tuple(_log_name_value(value) for value in step) for step in steps}) < len(steps):
+				raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] sweeps {names} over values that are not unique in a log name.")
+
+		self.swept_arguments = list(swept.keys())
+		self._swept_values = {argument: [_log_name_value(value) for value in values] for argument, values in swept.items()}
+		self.log_name = configuration.get("log_name")
+		self._log_name_segments = self._parse_log_name(debug_str)
+		self._check_log_name_segments(debug_str)
+		self._log_name_pattern: re.Pattern | None = None
+		self._log_name_steps: List[Set[Tuple[str, ...]]] = [{tuple(_log_name_value(value) for value in step) for step in steps} for _, steps in self._dimensions]
+
+	def _parse_log_name(self, debug_str: str) -> List[str | Tuple[str]]:
+		"""
+		Log name as literal text and (argument,) placeholders of swept arguments, arguments that are not swept are part of the literal text
+		"""
+		name = self.configuration.get("name")
+		if not self.is_sweep:
+			return [self.log_name if self.log_name is not None else name]
+		if self.log_name is None:
+			segments = []
+			for argument in self.swept_arguments:
+				segments += [f"{'_' if len(segments) > 0 else name + '_'}{argument}-", (argument,)]
+			return segments
+
+		# Every entry needs its own log directory, a log name template has to tell all of them apart
+		arguments = self.configuration["arguments"]
+		try:
+			parsed = list(string.Formatter().parse(self.log_name))
+		except ValueError as e:
+			raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] log name [{self.log_name}] is not a valid template | {e}")
+		fields = {field for _, field, _, _ in parsed if field is not None}
+		missing = [argument for argument in self.swept_arguments if argument not in fields]
+		if len(missing) > 0 or not fields <= set(arguments.keys()):
+			raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] log name [{self.log_name}] must contain a {{placeholder}} for every swept argument {missing} and only for its arguments.")
+		segments = []
+		for literal, field, format_spec, conversion in parsed:
+			segments.append(literal)
+			if field is None:
+				continue
+			if field in self.swept_arguments:
+				if format_spec or conversion:
+					raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] log name [{self.log_name}] formats swept argument [{field}], its placeholder must be a plain {{{field}}}.")
+				segments.append((field,))
+			else:
+				segments.append(("{0" + (f"!{conversion}" if conversion else "") + (f":{format_spec}" if format_spec else "") + "}").format(arguments[field]))
+		# Merge neighbouring literal text, drop empty text
+		merged = []
+		for segment in segments:
+			if type(segment) is str and len(merged) > 0 and type(merged[-1]) is str:
+				merged[-1] += segment
+			else:
+				merged.append(segment)
+		return [segment for segment in merged if segment != ""]
+
+	def _check_log_name_segments(self, debug_str: str) -> None:
+		"""
+		Every expanded log name has to lead back to a single combination, values are unique within their argument, so it suffices that every value ends where the text behind its placeholder starts
+		"""
+		name = self.configuration.get("name")
+		for index, segment in enumerate(self._log_name_segments):
+			if type(segment) is str or index == len(self._log_name_segments) - 1:
+				continue
+			following = self._log_name_segments[index + 1]
+			if type(following) is not str:
+				raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] log name [{self.log_name}] places {{{segment[0]}}} and {{{following[0]}}} next to each other, swept placeholders must be separated by text.")
+			for value in self._swept_values[segment[0]]:
+				if (value + following).find(following) != len(value):
+					raise VegvisirInvalidExperimentConfigurationException(f"{debug_str.capitalize()} [{name}] log name [{self.log_name}] is ambiguous, value [{value}] of [{segment[0]}] contains the text [{following}] that follows its placeholder.")
+
+	@property
+	def is_sweep(self) -> bool:
+		return len(self._dimensions) > 0
+
+	def __len__(self) -> int:
+		return math.prod(len(steps) for _, steps in self._dimensions)
+
+	def __iter__(self) -> Iterator[Dict]:
+		if not self.is_sweep:
+			yield self.configuration
+			return
+		# Later dimensions vary fastest, product() only holds the values of every dimension and never its combinations
+		for combination in itertools.product(*[steps for _, steps in self._dimensions]):
+			yield self._instance(combination)
+
+	def first(self) -> Dict:
+		"""
+		Entry with the first value of every swept argument, validating it validates every entry as only the argument values differ
+		"""
+		return next(iter(self))
+
+	def log_names(self) -> Iterator[str]:
+		"""
+		Log name of every entry, in the order of iteration
+		"""
+		if not self.is_sweep:
+			yield self._log_name_segments[0]
+			return
+		for combination in itertools.product(*[steps for _, steps in self._dimensions]):
+			values = {}
+			for (names, _), step in zip(self._dimensions, combination):
+				values.update(zip(names, step))
+			yield "".join(segment if type(segment) is str else _log_name_value(values[segment[0]]) for segment in self._log_name_segments)
+
+	def produces(self, log_name: str) -> bool:
+		"""
+		Whether one of the entries is named log_name, without expanding them
+		"""
+		if not self.is_sweep:
+			return log_name == self._log_name_segments[0]
+		if self._log_name_pattern is None:
+			self._log_name_pattern = re.compile("".join(
+				re.escape(segment) if type(segment) is str else "(" + "|".join(re.escape(value) for value in sorted(set(self._swept_values[segment[0]]), key=len, reverse=True)) + ")"
+				for segment in self._log_name_segments
+			))
+		match = self._log_name_pattern.fullmatch(log_name)
+		if match is None:
+			return False
+		values: Dict[str, str] = {}
+		for segment, value in zip([segment for segment in self._log_name_segments if type(segment) is not str], match.groups()):
+			if values.setdefault(segment[0], value) != value:
+				return False  # A placeholder used twice with different values
+		# Zipped arguments only occur in their own combinations
+		return all(tuple(values[argument] for argument in names) in steps for (names, _), steps in zip(self._dimensions, self._log_name_steps))
+
+	def _instance(self, combination: Tuple[Tuple[str, ...], ...]) -> Dict:
+		arguments = dict(self.configuration["arguments"])
+		for (names, _), values in zip(self._dimensions, combination):
+			arguments.update(zip(names, values))
+		instance = {key: value for key, value in self.configuration.items() if key != ZIP_KEY}
+		instance["arguments"] = arguments
+		log_name_values = {argument: _log_name_value(value) if argument in self.swept_arguments else value for argument, value in arguments.items()}
+		if self.log_name is not None:
+			instance["log_name"] = self.log_name.format(**log_name_values)
+		else:
+			instance["log_name"] = "_".join([self.configuration["name"]] + [f"{argument}-{log_name_values[argument]}" for argument in self.swept_arguments])
+		return instance
+
+
+class ConfigurationSweep:
+	"""
+	Client, server or shaper entries of an experiment, swept entries are expanded lazily every time the entries are iterated
+	"""
+
+	def __init__(self, sweeps: List[ArgumentSweep] | None = None) -> None:
+		self.sweeps = sweeps if sweeps is not None else []
+
+	def append(self, sweep: ArgumentSweep) -> None:
+		self.sweeps.append(sweep)
+
+	def __len__(self) -> int:
+		return sum(len(sweep) for sweep in self.sweeps)
+
+	def __iter__(self) -> Iterator[Dict]:
+		for sweep in self.sweeps:
+			yield from sweep
@@ -0,0 +1,143 @@
+from contextlib import contextmanager
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, Tuple
+
+# Spans are appended to the JSONL file as soon as they end, the Chrome trace_event file (chrome://tracing, Perfetto) is derived from it when the experiment ends
+TRACE_SPANS_FILE = "trace_spans.jsonl"
+TRACE_CHROME_FILE = "trace.json"
+
+
+class Tracer:
+	"""
+	Thread-safe span recorder, every span is written out immediately so a crashed experiment still leaves its timings behind
+	Timestamps and durations are in microseconds, the unit of the trace_event format
+	"""
+
+	def __init__(self, spans_path: str) -> None:
+		self.spans_path = spans_path
+		self.pid = os.getpid()
+		self._lock = threading.Lock()
+		self._file = open(spans_path, "a", buffering=1)
+
+	@contextmanager
+	def span(self, name: str, category: str = "vegvisir", **args) -> Iterator[Dict]:
+		"""
+		Time the enclosed block, the yielded dictionary can be used to add arguments while the span is open
+		"""
+		start = time.time_ns() // 1000
+		perf_start = time.perf_counter_ns()
+		try:
+			yield args
+		except BaseException as e:
+			args["error"] = type(e).__name__
+			raise
+		finally:
+			self.record(name, category, start, (time.perf_counter_ns() - perf_start) // 1000, args)
+
+	def record(self, name: str, category: str, start: int, duration: int, args: Dict | None = None, track: Tuple[int, str] | None = None) -> None:
+		"""
+		Add a span that was timed elsewhere (e.g., time spent waiting in a queue)
+		track places the span on another thread id and name than the calling thread, e.g., for work done in another process
+		"""
+		if track is None:
+			thread = threading.current_thread()
+			track = (thread.ident, thread.name)
+		line = json.dumps({
+			"name": name,
+			"cat": category,
+			"ts": start,
+			"dur": duration,
+			"pid": self.pid,
+			"tid": track[0],
+			"thread": track[1],
+			"args": args or {},
+		}, default=str)
+		with self._lock:
+			if self._file is not None:
+				self._file.write(line + "\n")
+
+	def close(self) -> None:
+		with self._lock:
+			if self._file is not None:
+				self._file.close()
+				self._file = None
+
+
+class NullTracer(Tracer):
+	"""
+	Active when no experiment is running, spans cost nothing
+	"""
+
+	def __init__(self) -> None:
+		pass
+
+	@contextmanager
+	def span(self, name: str, category: str = "vegvisir", **args) -> Iterator[Dict]:
+		yield args
+
+	def record(self, name: str, category: str, start: int, duration: int, args: Dict | None = None, track: Tuple[int, str] | None = None) -> None:
+		pass
+
+	def close(self) -> None:
+		pass
+
+
+_active_tracer: Tracer = NullTracer()
+
+
+def activate(tracer: Tracer) -> None:
+	global _active_tracer
+	_active_tracer = tracer
+
+
+def deactivate() -> None:
+	global _active_tracer
+	_active_tracer.close()
+	_active_tracer = NullTracer()
+
+
+def span(name: str, category: str = "vegvisir", **args):
+	return _active_tracer.span(name, category, **args)
+
+
+def record(name: str, category: str, start: int, duration: int, args: Dict | None = None, track: Tuple[int, str] | None = None) -> None:
+	_active_tracer.record(name, category, start, duration, args, track)
+
+
+def now() -> int:
+	"""
+	Current timestamp in the unit spans use, for spans timed outside of a with block
+	"""
+	return time.time_ns() // 1000
+
+
+def export_chrome_trace(spans_path: str, trace_path: str) -> None:
+	"""
+	Convert a span JSONL file into a Chrome trace_event file
+	Spans are streamed from disk, memory use does not depend on the number of runs
+	"""
+	thread_names = {}
+	with open(spans_path, "r") as spans, open(trace_path, "w") as trace:
+		trace.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+		first = True
+		for line in spans:
+			try:
+				entry = json.loads(line)
+			except json.JSONDecodeError:
+				logging.warning(f"Skipping malformed trace span in {spans_path}")
+				continue
+			thread_names[(entry["pid"], entry["tid"])] = entry.pop("thread", None)
+			entry["ph"] = "X"
+			trace.write(("" if first else ",\n") + json.dumps(entry))
+			first = False
+		for (pid, tid), thread_name in thread_names.items():
+			if thread_name is None:
+				continue
+			metadata = {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}}
+			trace.write(("" if first else ",\n") + json.dumps(metadata))
+			first = False
+		trace.write("\n]}\n")